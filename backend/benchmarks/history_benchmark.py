@@ -0,0 +1,96 @@
+"""Write throughput and scan speed of the vehicle history recorder.
+
+Run from the backend directory:
+
+    python benchmarks/history_benchmark.py
+
+Records DAYS days of synthetic /map-vehicles builds (VEHICLES buses on
+ROUTES routes, one build every POLL_SECONDS, STOPS_PER_VEHICLE upcoming
+stops each) into a temporary directory through the recorder's writer, then
+scans every day through HistoryReader: per-route mean speed and the gaps
+between consecutive predictions of one stop, both fully vectorized.
+"""
+import math
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from services.history_recorder import HistoryReader, HistoryRecorder
+
+DAYS = 2
+VEHICLES = 50
+ROUTES = 5
+POLL_SECONDS = 10
+STOPS_PER_VEHICLE = 3
+START = 1_790_000_000.0 - 1_790_000_000.0 % 86400  # a UTC midnight
+
+
+def build(timestamp: float):
+    vehicles = []
+    for v in range(VEHICLES):
+        angle = v + timestamp * 0.01
+        vehicles.append({
+            "vehicleId": str(100 + v),
+            "routeId": str(v % ROUTES),
+            "latitude": 33.7756 + 0.006 * math.sin(angle),
+            "longitude": -84.3963 + 0.006 * math.cos(angle),
+            "groundSpeed": 6.0 + v % 4,
+            "heading": 90.0,
+            "isOnRoute": True,
+            "isDelayed": False,
+            "distanceAlongRoute": (timestamp * 6.0) % 4000.0,
+            "stops": [
+                {"routeStopId": str((v % ROUTES) * 100 + k), "arrivalSeconds": 60 * (k + 1)}
+                for k in range(STOPS_PER_VEHICLE)
+            ],
+        })
+    return vehicles
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        recorder = HistoryRecorder(Path(directory))
+        builds_per_day = 86400 // POLL_SECONDS
+        write_seconds = 0.0
+        for day in range(DAYS):
+            for i in range(builds_per_day):
+                timestamp = START + day * 86400 + i * POLL_SECONDS
+                recorder.record(timestamp, build(timestamp))
+                if len(recorder._pending) >= 360:  # an hour of builds per write
+                    batch, recorder._pending = recorder._pending, []
+                    started = time.perf_counter()
+                    recorder._write(batch)
+                    write_seconds += time.perf_counter() - started
+
+        rows = recorder.rows_written
+        size = sum(path.stat().st_size for path in Path(directory).rglob("*"))
+        print(f"{DAYS} days, {rows['vehicles']} vehicle rows, {rows['arrivals']} arrival rows, {size / 1e6:.1f} MB")
+        total = rows["vehicles"] + rows["arrivals"]
+        print(f"writer thread: {write_seconds:.2f} s ({total / write_seconds:,.0f} rows/s)")
+
+        started = time.perf_counter()
+        scanned = 0
+        for segment in HistoryReader(Path(directory)).scan():
+            vehicles = segment.vehicles
+            routes = vehicles["route"]
+            speed_sum = np.bincount(routes, weights=vehicles["speed"])
+            counts = np.bincount(routes)
+            mean_speed = speed_sum / np.maximum(counts, 1)
+
+            arrivals = segment.arrivals
+            stop = segment.code("stop", "100")
+            times = arrivals["time"][(arrivals["stop"] == stop) & (arrivals["seconds"] >= 0)]
+            gaps = np.diff(np.unique(times))
+            scanned += len(vehicles["time"]) + len(arrivals["time"])
+        scan_ms = (time.perf_counter() - started) * 1000
+        print(f"scan: {scan_ms:.1f} ms for {scanned} rows ({scanned / scan_ms * 1000:,.0f} rows/s)")
+        print(f"mean speed by route {np.round(mean_speed, 1).tolist()}, median gap at stop 100 {np.median(gaps):.0f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Route line size per /map-routes?zoom= level, and the one-off cost of building them.
+
+Run from the backend directory:
+
+    python benchmarks/polyline_benchmark.py
+
+Lines are synthetic: ROUTES closed loops of VERTICES GPS-traced points
+(a few meters of jitter on a wavy ~2 km loop), encoded like TransLoc's
+EncodedPolyline. "full" is the upstream string that is served without ?zoom.
+"""
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import settings
+from services.polyline import SimplifiedPolyline, encode_polyline
+
+ROUTES = 10
+VERTICES = 2000
+
+
+def traced_loop(seed: int) -> str:
+    rng = random.Random(seed)
+    radius = 0.006 + seed * 0.0005
+    points = []
+    for i in range(VERTICES):
+        a = 2 * math.pi * i / VERTICES
+        points.append((
+            33.7756 + radius * math.sin(a) + 0.0004 * math.sin(a * 12) + rng.gauss(0, 1e-5),
+            -84.3963 + radius * 1.2 * math.cos(a) + rng.gauss(0, 1e-5),
+        ))
+    points.append(points[0])
+    return encode_polyline(points)
+
+
+def main():
+    lines = [traced_loop(seed) for seed in range(ROUTES)]
+
+    started = time.perf_counter()
+    simplified = [
+        SimplifiedPolyline(line, settings.map_routes_zoom_levels, settings.map_routes_simplify_pixels)
+        for line in lines
+    ]
+    build_ms = (time.perf_counter() - started) * 1000
+
+    full_bytes = sum(len(line) for line in lines)
+    print(f"{ROUTES} routes x {VERTICES} vertices, built every level in {build_ms:.1f} ms")
+    print(f"{'zoom':<8}{'vertices':>10}{'bytes':>10}{'of full':>10}")
+    for zoom in settings.map_routes_zoom_levels:
+        vertices = sum(line.vertex_counts[zoom] for line in simplified)
+        size = sum(len(line.for_zoom(zoom)) for line in simplified)
+        print(f"{zoom:<8}{vertices:>10}{size:>10}{size / full_bytes:>9.1%}")
+    print(f"{'full':<8}{sum(line.vertices for line in simplified):>10}{full_bytes:>10}{1:>9.1%}")
+
+
+if __name__ == "__main__":
+    main()
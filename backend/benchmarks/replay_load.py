@@ -0,0 +1,91 @@
+"""Repeatable offline load against the API, with TransLoc replayed from a capture.
+
+Record a capture first by running the server for a while with
+
+    TRANSLOC_CAPTURE_MODE=record python main.py
+
+then, from the backend directory:
+
+    python benchmarks/replay_load.py [capture] [--seconds 30] [--concurrency 20]
+
+The app runs in-process (lifespan included) with TRANSLOC_CAPTURE_MODE=replay,
+so every upstream call is served from the capture with its recorded latency
+(or per TRANSLOC_REPLAY_LATENCY / TRANSLOC_REPLAY_SPEED and friends). Each
+worker loops over route searches between random catalog buildings,
+/map-routes and /map-vehicles; latency percentiles are printed per endpoint.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def run(seconds: float, concurrency: int, seed: int):
+    import httpx
+    import main
+
+    rng = random.Random(seed)
+    timings = {"search": [], "map-routes": [], "map-vehicles": []}
+    errors = {name: 0 for name in timings}
+
+    async with main.lifespan(main.app):
+        buildings = [building.name for building in main.app.state.poi_catalog.buildings()]
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://replay") as client:
+            deadline = time.perf_counter() + seconds
+
+            async def worker():
+                while time.perf_counter() < deadline:
+                    begin, dest = rng.sample(buildings, 2)
+                    for name, send in (
+                        ("search", lambda: client.post(
+                            "/api/RouteSearch", json={"begin_building": begin, "dest_building": dest}
+                        )),
+                        ("map-routes", lambda: client.get("/api/RouteSearch/map-routes")),
+                        ("map-vehicles", lambda: client.get("/api/RouteSearch/map-vehicles")),
+                    ):
+                        started = time.perf_counter()
+                        response = await send()
+                        timings[name].append((time.perf_counter() - started) * 1000)
+                        if response.status_code >= 400:
+                            errors[name] += 1
+
+            await asyncio.gather(*[worker() for _ in range(concurrency)])
+        capture = main.app.state.transloc_api_service.capture.stats()
+
+    print(f"{concurrency} workers for {seconds:.0f} s; upstream replay: {capture}")
+    print(f"{'endpoint':<14}{'requests':>10}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, values in timings.items():
+        print(
+            f"{name:<14}{len(values):>10}{errors[name]:>8}"
+            f"{percentile(values, 0.5):>10.1f}{percentile(values, 0.95):>10.1f}{percentile(values, 0.99):>10.1f}"
+        )
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", nargs="?", help="capture file (default: TRANSLOC_CAPTURE_PATH)")
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Settings are read at import time, so configure replay before importing the app
+    os.environ["TRANSLOC_CAPTURE_MODE"] = "replay"
+    if args.capture:
+        os.environ["TRANSLOC_CAPTURE_PATH"] = str(Path(args.capture).resolve())
+    asyncio.run(run(args.seconds, args.concurrency, args.seed))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,211 @@
+"""Serialization cost of /map-vehicles and /map-routes: pydantic + json vs dicts + orjson.
+
+Run from the backend directory:
+
+    python benchmarks/serialization_benchmark.py
+
+"Before" is the previous path (build MapVehicle/MapRoute models, model_dump
+by alias, json.dumps); "after" is RouteService's current builders plus
+orjson.dumps. Upstream data is synthetic: 100 vehicles on 10 routes with
+10 upcoming stops each, and 10 routes with 40 stops each.
+"""
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import orjson
+
+from models import MapRoute, MapStop, MapVehicle, VehicleStop
+from services.route_service import RouteService
+from services.vehicle_poller import VehicleSnapshot
+
+VEHICLES = 100
+ROUTES = 10
+STOPS_PER_ROUTE = 40
+STOPS_PER_VEHICLE = 10
+
+
+class InMemoryTranslocApi:
+    """Just enough of TranslocApiService to drive the RouteService builders."""
+
+    def __init__(self):
+        self.stops = {
+            str(r): [
+                {
+                    "RouteStopID": (r + 1) * 1000 + i, "RouteID": r, "Description": f"Stop {r}-{i}",
+                    "Latitude": 33.77 + i * 1e-4, "Longitude": -84.39 - r * 1e-4, "Order": i + 1,
+                    "ShowEstimatesOnMap": True, "ShowDefaultedOnMap": False,
+                }
+                for i in range(STOPS_PER_ROUTE)
+            ]
+            for r in range(ROUTES)
+        }
+        self.routes = [
+            {
+                "RouteID": r, "Description": f"Route {r}", "MapLineColor": "#123456",
+                "MapLatitude": 33.77, "MapLongitude": -84.39, "MapZoom": 15,
+                "IsVisibleOnMap": True, "IsCheckedOnMap": True, "HideRouteLine": False,
+                "EncodedPolyline": "_p~iF~ps|U_ulLnnqC_mqNvxq`@" * 20,
+            }
+            for r in range(ROUTES)
+        ]
+        self.vehicles = tuple(
+            {
+                "VehicleID": v, "RouteID": v % ROUTES, "Name": f"Bus {v}",
+                "Latitude": 33.77 + v * 1e-4, "Longitude": -84.39, "GroundSpeed": 21.5,
+                "Heading": 90, "Seconds": 2, "IsOnRoute": True, "IsDelayed": False,
+            }
+            for v in range(VEHICLES)
+        )
+        self.arrivals = [
+            {
+                "RouteID": v % ROUTES, "RouteStopID": (v % ROUTES + 1) * 1000 + i,
+                "StopDescription": f"Stop {v % ROUTES}-{i}",
+                "Times": [{"VehicleId": v, "Seconds": 60 * (i + 1)}],
+            }
+            for v in range(VEHICLES)
+            for i in range(STOPS_PER_VEHICLE)
+        ]
+
+    async def get_routes_arrival_times(self, route_ids, times_per_stop=1):
+        return self.arrivals
+
+    async def get_stops(self, route_id):
+        return self.stops.get(route_id, [])
+
+    async def get_routes_for_map_with_schedule_with_encoded_line(self):
+        return self.routes
+
+    @staticmethod
+    def _extract_route_id(item):
+        route_id = item.get("RouteID")
+        return str(route_id) if route_id is not None else None
+
+
+def snapshot_of(api: InMemoryTranslocApi) -> VehicleSnapshot:
+    by_route = {}
+    for vehicle in api.vehicles:
+        by_route.setdefault(str(vehicle["RouteID"]), []).append(vehicle)
+    return VehicleSnapshot(
+        version=1,
+        vehicles=api.vehicles,
+        vehicles_by_route={route_id: tuple(v) for route_id, v in by_route.items()},
+        active_route_ids=frozenset(by_route),
+    )
+
+
+def map_vehicles_before(api: InMemoryTranslocApi) -> bytes:
+    stops_by_id = {str(s["RouteStopID"]): s for stops in api.stops.values() for s in stops}
+    vehicle_stops = {}
+    for stop_data in api.arrivals:
+        route_stop_id = str(stop_data["RouteStopID"])
+        stop_info = stops_by_id.get(route_stop_id, {})
+        for t in stop_data["Times"]:
+            vehicle_stops.setdefault(str(t["VehicleId"]), []).append(VehicleStop(
+                route_stop_id=route_stop_id,
+                stop_name=stop_data.get("StopDescription", ""),
+                latitude=stop_info.get("Latitude", 0.0),
+                longitude=stop_info.get("Longitude", 0.0),
+                arrival_seconds=t.get("Seconds"),
+            ))
+    vehicles = [
+        MapVehicle(
+            vehicle_id=str(v["VehicleID"]),
+            route_id=str(v["RouteID"]),
+            name=v.get("Name", ""),
+            latitude=v.get("Latitude", 0.0),
+            longitude=v.get("Longitude", 0.0),
+            ground_speed=v.get("GroundSpeed", 0.0),
+            heading=v.get("Heading", 0.0),
+            seconds=v.get("Seconds", 0),
+            is_on_route=v.get("IsOnRoute", False),
+            is_delayed=v.get("IsDelayed", False),
+            stops=vehicle_stops.get(str(v["VehicleID"]), []),
+        )
+        for v in api.vehicles
+    ]
+    return json.dumps(
+        [v.model_dump(mode="json", by_alias=True) for v in vehicles], separators=(",", ":")
+    ).encode()
+
+
+def map_routes_before(api: InMemoryTranslocApi) -> bytes:
+    routes = []
+    for route in api.routes:
+        map_route = MapRoute(
+            route_id=str(route["RouteID"]),
+            description=route.get("Description", ""),
+            map_line_color=route.get("MapLineColor", "#000000"),
+            map_latitude=route.get("MapLatitude", 0.0),
+            map_longitude=route.get("MapLongitude", 0.0),
+            map_zoom=route.get("MapZoom", 0),
+            is_visible_on_map=route.get("IsVisibleOnMap", False),
+            is_checked_on_map=route.get("IsCheckedOnMap", False),
+            hide_route_line=route.get("HideRouteLine", False),
+            encoded_polyline=route.get("EncodedPolyline", ""),
+        )
+        for stop in api.stops[str(route["RouteID"])]:
+            map_route.stops.append(MapStop(
+                route_stop_id=str(stop["RouteStopID"]),
+                route_id=str(stop["RouteID"]),
+                description=stop.get("Description", ""),
+                latitude=stop.get("Latitude", 0.0),
+                longitude=stop.get("Longitude", 0.0),
+                order=stop.get("Order", 0),
+                show_estimates_on_map=stop.get("ShowEstimatesOnMap", False),
+                show_defaulted_on_map=stop.get("ShowDefaultedOnMap", False),
+            ))
+        routes.append(map_route)
+    return json.dumps(
+        [r.model_dump(mode="json", by_alias=True) for r in routes], separators=(",", ":")
+    ).encode()
+
+
+def best_of(fn, repeat: int = 7, number: int = 20) -> float:
+    """Best average seconds per call over `repeat` batches of `number` calls."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best
+
+
+def main():
+    api = InMemoryTranslocApi()
+    service = RouteService(api)
+    snapshot = snapshot_of(api)
+    stops_lists = [api.stops[str(route["RouteID"])] for route in api.routes]
+    loop = asyncio.new_event_loop()
+
+    def map_vehicles_after() -> bytes:
+        service._map_vehicles = None
+        _, vehicles = loop.run_until_complete(service._build_map_vehicles(snapshot))
+        return orjson.dumps(vehicles)
+
+    def map_routes_after() -> bytes:
+        return orjson.dumps(service._build_map_routes(api.routes, stops_lists))
+
+    assert map_vehicles_before(api) == map_vehicles_after()
+    assert map_routes_before(api) == map_routes_after()
+
+    per_100 = 100 / VEHICLES
+    rows = [
+        ("/map-vehicles (per 100 vehicles)", best_of(lambda: map_vehicles_before(api)) * per_100,
+         best_of(map_vehicles_after) * per_100),
+        (f"/map-routes ({ROUTES} routes x {STOPS_PER_ROUTE} stops)", best_of(lambda: map_routes_before(api)),
+         best_of(map_routes_after)),
+    ]
+    print(f"{'payload':<40}{'before':>12}{'after':>12}{'speedup':>10}")
+    for name, before, after in rows:
+        print(f"{name:<40}{before * 1000:>10.3f}ms{after * 1000:>10.3f}ms{before / after:>9.1f}x")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
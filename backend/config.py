@@ -16,6 +16,132 @@ class Settings(BaseSettings):
         "https://buzzbus.vercel.app",
     ]
     
+    # TransLoc HTTP client (one shared connection pool per process)
+    transloc_timeout: float = 30.0
+    transloc_connect_timeout: float = 5.0
+    transloc_max_connections: int = 10
+    transloc_max_keepalive_connections: int = 5
+    transloc_keepalive_expiry: float = 30.0
+    
+    # TransLoc static data cache (TTLs in seconds)
+    transloc_cache_max_entries: int = 512
+    transloc_routes_ttl: float = 3600.0
+    transloc_stops_ttl: float = 3600.0
+    transloc_map_routes_ttl: float = 3600.0
+    # Empty answers are cached only this long, so they are retried soon
+    transloc_empty_ttl: float = 30.0
+    
+    # Static cache snapshot for warm restarts (relative paths are under the
+    # backend dir; empty disables it) and seconds between saves of changed data
+    transloc_snapshot_path: str = "data/transloc_static.snapshot"
+    transloc_snapshot_interval: float = 60.0
+    
+    # Upstream capture: "record" appends every TransLoc response (endpoint,
+    # params, status, latency, raw body) to the capture file, "replay" serves
+    # TransLoc calls from it instead of the network, "" (default) does neither.
+    # Replay runs `speed` capture seconds per second; its latency is "recorded",
+    # "synthetic" (log-normal with the given median/p99 seconds, seeded) or "none".
+    # Replay never reads or writes the static snapshot.
+    transloc_capture_mode: str = ""
+    transloc_capture_path: str = "data/transloc_capture.jsonl"
+    transloc_replay_speed: float = 1.0
+    transloc_replay_latency: str = "recorded"
+    transloc_replay_latency_median: float = 0.1
+    transloc_replay_latency_p99: float = 1.0
+    transloc_replay_seed: int = 0
+    
+    # Per-endpoint circuit breaker: opens when `failure_rate` of the last
+    # `window` calls failed (after at least `min_calls`), then probes again
+    # after `open_seconds`
+    transloc_breaker_failure_rate: float = 0.5
+    transloc_breaker_min_calls: int = 5
+    transloc_breaker_window: int = 20
+    transloc_breaker_open_seconds: float = 30.0
+    
+    # Adaptive timeouts and hedged GETs from per-endpoint latency percentiles.
+    # Once `min_samples` calls are seen, the timeout becomes p99 x multiplier
+    # (clamped to [min_timeout, transloc_timeout]) and a second request is
+    # sent when the first hasn't answered by the hedge percentile. Hedges are
+    # capped at `hedge_max_ratio` extra calls per request (0 disables them).
+    transloc_latency_window: int = 200
+    transloc_latency_min_samples: int = 20
+    transloc_timeout_multiplier: float = 3.0
+    transloc_min_timeout: float = 1.0
+    transloc_hedge_percentile: float = 0.95
+    transloc_hedge_min_delay: float = 0.05
+    transloc_hedge_max_ratio: float = 0.1
+    transloc_hedge_burst: float = 5.0
+    
+    # Oldest last known-good live response (arrival times) served during an outage
+    transloc_fallback_max_age: float = 600.0
+    
+    # Seconds between background GetMapVehiclePoints polls
+    vehicle_poll_interval: float = 5.0
+    
+    # Vehicle push streams: frames buffered per client before it is dropped,
+    # and seconds between SSE keep-alive comments
+    vehicle_stream_queue_size: int = 16
+    vehicle_stream_keepalive: float = 15.0
+    
+    # Vehicle snapping onto route lines: grid cell size of the segment index and
+    # farthest a vehicle may be from its line to count as on it (meters)
+    vehicle_snap_cell_size: float = 100.0
+    vehicle_snap_max_distance: float = 75.0
+    
+    # Where ETAs come from: "upstream" (GetStopArrivalTimes, with the local
+    # predictor filling in when it fails or returns nothing) or "local" (the
+    # predictor only, no arrival-times calls at all)
+    eta_source: str = "upstream"
+    map_vehicles_local_stops: int = 10
+    
+    # Local ETA predictor: positions kept per vehicle, longest poll gap (seconds)
+    # learned from, weight (meters) of the routing-speed prior per segment and
+    # decay of learned segment times per segment length driven
+    eta_history_length: int = 32
+    eta_max_gap: float = 60.0
+    eta_prior_meters: float = 200.0
+    eta_decay: float = 0.95
+    
+    # Vehicle history recorder: directory of daily columnar segments (relative
+    # paths are under the backend directory; empty disables recording), seconds
+    # between batched writes and builds queued before the oldest are dropped
+    history_recorder_path: str = ""
+    history_recorder_flush_interval: float = 10.0
+    history_recorder_max_pending: int = 1000
+    
+    # Versions of /map-vehicles diffs kept for ?since= requests
+    map_vehicles_diff_history: int = 64
+    
+    # Transfer routing (speeds in m/s, distances in meters)
+    routing_bus_speed: float = 6.0
+    routing_walk_speed: float = 1.3
+    routing_dwell_seconds: float = 20.0
+    routing_board_wait_seconds: float = 300.0  # expected wait when boarding
+    routing_transfer_radius: float = 300.0  # max walk between stops of a transfer
+    routing_transfer_penalty_seconds: float = 120.0
+    routing_max_transfers: int = 2
+    routing_latency_budget_ms: float = 5.0
+    
+    # Route search response cache (keys snap coordinates to a grid in meters)
+    route_search_cache_grid_meters: float = 25.0
+    route_search_cache_ttl: float = 15.0
+    route_search_cache_max_entries: int = 1024
+    
+    # Building/POI catalog: GeoJSON or CSV file (relative to the backend
+    # directory), seconds between change checks (0 disables hot reload), and
+    # how close a bare coordinate must be to a building to take its name
+    poi_catalog_path: str = "data/buildings.geojson"
+    poi_catalog_reload_interval: float = 5.0
+    poi_reverse_geocode_radius: float = 50.0
+    
+    # Cache-Control max-age (seconds) for /map-routes; clients revalidate via ETag
+    map_routes_max_age: int = 300
+    
+    # /map-routes?zoom=N: zoom levels with a precomputed simplified route line
+    # (higher zooms get the full line) and the allowed error in screen pixels
+    map_routes_zoom_levels: list = [11, 12, 13, 14, 15, 16]
+    map_routes_simplify_pixels: float = 1.0
+    
     # Server settings
     port: int = 5000
     host: str = "0.0.0.0"
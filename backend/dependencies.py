@@ -0,0 +1,20 @@
+from fastapi import Request
+from fastapi.requests import HTTPConnection
+from services.route_service import RouteService
+from services.transloc_api_service import TranslocApiService
+from services.vehicle_stream import VehicleStream
+
+
+def get_transloc_api_service(request: Request) -> TranslocApiService:
+    """Dependency to get the shared TranslocApiService created at startup."""
+    return request.app.state.transloc_api_service
+
+
+def get_route_service(request: Request) -> RouteService:
+    """Dependency to get the shared RouteService created at startup."""
+    return request.app.state.route_service
+
+
+def get_vehicle_stream(connection: HTTPConnection) -> VehicleStream:
+    """Dependency to get the shared vehicle update stream (HTTP or WebSocket)."""
+    return connection.app.state.vehicle_stream
@@ -5,16 +5,74 @@ from pathlib import Path
 backend_dir = Path(__file__).parent
 sys.path.insert(0, str(backend_dir))
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routers import route_search, buildings, health
+from services.history_recorder import HistoryRecorder
+from services.poi_catalog import get_poi_catalog
+from services.route_service import RouteService
+from services.transloc_api_service import TranslocApiService
+from services.vehicle_stream import VehicleStream
 from config import settings
 import uvicorn
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared services on startup and release them on shutdown."""
+    # One TranslocApiService (and one pooled HTTP client) for the whole process
+    app.state.transloc_api_service = TranslocApiService()
+    # Static data saved by the previous process, so startup is warm
+    snapshot_entries = app.state.transloc_api_service.load_snapshot()
+    # The POI catalog is loaded once per process and watched for file changes
+    app.state.poi_catalog = get_poi_catalog()
+    app.state.poi_catalog.start()
+    # Optional columnar history of vehicle positions and ETAs, written in batches
+    app.state.history_recorder = None
+    if settings.history_recorder_path:
+        history_path = Path(settings.history_recorder_path)
+        if not history_path.is_absolute():
+            history_path = backend_dir / history_path
+        app.state.history_recorder = HistoryRecorder(
+            history_path,
+            settings.history_recorder_flush_interval,
+            settings.history_recorder_max_pending
+        )
+        app.state.history_recorder.start()
+    # RouteService keeps derived indexes across requests, so it is shared too
+    app.state.route_service = RouteService(
+        app.state.transloc_api_service, app.state.poi_catalog, app.state.history_recorder
+    )
+    if snapshot_entries:
+        await app.state.route_service.warm_up(app.state.transloc_api_service.snapshot_route_ids)
+    # Vehicle polling and background revalidation of the snapshot start here
+    app.state.transloc_api_service.start()
+    # One producer turns each vehicle snapshot into frames for every stream client
+    app.state.vehicle_stream = VehicleStream(
+        app.state.transloc_api_service.vehicle_poller,
+        app.state.route_service,
+        settings.vehicle_stream_queue_size
+    )
+    app.state.vehicle_stream.start()
+    # Every vehicle snapshot feeds the ETA predictor, requests or not
+    app.state.route_service.start()
+    try:
+        yield
+    finally:
+        await app.state.vehicle_stream.stop()
+        await app.state.route_service.stop()
+        await app.state.poi_catalog.stop()
+        await app.state.transloc_api_service.close()
+        if app.state.history_recorder is not None:
+            await app.state.history_recorder.stop()
+
+
 app = FastAPI(
     title="BuzzBus API",
     description="API for finding bus routes at Georgia Tech",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS with origin validation for Vercel preview deployments
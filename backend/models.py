@@ -20,6 +20,7 @@ class ArrivalTime(BaseModel):
     on_time_status: Optional[int] = Field(None, alias="onTimeStatus")  # 0=on time, 2=early, 3=late
     vehicle_id: Optional[str] = Field(None, alias="vehicleId")
     vehicle_name: Optional[str] = Field(None, alias="vehicleName")
+    is_predicted: Optional[bool] = Field(None, alias="isPredicted")  # From the local ETA predictor, not TransLoc
 
 
 class StopInfo(BaseModel):
@@ -39,6 +40,33 @@ class RouteResult(BaseModel):
     begin_stop: StopInfo = Field(alias="beginStop")
     dest_stop: StopInfo = Field(alias="destStop")
     total_walking_distance: float = Field(alias="totalWalkingDistance")
+    estimated_arrival_seconds: Optional[int] = Field(None, alias="estimatedArrivalSeconds")  # door-to-door, from now
+
+
+class ItineraryLeg(BaseModel):
+    """One walk or ride leg of a multi-route itinerary."""
+    model_config = ConfigDict(populate_by_name=True)
+    
+    mode: str  # "walk" or "ride"
+    route_id: Optional[str] = Field(None, alias="routeId")
+    route_name: Optional[str] = Field(None, alias="routeName")
+    from_name: str = Field(alias="fromName")
+    from_route_stop_id: Optional[str] = Field(None, alias="fromRouteStopId")
+    to_name: str = Field(alias="toName")
+    to_route_stop_id: Optional[str] = Field(None, alias="toRouteStopId")
+    distance: float  # meters
+    duration_seconds: int = Field(alias="durationSeconds")
+    stop_count: int = Field(default=0, alias="stopCount")  # stops ridden (ride legs only)
+
+
+class Itinerary(BaseModel):
+    """A trip that needs one or more transfers between routes."""
+    model_config = ConfigDict(populate_by_name=True)
+    
+    transfers: int
+    total_seconds: int = Field(alias="totalSeconds")  # estimated door-to-door time
+    total_walking_distance: float = Field(alias="totalWalkingDistance")
+    legs: List[ItineraryLeg] = Field(default_factory=list)
 
 
 class RouteSearchRequest(BaseModel):
@@ -58,6 +86,8 @@ class RouteSearchResponse(BaseModel):
     dest_building: str = Field(default="", alias="destBuilding")
     begin_location: str = Field(default="", alias="beginLocation")
     dest_location: str = Field(default="", alias="destLocation")
+    transfer_itineraries: List[Itinerary] = Field(default_factory=list, alias="transferItineraries")
+    data_age_seconds: Optional[int] = Field(None, alias="dataAgeSeconds")  # set when live data is from a fallback
 
 
 class MapStop(BaseModel):
@@ -114,4 +144,18 @@ class MapVehicle(BaseModel):
     is_on_route: bool = Field(default=False, alias="isOnRoute")
     is_delayed: bool = Field(default=False, alias="isDelayed")
     stops: List[VehicleStop] = Field(default_factory=list)  # Stops this vehicle serves
+    # Progress from snapping the position onto the route line (None when off it), meters
+    distance_along_route: Optional[float] = Field(None, alias="distanceAlongRoute")
+    distance_from_route: Optional[float] = Field(None, alias="distanceFromRoute")
+    next_route_stop_id: Optional[str] = Field(None, alias="nextRouteStopId")  # next stop by Order
+    distance_to_next_stop: Optional[float] = Field(None, alias="distanceToNextStop")
+
 
+class MapVehiclesDelta(BaseModel):
+    """Changes to /map-vehicles since a client's version; the whole list when `full`."""
+    model_config = ConfigDict(populate_by_name=True)
+    
+    version: int
+    full: bool = False
+    vehicles: List[MapVehicle] = Field(default_factory=list)  # Added or modified vehicles
+    removed: List[str] = Field(default_factory=list)  # Vehicle IDs no longer reported
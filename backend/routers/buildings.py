@@ -1,17 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List
+from models import Building
 from services.route_service import RouteService
-from services.transloc_api_service import TranslocApiService
+from dependencies import get_route_service
 
 router = APIRouter(prefix="/api/buildings", tags=["Buildings"])
 
 
-def get_route_service() -> RouteService:
-    """Dependency to get RouteService instance."""
-    transloc_service = TranslocApiService()
-    return RouteService(transloc_service)
-
-
 @router.get("", response_model=List[str])
 async def get_buildings(
     route_service: RouteService = Depends(get_route_service)
@@ -23,3 +18,32 @@ async def get_buildings(
     except Exception as ex:
         raise HTTPException(status_code=500, detail=str(ex))
 
+
+@router.get("/search", response_model=List[Building])
+async def search_buildings(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    route_service: RouteService = Depends(get_route_service)
+):
+    """Autocomplete building names (prefix of the name or any word, then fuzzy)."""
+    try:
+        return await route_service.search_buildings(q, limit)
+    except Exception as ex:
+        raise HTTPException(status_code=500, detail=str(ex))
+
+
+@router.get("/nearest", response_model=Building)
+async def nearest_building(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius: float = Query(200.0, gt=0, le=5000),
+    route_service: RouteService = Depends(get_route_service)
+):
+    """Get the building closest to a coordinate, within `radius` meters."""
+    try:
+        nearest = await route_service.nearest_building(lat, lng, radius)
+    except Exception as ex:
+        raise HTTPException(status_code=500, detail=str(ex))
+    if nearest is None:
+        raise HTTPException(status_code=404, detail="No building within radius")
+    return nearest[0]
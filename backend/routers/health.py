@@ -1,4 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from services.route_service import RouteService
+from services.transloc_api_service import TranslocApiService
+from services.vehicle_stream import VehicleStream
+from dependencies import get_route_service, get_transloc_api_service, get_vehicle_stream
 
 router = APIRouter(prefix="/api/health", tags=["Health"])
 
@@ -8,3 +12,16 @@ async def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
 
+
+@router.get("/metrics")
+async def upstream_metrics(
+    transloc_api_service: TranslocApiService = Depends(get_transloc_api_service),
+    route_service: RouteService = Depends(get_route_service),
+    vehicle_stream: VehicleStream = Depends(get_vehicle_stream)
+):
+    """Counters for the shared TransLoc client, RouteService caches and streams."""
+    return {
+        **transloc_api_service.get_metrics(),
+        **route_service.get_metrics(),
+        "vehicleStream": vehicle_stream.metrics(),
+    }
@@ -1,17 +1,18 @@
-from fastapi import APIRouter, HTTPException, Depends
-from models import RouteSearchRequest, RouteSearchResponse, MapRoute, MapVehicle
+import asyncio
+from typing import List, Optional, Union
+
+import orjson
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from config import settings
+from models import RouteSearchRequest, RouteSearchResponse, MapRoute, MapVehicle, MapVehiclesDelta
 from services.route_service import RouteService
-from services.transloc_api_service import TranslocApiService
+from services.vehicle_stream import VehicleStream
+from dependencies import get_route_service, get_vehicle_stream
 
 router = APIRouter(prefix="/api/RouteSearch", tags=["Route Search"])
 
 
-def get_route_service() -> RouteService:
-    """Dependency to get RouteService instance."""
-    transloc_service = TranslocApiService()
-    return RouteService(transloc_service)
-
-
 @router.post("", response_model=RouteSearchResponse)
 async def find_routes(
     request: RouteSearchRequest,
@@ -39,15 +40,12 @@ async def find_routes(
 
         # Validate building names if provided
         if request.begin_building or request.dest_building:
-            buildings = await route_service.get_buildings()
-            building_names = {b.name for b in buildings}
-
-            if request.begin_building and request.begin_building not in building_names:
+            if request.begin_building and not await route_service.get_building(request.begin_building):
                 raise HTTPException(
                     status_code=400,
                     detail="Invalid begin building name"
                 )
-            if request.dest_building and request.dest_building not in building_names:
+            if request.dest_building and not await route_service.get_building(request.dest_building):
                 raise HTTPException(
                     status_code=400,
                     detail="Invalid destination building name"
@@ -62,26 +60,133 @@ async def find_routes(
         raise HTTPException(status_code=500, detail=str(ex))
 
 
-@router.get("/map-routes")
+@router.get("/map-routes", response_model=List[MapRoute])
 async def get_map_routes(
+    request: Request,
+    zoom: Optional[int] = Query(None, ge=0, le=22),
     route_service: RouteService = Depends(get_route_service)
 ):
-    """Get routes with map information."""
+    """Get routes with map information.
+
+    With `?zoom=N` each encodedPolyline is simplified to the detail visible
+    at that map zoom level; without it the full upstream line is returned.
+    The body is served pre-serialized with an ETag; a matching If-None-Match
+    gets an empty 304.
+    """
     try:
-        routes = await route_service.get_map_routes()
-        return routes
+        body, etag = await route_service.get_map_routes_payload(zoom)
     except Exception as ex:
         raise HTTPException(status_code=500, detail=str(ex))
 
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.map_routes_max_age}, must-revalidate"
+    }
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
-@router.get("/map-vehicles")
+
+@router.get("/map-vehicles", response_model=Union[List[MapVehicle], MapVehiclesDelta])
 async def get_map_vehicles(
+    since: Optional[int] = Query(None, ge=0),
     route_service: RouteService = Depends(get_route_service)
 ):
-    """Get vehicles for map display."""
+    """Get vehicles for map display.
+
+    The snapshot version is returned in X-Vehicles-Version and the age in
+    seconds of the underlying upstream data in X-Data-Age. With `?since=` the
+    response is a MapVehiclesDelta holding only vehicles changed after that
+    version plus removed IDs (or the full list if the version is too old).
+    """
     try:
-        vehicles = await route_service.get_map_vehicles()
-        return vehicles
+        if since is not None:
+            delta = await route_service.get_map_vehicles_since(since)
+            version, body = delta["version"], orjson.dumps(delta)
+        else:
+            version, body = await route_service.get_map_vehicles_payload()
     except Exception as ex:
         raise HTTPException(status_code=500, detail=str(ex))
 
+    headers = {"X-Vehicles-Version": str(version)}
+    data_age = route_service.get_map_vehicles_data_age()
+    if data_age is not None:
+        headers["X-Data-Age"] = str(int(data_age))
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.websocket("/map-vehicles/ws")
+async def stream_map_vehicles_ws(
+    websocket: WebSocket,
+    vehicle_stream: VehicleStream = Depends(get_vehicle_stream)
+):
+    """Push vehicle updates: a keyframe on connect, then delta frames."""
+    await websocket.accept()
+    subscription = vehicle_stream.subscribe()
+
+    async def wait_for_disconnect():
+        # Clients don't send anything; this notices a close right away, so an
+        # idle stream stops building frames without waiting for a failed send
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    disconnected = asyncio.ensure_future(wait_for_disconnect())
+    try:
+        while True:
+            next_frame = asyncio.ensure_future(subscription.get())
+            await asyncio.wait((next_frame, disconnected), return_when=asyncio.FIRST_COMPLETED)
+            if not next_frame.done():
+                next_frame.cancel()
+                return
+            frame = next_frame.result()
+            if frame is None:
+                # Dropped for falling behind; the client should reconnect
+                await websocket.close(code=1013)
+                return
+            await websocket.send_text(frame)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        disconnected.cancel()
+        vehicle_stream.unsubscribe(subscription)
+
+
+@router.get("/map-vehicles/stream")
+async def stream_map_vehicles_sse(
+    vehicle_stream: VehicleStream = Depends(get_vehicle_stream)
+):
+    """Server-Sent Events version of the vehicle update stream."""
+    subscription = vehicle_stream.subscribe()
+
+    async def events():
+        try:
+            while True:
+                try:
+                    frame = await asyncio.wait_for(
+                        subscription.get(), timeout=settings.vehicle_stream_keepalive
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if frame is None:
+                    return
+                yield f"data: {frame}\n\n"
+        finally:
+            vehicle_stream.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check an If-None-Match header value against an ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
@@ -0,0 +1,93 @@
+import time
+from collections import deque
+from typing import Any, Deque, Dict
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker for one upstream endpoint.
+
+    Closed: calls go through and outcomes fill a rolling window of the last
+    `window` calls. Once at least `min_calls` are recorded and the failure
+    rate reaches `failure_rate`, the circuit opens and calls are refused
+    without touching the network. After `open_seconds` it goes half-open and
+    lets `half_open_probes` calls through; a success closes it again, a
+    failure re-opens it for another `open_seconds`. A probe that never
+    reports back (e.g. cancelled) stops blocking new probes after
+    `open_seconds`.
+    """
+
+    def __init__(
+        self,
+        failure_rate: float = 0.5,
+        min_calls: int = 5,
+        window: int = 20,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 1
+    ):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.rejected = 0
+        self.times_opened = 0
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._probes_in_flight = 0
+        self._probe_started = 0.0
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now (counts as a probe when half-open)."""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._probes_in_flight = 0
+
+        if self.state == HALF_OPEN:
+            now = time.monotonic()
+            if self._probes_in_flight >= self.half_open_probes:
+                if now - self._probe_started < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self._probes_in_flight = 0
+            self._probes_in_flight += 1
+            self._probe_started = now
+        return True
+
+    def record_success(self):
+        if self.state == HALF_OPEN:
+            self.state = CLOSED
+            self._outcomes.clear()
+        self._outcomes.append(True)
+
+    def record_failure(self):
+        if self.state == HALF_OPEN:
+            self._open()
+            return
+        self._outcomes.append(False)
+        failures = self._outcomes.count(False)
+        if (
+            self.state == CLOSED
+            and len(self._outcomes) >= self.min_calls
+            and failures / len(self._outcomes) >= self.failure_rate
+        ):
+            self._open()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failureRate": round(self._outcomes.count(False) / len(self._outcomes), 2) if self._outcomes else 0.0,
+            "timesOpened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self._outcomes.clear()
+        self._probes_in_flight = 0
@@ -0,0 +1,35 @@
+from collections import deque
+from typing import Deque, FrozenSet, Optional, Set, Tuple
+
+
+class DiffRing:
+    """Bounded history of which items changed between consecutive versions.
+
+    Each entry records the IDs that were added or modified and the IDs that
+    were removed going from one version to the next. A client holding an older
+    version can be brought up to date with just those items, as long as its
+    version is still covered by the history; otherwise it needs a full reload.
+    """
+
+    def __init__(self, max_entries: int):
+        # (from_version, to_version, changed IDs, removed IDs), oldest first
+        self.entries: Deque[Tuple[int, int, FrozenSet[str], FrozenSet[str]]] = deque(maxlen=max_entries)
+
+    def record(self, from_version: int, to_version: int, changed: FrozenSet[str], removed: FrozenSet[str]):
+        self.entries.append((from_version, to_version, changed, removed))
+
+    def since(self, version: int) -> Optional[Tuple[Set[str], Set[str]]]:
+        """IDs (changed, removed) after `version`, or None if it is too old to tell."""
+        if not self.entries or version < self.entries[0][0]:
+            return None
+
+        changed: Set[str] = set()
+        removed: Set[str] = set()
+        for _, to_version, entry_changed, entry_removed in self.entries:
+            if to_version <= version:
+                continue
+            changed |= entry_changed
+            changed -= entry_removed
+            removed |= entry_removed
+            removed -= entry_changed
+        return changed, removed
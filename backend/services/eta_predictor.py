@@ -0,0 +1,264 @@
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.route_snapper import RouteSnapper, SnapResult
+
+# Backwards moves this small are GPS noise of a stopped bus, not a turn-around
+JITTER_METERS = 20.0
+
+# (timestamp, route_id, meters along the route line)
+Position = Tuple[float, str, float]
+
+
+class EtaPredictor:
+    """Learns stop-to-stop travel times from snapped vehicle positions.
+
+    Every observed poll appends each on-route vehicle's (time, route,
+    distance along) to a per-vehicle ring buffer. Consecutive positions give
+    the seconds a bus spent covering a stretch of line; that time is split
+    over the stop-to-stop segments the stretch crosses (all of it to the
+    current segment while the bus stands still, so dwell and layovers count).
+    Each segment keeps sums of seconds and meters that decay by `decay` per
+    segment length driven through it, so they weigh roughly the last
+    1 / (1 - decay) traversals whatever the poll rate. Its pace (seconds per
+    meter) is those sums shrunk towards a prior of `bus_speed` plus
+    `dwell_seconds` per stop, so a segment nobody has driven yet still gets a
+    sensible estimate.
+
+    Predictions need no network call: seconds from a position to a stop are
+    the difference of cumulative segment times along the route, wrapping
+    around loops. Learned values are keyed by (route ID, stop ID) and survive
+    a rebuild of the RouteSnapper.
+    """
+
+    def __init__(
+        self,
+        bus_speed: float = 6.0,
+        dwell_seconds: float = 20.0,
+        history: int = 32,
+        max_gap: float = 60.0,
+        max_speed: float = 30.0,
+        prior_meters: float = 200.0,
+        decay: float = 0.95
+    ):
+        self.bus_speed = bus_speed
+        self.dwell_seconds = dwell_seconds
+        self.history_length = history
+        self.max_gap = max_gap
+        self.max_speed = max_speed
+        self.prior_meters = prior_meters
+        self.decay = decay
+
+        self.history: Dict[str, Deque[Position]] = {}
+        # (route_id, route_stop_id of the segment start) -> decayed (seconds, meters)
+        self._seconds: Dict[Tuple[str, str], float] = {}
+        self._meters: Dict[Tuple[str, str], float] = {}
+        # route code -> (pace per segment row, cumulative seconds per stop row, loop seconds)
+        self._route_times: Dict[int, Tuple[np.ndarray, np.ndarray, float]] = {}
+        self._snapper: Optional[RouteSnapper] = None
+        self.observations = 0
+        self.last_observed = 0.0
+
+    def observe(
+        self,
+        snapper: RouteSnapper,
+        vehicle_ids: Sequence[Optional[str]],
+        route_ids: Sequence[str],
+        snapped: SnapResult,
+        timestamp: float
+    ):
+        """Learn from one poll: rows of `snapped` match `vehicle_ids`/`route_ids`."""
+        if timestamp <= self.last_observed:
+            return  # already seen (or out of order)
+        self.last_observed = timestamp
+        self._use(snapper)
+
+        for i, vehicle_id in enumerate(vehicle_ids):
+            if vehicle_id is None or not snapped.on_route[i]:
+                continue
+            route_id = route_ids[i]
+            along = float(snapped.distance_along[i])
+            positions = self.history.get(vehicle_id)
+            if positions is None:
+                positions = self.history[vehicle_id] = deque(maxlen=self.history_length)
+            if positions:
+                self._learn(snapper, positions[-1], (timestamp, route_id, along))
+            positions.append((timestamp, route_id, along))
+
+        # Forget vehicles that stopped reporting
+        gone = [v for v, positions in self.history.items() if timestamp - positions[-1][0] > 10 * self.max_gap]
+        for vehicle_id in gone:
+            del self.history[vehicle_id]
+        self._route_times.clear()
+
+    def travel_seconds(self, snapper: RouteSnapper, route_id: str, along: float, row: int) -> Optional[float]:
+        """Predicted seconds from `along` on a route to stop `row`, or None if it won't get there."""
+        code = snapper.route_codes.get(route_id)
+        if code is None:
+            return None
+        self._use(snapper)
+        pace, cumulative, loop_seconds = self._times(code)
+        lo = int(snapper.stop_lo[code])
+        seconds = float(cumulative[row - lo]) - self._seconds_at(snapper, code, along, pace, cumulative)
+        if seconds < 0:
+            if not snapper.is_loop[code]:
+                return None
+            seconds += loop_seconds
+        return seconds
+
+    def arrivals(
+        self,
+        snapper: RouteSnapper,
+        route_id: str,
+        route_stop_id: str,
+        now: float,
+        limit: int
+    ) -> List[Tuple[str, int]]:
+        """(vehicle ID, seconds) of the next `limit` arrivals at a stop, earliest first.
+
+        Uses each vehicle's latest position, aged to `now`; vehicles not seen
+        within `max_gap` seconds are left out.
+        """
+        row = snapper.stop_rows.get((route_id, route_stop_id))
+        if row is None:
+            return []
+        result = []
+        for vehicle_id, positions in self.history.items():
+            observed_at, vehicle_route, along = positions[-1]
+            if vehicle_route != route_id or now - observed_at > self.max_gap:
+                continue
+            seconds = self.travel_seconds(snapper, route_id, along, row)
+            if seconds is not None:
+                result.append((vehicle_id, int(round(max(0.0, seconds - (now - observed_at))))))
+        result.sort(key=lambda item: item[1])
+        return result[:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "vehicles": len(self.history),
+            "positions": sum(len(positions) for positions in self.history.values()),
+            "observations": self.observations,
+            "learnedSegments": len(self._seconds),
+        }
+
+    def _use(self, snapper: RouteSnapper):
+        if snapper is not self._snapper:
+            self._snapper = snapper
+            self._route_times.clear()
+
+    def _learn(self, snapper: RouteSnapper, before: Position, after: Position):
+        """Split the seconds between two positions of one vehicle over the segments crossed."""
+        t0, route0, a0 = before
+        t1, route_id, a1 = after
+        dt = t1 - t0
+        code = snapper.route_codes.get(route_id)
+        if route0 != route_id or code is None or not 0 < dt <= self.max_gap:
+            return
+        length = float(snapper.route_length[code])
+        moved = a1 - a0
+        if moved < 0 and snapper.is_loop[code] and moved < -length / 2:
+            moved += length  # crossed the loop's start
+        if -JITTER_METERS <= moved < 0:
+            moved = 0.0  # standing still; the fix wandered back a little
+        if moved < 0 or moved > self.max_speed * dt:
+            return  # turned back or an implausible jump
+
+        lo, hi = int(snapper.stop_lo[code]), int(snapper.stop_hi[code])
+        if hi - lo < 2:
+            return
+        stop_along = snapper.stop_along[lo:hi]
+        if moved == 0:
+            key = (route_id, snapper.stop(lo + self._segment(snapper, code, a0))[0])
+            self._seconds[key] = self._seconds.get(key, 0.0) + dt
+            self.observations += 1
+            return
+
+        # Walk the stretch segment by segment
+        position, remaining = a0, moved
+        while remaining > 1e-6:
+            segment = self._segment(snapper, code, position)
+            if segment == hi - lo - 1:
+                end = float(stop_along[0]) + length if snapper.is_loop[code] else length
+                if position < stop_along[0]:
+                    end = float(stop_along[0])
+            else:
+                end = float(stop_along[segment + 1])
+            step = min(remaining, max(end - position, 0.0))
+            if step <= 0:
+                step = remaining  # past the last stop of an open route
+            key = (route_id, snapper.stop(lo + segment)[0])
+            decay = self.decay ** (step / max(self._segment_length(snapper, code, segment), 1.0))
+            self._seconds[key] = self._seconds.get(key, 0.0) * decay + dt * step / moved
+            self._meters[key] = self._meters.get(key, 0.0) * decay + step
+            position += step
+            remaining -= step
+            if snapper.is_loop[code] and position >= length:
+                position -= length
+        self.observations += 1
+
+    @staticmethod
+    def _segment(snapper: RouteSnapper, code: int, along: float) -> int:
+        """Index (within the route) of the stop-to-stop segment containing `along`."""
+        lo, hi = int(snapper.stop_lo[code]), int(snapper.stop_hi[code])
+        index = int(np.searchsorted(snapper.stop_along[lo:hi], along, side="right")) - 1
+        if index < 0:
+            # Before the first stop: a loop's last segment, or an open route's first
+            return hi - lo - 1 if snapper.is_loop[code] else 0
+        return index
+
+    @staticmethod
+    def _segment_length(snapper: RouteSnapper, code: int, segment: int) -> float:
+        """Meters from stop `segment` of a route to the next one (wrapping on loops)."""
+        lo, hi = int(snapper.stop_lo[code]), int(snapper.stop_hi[code])
+        start = float(snapper.stop_along[lo + segment])
+        if lo + segment + 1 < hi:
+            return float(snapper.stop_along[lo + segment + 1]) - start
+        if snapper.is_loop[code]:
+            return float(snapper.stop_along[lo]) + float(snapper.route_length[code]) - start
+        return float(snapper.route_length[code]) - start
+
+    def _times(self, code: int) -> Tuple[np.ndarray, np.ndarray, float]:
+        """Pace per segment, cumulative seconds to each stop and one lap's seconds for a route."""
+        cached = self._route_times.get(code)
+        if cached is not None:
+            return cached
+
+        snapper = self._snapper
+        lo, hi = int(snapper.stop_lo[code]), int(snapper.stop_hi[code])
+        stop_along = snapper.stop_along[lo:hi]
+        route_length = float(snapper.route_length[code])
+        lengths = np.diff(stop_along, append=stop_along[0] + route_length if snapper.is_loop[code] else stop_along[-1])
+        lengths = np.maximum(lengths, 1.0)
+
+        pace = np.empty(hi - lo)
+        route_id = snapper.route_ids[code]
+        for k in range(hi - lo):
+            key = (route_id, snapper.stop(lo + k)[0])
+            prior = 1.0 / self.bus_speed + self.dwell_seconds / lengths[k]
+            pace[k] = (self._seconds.get(key, 0.0) + prior * self.prior_meters) / (
+                self._meters.get(key, 0.0) + self.prior_meters
+            )
+        segment_seconds = pace * lengths
+        cumulative = np.concatenate(([0.0], np.cumsum(segment_seconds)[:-1])) if hi > lo else np.zeros(0)
+        loop_seconds = float(segment_seconds.sum()) if snapper.is_loop[code] else 0.0
+        self._route_times[code] = (pace, cumulative, loop_seconds)
+        return self._route_times[code]
+
+    def _seconds_at(
+        self,
+        snapper: RouteSnapper,
+        code: int,
+        along: float,
+        pace: np.ndarray,
+        cumulative: np.ndarray
+    ) -> float:
+        """Cumulative seconds (same origin as `cumulative`) at a position along the route."""
+        lo = int(snapper.stop_lo[code])
+        segment = self._segment(snapper, code, along)
+        start = float(snapper.stop_along[lo + segment])
+        offset = along - start
+        if offset < 0 and snapper.is_loop[code]:
+            offset += float(snapper.route_length[code])
+        return float(cumulative[segment]) + max(offset, 0.0) * float(pace[segment])
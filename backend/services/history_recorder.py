@@ -0,0 +1,356 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import orjson
+
+logger = logging.getLogger(__name__)
+
+HISTORY_FORMAT = 1
+
+# Fixed-width columns of each table. Coordinates are stored as integer
+# microdegrees (about 0.1 m), IDs as codes into the segment's ID tables and
+# missing numbers as NaN (floats) or -1 (ints).
+TABLES: Dict[str, Dict[str, str]] = {
+    "vehicles": {
+        "time": "<f8",
+        "vehicle": "<u4",
+        "route": "<u4",
+        "latitude": "<i4",
+        "longitude": "<i4",
+        "speed": "<f4",
+        "heading": "<f4",
+        "along": "<f4",
+        "flags": "u1",
+    },
+    "arrivals": {
+        "time": "<f8",
+        "vehicle": "<u4",
+        "route": "<u4",
+        "stop": "<u4",
+        "seconds": "<i4",
+        "flags": "u1",
+    },
+}
+
+# Bits of the vehicles "flags" column
+ON_ROUTE = 1
+DELAYED = 2
+# Bits of the arrivals "flags" column
+PREDICTED = 1
+
+MICRODEGREES = 1e6
+
+
+def day_of(timestamp: float) -> str:
+    """The (UTC) day segment a unix timestamp belongs to."""
+    return time.strftime("%Y-%m-%d", time.gmtime(timestamp))
+
+
+class HistoryRecorder:
+    """Appends every /map-vehicles build to daily columnar segment files.
+
+    Each UTC day is a directory holding one file per column per table (see
+    TABLES) plus meta.json with the column types and the interned vehicle,
+    route and stop ID tables. Columns are raw little-endian arrays, so a day
+    can be memory-mapped and scanned without parsing (see HistoryReader).
+
+    record() only queues a reference to the (immutable) build on the event
+    loop; a background task converts and appends the queued builds in a
+    worker thread every `flush_interval` seconds. If the disk falls behind,
+    the oldest queued builds are dropped beyond `max_pending`.
+    """
+
+    def __init__(self, directory: Path, flush_interval: float = 10.0, max_pending: int = 1000):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.rows_written = {name: 0 for name in TABLES}
+        self.flushes = 0
+        self.flush_failures = 0
+        self.dropped = 0
+        self._pending: List[Tuple[float, Sequence[Dict[str, Any]], bool]] = []
+        # day -> {"vehicle"|"route"|"stop": (ID list, ID -> code)}; touched by the writer only
+        self._ids: Dict[str, Dict[str, Tuple[List[str], Dict[str, int]]]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._flushing: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the periodic background flush."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic flush and write whatever is still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def record(self, timestamp: float, vehicles: Sequence[Dict[str, Any]], predicted: bool = False):
+        """Queue one build of MapVehicle-shaped dicts (with their stop lists) for writing.
+
+        `predicted` marks the stop lists as coming from the local ETA predictor.
+        """
+        if not timestamp:
+            return
+        self._pending.append((timestamp, vehicles, predicted))
+        if len(self._pending) > self.max_pending:
+            del self._pending[0]
+            self.dropped += 1
+
+    async def flush(self):
+        """Write the queued builds now (in a worker thread); concurrent callers share one write."""
+        while self._flushing is not None and not self._flushing.done():
+            await asyncio.shield(self._flushing)
+        if self._pending:
+            self._flushing = asyncio.create_task(self._flush())
+            await asyncio.shield(self._flushing)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "vehicleRows": self.rows_written["vehicles"],
+            "arrivalRows": self.rows_written["arrivals"],
+            "flushes": self.flushes,
+            "flushFailures": self.flush_failures,
+            "dropped": self.dropped,
+        }
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def _flush(self):
+        batch, self._pending = self._pending, []
+        try:
+            await asyncio.to_thread(self._write, batch)
+            self.flushes += 1
+        except Exception as ex:
+            self.flush_failures += 1
+            logger.error(f"Failed to write vehicle history to {self.directory}: {ex}")
+
+    def _write(self, batch: List[Tuple[float, Sequence[Dict[str, Any]], bool]]):
+        """Convert queued builds to columns and append them, one day segment at a time."""
+        by_day: Dict[str, List[Tuple[float, Sequence[Dict[str, Any]], bool]]] = {}
+        for entry in batch:
+            by_day.setdefault(day_of(entry[0]), []).append(entry)
+
+        for day, entries in by_day.items():
+            segment = self.directory / day
+            segment.mkdir(parents=True, exist_ok=True)
+            ids = self._day_ids(day, segment)
+            columns = {
+                "vehicles": self._vehicle_columns(entries, ids),
+                "arrivals": self._arrival_columns(entries, ids),
+            }
+            # IDs first: rows must never reference a code the meta file lacks
+            self._write_meta(segment, ids)
+            for table, table_columns in columns.items():
+                self._align_columns(segment, table)
+                for name, values in table_columns.items():
+                    with open(segment / f"{table}.{name}", "ab") as f:
+                        f.write(values.tobytes())
+                self.rows_written[table] += len(table_columns["time"])
+
+        # Only today's (and at most yesterday's) ID tables are needed again
+        for day in sorted(self._ids)[:-2]:
+            del self._ids[day]
+
+    @staticmethod
+    def _align_columns(segment: Path, table: str):
+        """Cut a table's column files back to their common row count.
+
+        A write that failed part way leaves some columns a batch longer than
+        the others; appending on top of that would misalign every later row.
+        """
+        sizes = {}
+        for name, dtype in TABLES[table].items():
+            path = segment / f"{table}.{name}"
+            sizes[path] = (path.stat().st_size if path.exists() else 0, np.dtype(dtype).itemsize)
+        rows = min(size // itemsize for size, itemsize in sizes.values())
+        for path, (size, itemsize) in sizes.items():
+            if size != rows * itemsize:
+                logger.warning(f"Truncating {path} to {rows} rows after an incomplete write")
+                with open(path, "ab") as f:
+                    f.truncate(rows * itemsize)
+
+    def _day_ids(self, day: str, segment: Path) -> Dict[str, Tuple[List[str], Dict[str, int]]]:
+        """The day's ID tables, reloaded from its meta.json after a restart."""
+        ids = self._ids.get(day)
+        if ids is None:
+            saved: Dict[str, List[str]] = {}
+            try:
+                with open(segment / "meta.json", "rb") as f:
+                    saved = orjson.loads(f.read()).get("ids", {})
+            except FileNotFoundError:
+                pass
+            ids = {}
+            for kind in ("vehicle", "route", "stop"):
+                values = [str(value) for value in saved.get(kind, [])]
+                ids[kind] = (values, {value: code for code, value in enumerate(values)})
+            self._ids[day] = ids
+        return ids
+
+    @staticmethod
+    def _intern(table: Tuple[List[str], Dict[str, int]], value: Any) -> int:
+        values, codes = table
+        value = str(value) if value is not None else ""
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+    def _vehicle_columns(self, entries, ids) -> Dict[str, np.ndarray]:
+        rows = [
+            (
+                timestamp,
+                self._intern(ids["vehicle"], vehicle.get("vehicleId")),
+                self._intern(ids["route"], vehicle.get("routeId")),
+                round(vehicle.get("latitude", 0.0) * MICRODEGREES),
+                round(vehicle.get("longitude", 0.0) * MICRODEGREES),
+                vehicle.get("groundSpeed", math.nan),
+                vehicle.get("heading", math.nan),
+                math.nan if vehicle.get("distanceAlongRoute") is None else vehicle["distanceAlongRoute"],
+                (ON_ROUTE if vehicle.get("isOnRoute") else 0) | (DELAYED if vehicle.get("isDelayed") else 0),
+            )
+            for timestamp, vehicles, _ in entries
+            for vehicle in vehicles
+        ]
+        return self._columns("vehicles", rows)
+
+    def _arrival_columns(self, entries, ids) -> Dict[str, np.ndarray]:
+        rows = []
+        for timestamp, vehicles, predicted in entries:
+            flags = PREDICTED if predicted else 0
+            for vehicle in vehicles:
+                vehicle_code = self._intern(ids["vehicle"], vehicle.get("vehicleId"))
+                route_code = self._intern(ids["route"], vehicle.get("routeId"))
+                for stop in vehicle.get("stops") or []:
+                    seconds = stop.get("arrivalSeconds")
+                    rows.append((
+                        timestamp,
+                        vehicle_code,
+                        route_code,
+                        self._intern(ids["stop"], stop.get("routeStopId")),
+                        -1 if seconds is None else seconds,
+                        flags,
+                    ))
+        return self._columns("arrivals", rows)
+
+    @staticmethod
+    def _columns(table: str, rows: List[tuple]) -> Dict[str, np.ndarray]:
+        """Split row tuples into one typed array per column of `table`."""
+        dtypes = TABLES[table]
+        if not rows:
+            return {name: np.zeros(0, dtype) for name, dtype in dtypes.items()}
+        return {
+            name: np.asarray(values, dtype=dtype)
+            for (name, dtype), values in zip(dtypes.items(), zip(*rows))
+        }
+
+    @staticmethod
+    def _write_meta(segment: Path, ids: Dict[str, Tuple[List[str], Dict[str, int]]]):
+        body = orjson.dumps({
+            "format": HISTORY_FORMAT,
+            "tables": TABLES,
+            "ids": {kind: values for kind, (values, _) in ids.items()},
+        })
+        tmp_path = segment / "meta.json.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, segment / "meta.json")
+
+
+class HistorySegment:
+    """One recorded day, with its columns memory-mapped read-only.
+
+    `table("vehicles")` returns {column: array}; all columns of a table have
+    the same length (a torn final write is cut off). `ids[kind][code]` maps
+    the vehicle/route/stop codes back to IDs and code() goes the other way,
+    for vectorized filters like `cols["route"] == segment.code("route", "4")`.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.day = directory.name
+        with open(directory / "meta.json", "rb") as f:
+            meta = orjson.loads(f.read())
+        if meta.get("format") != HISTORY_FORMAT:
+            raise ValueError(f"Unknown vehicle history format in {directory}")
+        self.tables: Dict[str, Dict[str, str]] = meta["tables"]
+        self.ids: Dict[str, List[str]] = meta["ids"]
+        self._codes = {kind: {value: code for code, value in enumerate(values)} for kind, values in self.ids.items()}
+        self._mapped: Dict[str, Dict[str, np.ndarray]] = {}
+
+    def code(self, kind: str, value: str) -> Optional[int]:
+        """The code of a vehicle/route/stop ID in this segment, or None if it never appeared."""
+        return self._codes.get(kind, {}).get(value)
+
+    def table(self, name: str) -> Dict[str, np.ndarray]:
+        cached = self._mapped.get(name)
+        if cached is not None:
+            return cached
+
+        columns = {}
+        for column, dtype in self.tables[name].items():
+            path = self.directory / f"{name}.{column}"
+            size = path.stat().st_size if path.exists() else 0
+            itemsize = np.dtype(dtype).itemsize
+            if size < itemsize:
+                columns[column] = np.zeros(0, dtype)
+            else:
+                columns[column] = np.memmap(path, dtype=dtype, mode="r", shape=(size // itemsize,))
+        rows = min(len(values) for values in columns.values())
+        self._mapped[name] = {column: values[:rows] for column, values in columns.items()}
+        return self._mapped[name]
+
+    @property
+    def vehicles(self) -> Dict[str, np.ndarray]:
+        return self.table("vehicles")
+
+    @property
+    def arrivals(self) -> Dict[str, np.ndarray]:
+        return self.table("arrivals")
+
+
+class HistoryReader:
+    """Read access to a HistoryRecorder directory, one day segment at a time.
+
+        reader = HistoryReader(Path("data/history"))
+        for segment in reader.scan("2026-10-01", "2026-10-07"):
+            cols = segment.vehicles
+            on_route_4 = cols["route"] == segment.code("route", "4")
+            ...
+
+    Segments map their files lazily; the day being written can be read at
+    the same time and simply shows the rows flushed so far.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+
+    def days(self) -> List[str]:
+        if not self.directory.is_dir():
+            return []
+        return sorted(path.name for path in self.directory.iterdir() if (path / "meta.json").exists())
+
+    def segment(self, day: str) -> HistorySegment:
+        return HistorySegment(self.directory / day)
+
+    def scan(self, first_day: Optional[str] = None, last_day: Optional[str] = None) -> Iterator[HistorySegment]:
+        """Segments of the days in [first_day, last_day] (inclusive, YYYY-MM-DD), oldest first."""
+        for day in self.days():
+            if (first_day is None or day >= first_day) and (last_day is None or day <= last_day):
+                yield self.segment(day)
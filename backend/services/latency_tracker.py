@@ -0,0 +1,69 @@
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+
+class LatencyTracker:
+    """Rolling latency percentiles for one upstream endpoint.
+
+    Keeps the durations (seconds) of the last `window` completed calls.
+    Percentiles are None until `min_samples` calls have been seen, so callers
+    fall back to static settings while the endpoint is still unknown.
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._sorted: Optional[List[float]] = None
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+        self._sorted = None
+
+    def percentile(self, q: float) -> Optional[float]:
+        """The `q` quantile (0..1) of recent latencies, or None with too few samples."""
+        if len(self._samples) < self.min_samples:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self._samples)
+        index = min(len(self._sorted) - 1, int(q * len(self._sorted)))
+        return self._sorted[index]
+
+    def stats(self) -> Dict[str, Any]:
+        def ms(q: float) -> Optional[float]:
+            value = self.percentile(q)
+            return round(value * 1000, 1) if value is not None else None
+
+        return {
+            "samples": len(self._samples),
+            "p50Ms": ms(0.50),
+            "p95Ms": ms(0.95),
+            "p99Ms": ms(0.99),
+        }
+
+
+class HedgeBudget:
+    """Token bucket capping hedged requests to a share of primary requests.
+
+    Every primary request deposits `ratio` tokens (up to `burst`); a hedge
+    spends one. Over time at most about `ratio` extra upstream calls are made
+    per request, however slow the upstream gets.
+    """
+
+    def __init__(self, ratio: float = 0.1, burst: float = 5.0):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+        self.denied = 0
+
+    def deposit(self):
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        self.denied += 1
+        return False
@@ -0,0 +1,145 @@
+import re
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Street-type abbreviations applied to whole words, so "North Avenue" and
+# "North Ave" normalize to the same key
+ABBREVIATIONS = {"avenue": "ave", "street": "st", "road": "rd", "boulevard": "blvd"}
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_name(text: str) -> str:
+    """Lowercase, drop punctuation and abbreviate street types: "D.M. Smith" -> "d m smith"."""
+    words = _NON_ALNUM.sub(" ", text.lower()).split()
+    return " ".join(ABBREVIATIONS.get(word, word) for word in words)
+
+
+def trigrams(normalized: str) -> List[str]:
+    """Character trigrams of a normalized name, padded so word starts and ends count."""
+    padded = f"  {normalized} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class LocationResolver:
+    """Name lookups over a fixed list of place names, indexed once at construction.
+
+    Lookups return positions in the list given to the constructor.
+
+    - exact: normalized name -> position
+    - prefix: sorted arrays of normalized names and of every word-suffix of
+      every name ("d m smith", "m smith", "smith"), searched with bisect; this
+      is a flattened prefix trie, so typing the start of any word matches
+    - fuzzy: trigram -> positions postings, ranked by Dice similarity
+      (autocomplete only)
+
+    Queries are normalized once and never scan the whole name list.
+    """
+
+    def __init__(self, names: Iterable[str], min_similarity: float = 0.4):
+        self.min_similarity = min_similarity
+        self._names: List[str] = [normalize_name(name) for name in names]
+
+        self._exact: Dict[str, int] = {}
+        for i, name in enumerate(self._names):
+            self._exact.setdefault(name, i)
+
+        # (key, position), sorted for prefix range scans
+        self._name_keys: List[Tuple[str, int]] = sorted((name, i) for i, name in enumerate(self._names))
+        word_keys = []
+        for i, name in enumerate(self._names):
+            words = name.split()
+            for start in range(1, len(words)):
+                word_keys.append((" ".join(words[start:]), i))
+        self._word_keys: List[Tuple[str, int]] = sorted(word_keys)
+
+        self._trigram_counts: List[int] = []
+        self._postings: Dict[str, List[int]] = {}
+        for i, name in enumerate(self._names):
+            grams = set(trigrams(name))
+            self._trigram_counts.append(len(grams))
+            for gram in grams:
+                if gram not in self._postings:
+                    self._postings[gram] = []
+                self._postings[gram].append(i)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def get(self, name: str) -> Optional[int]:
+        """Exact match on the normalized name."""
+        return self._exact.get(normalize_name(name))
+
+    def resolve(self, query: str) -> Optional[int]:
+        """Best single match for free text, or None.
+
+        Tries, in order: exact name; a name contained in the query
+        (e.g. "Clough Commons, Atlanta, GA"); a name or a word of a name
+        starting with the query. No fuzzy matching: a street or place that
+        merely looks like a building ("Hopkins Street") must not become it.
+        """
+        normalized = normalize_name(query)
+        if not normalized:
+            return None
+        i = self._exact.get(normalized)
+        if i is not None:
+            return i
+
+        i = self._longest_contained_name(normalized)
+        if i is None:
+            prefix = self._prefix_matches(normalized, 1)
+            i = prefix[0] if prefix else None
+        return i
+
+    def search(self, query: str, limit: int = 10) -> List[int]:
+        """Autocomplete: exact match, then name prefixes, then word prefixes, then fuzzy."""
+        normalized = normalize_name(query)
+        if not normalized or limit <= 0:
+            return []
+
+        seen: Dict[int, None] = {}
+        exact = self._exact.get(normalized)
+        if exact is not None:
+            seen[exact] = None
+        for i in self._prefix_matches(normalized, limit):
+            seen.setdefault(i, None)
+        if len(seen) < limit:
+            for i in self._fuzzy_matches(normalized, limit):
+                seen.setdefault(i, None)
+        return list(seen)[:limit]
+
+    def _prefix_matches(self, normalized: str, limit: int) -> List[int]:
+        """Names, then any later word of a name, starting with `normalized`."""
+        result: Dict[int, None] = {}
+        for keys in (self._name_keys, self._word_keys):
+            pos = bisect_left(keys, (normalized, -1))
+            while pos < len(keys) and len(result) < limit and keys[pos][0].startswith(normalized):
+                result.setdefault(keys[pos][1], None)
+                pos += 1
+        return list(result)
+
+    def _longest_contained_name(self, normalized: str) -> Optional[int]:
+        """The longest name that appears as whole words inside the query."""
+        words = normalized.split()
+        for size in range(len(words), 0, -1):
+            for start in range(len(words) - size + 1):
+                i = self._exact.get(" ".join(words[start:start + size]))
+                if i is not None:
+                    return i
+        return None
+
+    def _fuzzy_matches(self, normalized: str, limit: int) -> List[int]:
+        """Positions ranked by trigram Dice similarity, best first."""
+        grams = set(trigrams(normalized))
+        common: Counter = Counter()
+        for gram in grams:
+            common.update(self._postings.get(gram, ()))
+
+        scored = []
+        for i, shared in common.items():
+            score = 2.0 * shared / (len(grams) + self._trigram_counts[i])
+            if score >= self.min_similarity:
+                scored.append((-score, i))
+        scored.sort()
+        return [i for _, i in scored[:limit]]
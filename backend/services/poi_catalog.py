@@ -0,0 +1,255 @@
+import asyncio
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import settings
+from models import Building
+from services.location_resolver import LocationResolver
+from services.stop_index import StopIndex
+from services.stop_table import haversine_distances
+
+logger = logging.getLogger(__name__)
+
+# Used when the catalog file is missing, so the API keeps its original buildings
+DEFAULT_BUILDINGS: Tuple[Tuple[str, float, float], ...] = (
+    ("Tech Tower", 33.7726510852488, -84.3947508475869),
+    ("Georgia Tech Library", 33.7747751124862, -84.39575939176652),
+    ("Clough Commons", 33.77532604620433, -84.39637188806334),
+    ("Hopkins Hall", 33.77850642030214, -84.39069072993782),
+    ("Glenn Hall", 33.77397354313724, -84.39167014943847),
+    ("North Ave East", 33.769581436909526, -84.39098961634303),
+    ("Student Center", 33.77361305511324, -84.39801594997785),
+    ("Campus Rec Center", 33.77559002203094, -84.40334559002532),
+    ("D.M. Smith", 33.77158232011701, -84.3911280052064),
+    ("Bobby Dodd Stadium", 33.772681846343005, -84.39323608111707),
+)
+
+
+class PoiData:
+    """One immutable load of the catalog: columnar arrays plus its indexes.
+
+    Names live in one tuple and coordinates in two float64 arrays; Building
+    models are only created for the entries a request returns. Exposes the
+    lat/lng/distances_from interface StopIndex needs, so the same grid index
+    serves nearest-building lookups.
+    """
+
+    __slots__ = ("names", "lat", "lng", "by_name", "resolver", "grid", "_buildings")
+
+    def __init__(self, names: Sequence[str], lats: Sequence[float], lngs: Sequence[float]):
+        self.names: Tuple[str, ...] = tuple(sys.intern(name) for name in names)
+        self.lat = np.asarray(lats, dtype=np.float64)
+        self.lng = np.asarray(lngs, dtype=np.float64)
+        self.by_name: Dict[str, int] = {}
+        for i, name in enumerate(self.names):
+            self.by_name.setdefault(name, i)
+        self.resolver = LocationResolver(self.names)
+        self.grid = StopIndex(self, cell_size=100.0)
+        self._buildings: Optional[List[Building]] = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def distances_from(self, lat, lng, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        if rows is None:
+            return haversine_distances(lat, lng, self.lat, self.lng)
+        return haversine_distances(lat, lng, self.lat[rows], self.lng[rows])
+
+    def building(self, i: int) -> Building:
+        return Building(name=self.names[i], latitude=float(self.lat[i]), longitude=float(self.lng[i]))
+
+    def buildings(self) -> List[Building]:
+        """Every entry as a Building, built once per load."""
+        if self._buildings is None:
+            self._buildings = [self.building(i) for i in range(len(self))]
+        return self._buildings
+
+
+class PoiCatalog:
+    """Buildings and other points of interest loaded from a GeoJSON or CSV file.
+
+    GeoJSON features need a `name` property and a Point (or Polygon, whose
+    vertex centroid is used) geometry; CSV files need name, latitude and
+    longitude columns. The file is checked for changes every
+    `reload_interval` seconds and reloaded off the event loop; a reload swaps
+    in a complete new PoiData, so readers never see a half-built catalog and a
+    file that fails to parse leaves the previous data in place.
+    """
+
+    def __init__(self, path: Optional[Path], reload_interval: float = 0.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.reloads = 0
+        self.reload_failures = 0
+        self.loaded_at = 0.0
+        self._signature = self._file_signature()
+        self.data = self._load()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start watching the catalog file for changes."""
+        if self.reload_interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def buildings(self) -> List[Building]:
+        return self.data.buildings()
+
+    def get(self, name: str) -> Optional[Building]:
+        """Exact (case-sensitive) name lookup."""
+        data = self.data
+        i = data.by_name.get(name)
+        return data.building(i) if i is not None else None
+
+    def resolve(self, query: str) -> Optional[Building]:
+        """Best building for free text (see LocationResolver.resolve)."""
+        data = self.data
+        i = data.resolver.resolve(query)
+        return data.building(i) if i is not None else None
+
+    def search(self, query: str, limit: int = 10) -> List[Building]:
+        data = self.data
+        return [data.building(i) for i in data.resolver.search(query, limit)]
+
+    def nearest(self, lat: float, lng: float, radius: float) -> Optional[Tuple[Building, float]]:
+        """The closest building within `radius` meters and its distance, or None."""
+        data = self.data
+        rows, distances = data.grid.within(lat, lng, radius)
+        if not len(rows):
+            return None
+        best = int(np.argmin(distances))
+        return data.building(int(rows[best])), float(distances[best])
+
+    def metrics(self) -> Dict[str, object]:
+        return {
+            "entries": len(self.data),
+            "path": str(self.path) if self.path else None,
+            "loadedAt": self.loaded_at,
+            "reloads": self.reloads,
+            "reloadFailures": self.reload_failures,
+        }
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            signature = self._file_signature()
+            if signature == self._signature:
+                continue
+            try:
+                data = await asyncio.to_thread(self._load, True)
+            except Exception as ex:
+                self._signature = signature
+                self.reload_failures += 1
+                logger.warning(f"POI catalog reload failed, keeping {len(self.data)} entries: {ex}")
+                continue
+            self._signature = signature
+            self.data = data
+            self.reloads += 1
+            logger.info(f"POI catalog reloaded: {len(data)} entries from {self.path}")
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        if self.path is None:
+            return None
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self, strict: bool = False) -> PoiData:
+        """Parse the catalog file; fall back to DEFAULT_BUILDINGS if it is missing."""
+        if self.path is None or not self.path.exists():
+            if strict:
+                raise FileNotFoundError(str(self.path))
+            entries = list(DEFAULT_BUILDINGS)
+        elif self.path.suffix.lower() == ".csv":
+            entries = self._read_csv(self.path)
+        else:
+            entries = self._read_geojson(self.path)
+        if strict and not entries:
+            raise ValueError(f"no usable entries in {self.path}")
+
+        data = PoiData([e[0] for e in entries], [e[1] for e in entries], [e[2] for e in entries])
+        self.loaded_at = time.time()
+        return data
+
+    @staticmethod
+    def _read_geojson(path: Path) -> List[Tuple[str, float, float]]:
+        with open(path, encoding="utf-8") as f:
+            collection = json.load(f)
+
+        entries = []
+        for feature in collection.get("features", []):
+            name = (feature.get("properties") or {}).get("name")
+            geometry = feature.get("geometry") or {}
+            point = PoiCatalog._geometry_point(geometry)
+            if name and point is not None:
+                entries.append((str(name), point[0], point[1]))
+        return entries
+
+    @staticmethod
+    def _geometry_point(geometry: dict) -> Optional[Tuple[float, float]]:
+        """(lat, lng) of a Point, or the vertex centroid of a Polygon/MultiPolygon."""
+        kind = geometry.get("type")
+        coordinates = geometry.get("coordinates")
+        if not coordinates:
+            return None
+        if kind == "Point":
+            return (float(coordinates[1]), float(coordinates[0]))
+        if kind == "Polygon":
+            ring = coordinates[0]
+        elif kind == "MultiPolygon":
+            ring = [vertex for polygon in coordinates for vertex in polygon[0]]
+        else:
+            return None
+        vertices = np.asarray(ring, dtype=np.float64)
+        if len(vertices) > 1 and (vertices[0] == vertices[-1]).all():
+            vertices = vertices[:-1]  # closed ring repeats its first vertex
+        return (float(vertices[:, 1].mean()), float(vertices[:, 0].mean()))
+
+    @staticmethod
+    def _read_csv(path: Path) -> List[Tuple[str, float, float]]:
+        entries = []
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                try:
+                    entries.append((row["name"], float(row["latitude"]), float(row["longitude"])))
+                except (KeyError, TypeError, ValueError):
+                    continue
+        return entries
+
+
+_catalog: Optional[PoiCatalog] = None
+
+
+def get_poi_catalog() -> PoiCatalog:
+    """The process-wide catalog, loaded on first use from `settings.poi_catalog_path`."""
+    global _catalog
+    if _catalog is None:
+        path = Path(settings.poi_catalog_path) if settings.poi_catalog_path else None
+        if path is not None and not path.is_absolute():
+            path = Path(__file__).parent.parent / path
+        _catalog = PoiCatalog(path, settings.poi_catalog_reload_interval)
+    return _catalog
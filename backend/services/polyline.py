@@ -0,0 +1,141 @@
+import math
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from services.stop_table import EARTH_RADIUS_M
+
+# Ground meters per screen pixel at zoom 0 on the equator (256 px Web Mercator tiles)
+METERS_PER_PIXEL_Z0 = 2 * math.pi * EARTH_RADIUS_M / 256
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> np.ndarray:
+    """Decode a Google encoded polyline into an (n, 2) array of (lat, lng)."""
+    factor = 10 ** precision
+    values: List[int] = []
+    shift = result = 0
+    for char in encoded:
+        byte = ord(char) - 63
+        result |= (byte & 0x1f) << shift
+        shift += 5
+        if byte < 0x20:
+            values.append(~(result >> 1) if result & 1 else result >> 1)
+            shift = result = 0
+
+    if len(values) % 2:
+        values.pop()  # truncated input: drop the dangling half point
+    deltas = np.asarray(values, dtype=np.int64).reshape(-1, 2)
+    return np.cumsum(deltas, axis=0) / factor
+
+
+def encode_polyline(points: Iterable[Sequence[float]], precision: int = 5) -> str:
+    """Encode (lat, lng) points as a Google encoded polyline."""
+    factor = 10 ** precision
+    chunks: List[str] = []
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        ilat, ilng = round(lat * factor), round(lng * factor)
+        for delta in (ilat - prev_lat, ilng - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            chunks.append(chr(value + 63))
+        prev_lat, prev_lng = ilat, ilng
+    return "".join(chunks)
+
+
+def vertex_importance(points: np.ndarray, min_tolerance: float = 0.0) -> np.ndarray:
+    """Douglas-Peucker importance (meters) of every vertex, from one pass.
+
+    A vertex survives simplification with tolerance `t` iff its importance is
+    greater than `t`. Each split point's importance is capped by the one of
+    the split that produced its segment, so the vertex sets for increasing
+    tolerances are nested and every zoom level can be cut from this one array.
+    Endpoints are always kept (importance inf). Segments whose farthest
+    vertex is within `min_tolerance` are not split further; their interior
+    keeps importance 0, which is below every tolerance that will be asked for.
+    """
+    n = len(points)
+    importance = np.zeros(n)
+    if n == 0:
+        return importance
+    importance[0] = importance[-1] = np.inf
+
+    # Local equirectangular projection to meters around the line's mean latitude
+    scale_y = math.pi / 180 * EARTH_RADIUS_M
+    scale_x = scale_y * math.cos(math.radians(float(points[:, 0].mean())))
+    xy = np.column_stack((points[:, 1] * scale_x, points[:, 0] * scale_y))
+
+    stack = [(0, n - 1, np.inf)]
+    while stack:
+        start, end, cap = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = xy[start], xy[end]
+        interior = xy[start + 1:end]
+        ab = b - a
+        length_sq = float(ab @ ab)
+        if length_sq == 0.0:
+            distances = np.hypot(*(interior - a).T)
+        else:
+            # Distance to the segment (not the infinite line) so closed loops work
+            t = np.clip((interior - a) @ ab / length_sq, 0.0, 1.0)
+            distances = np.hypot(*(interior - (a + t[:, None] * ab)).T)
+        offset = int(np.argmax(distances))
+        split = start + 1 + offset
+        value = min(float(distances[offset]), cap)
+        if value <= min_tolerance:
+            continue
+        importance[split] = value
+        stack.append((start, split, value))
+        stack.append((split, end, value))
+    return importance
+
+
+def zoom_tolerance(zoom: int, latitude: float, pixels: float) -> float:
+    """Ground distance (meters) covered by `pixels` screen pixels at a zoom level."""
+    return pixels * METERS_PER_PIXEL_Z0 * math.cos(math.radians(latitude)) / (2 ** zoom)
+
+
+class SimplifiedPolyline:
+    """One route line decoded once, with a re-encoded version per zoom level.
+
+    Zooms above the highest precomputed level get the original string;
+    zooms in between get the next more detailed level, never a coarser one.
+    """
+
+    def __init__(self, encoded: str, zoom_levels: Sequence[int], pixels: float = 1.0):
+        self.encoded = encoded
+        self.zoom_levels = sorted(zoom_levels)
+        self.levels: Dict[int, str] = {}
+        self.vertex_counts: Dict[int, int] = {}
+
+        points = decode_polyline(encoded) if encoded else np.zeros((0, 2))
+        self.points = points  # full-detail (lat, lng) vertices, shared with RouteSnapper
+        self.vertices = len(points)
+        if len(points) < 3:
+            return
+        latitude = float(points[:, 0].mean())
+        finest = zoom_tolerance(self.zoom_levels[-1], latitude, pixels) if self.zoom_levels else 0.0
+        importance = vertex_importance(points, finest)
+        for zoom in self.zoom_levels:
+            kept = points[importance > zoom_tolerance(zoom, latitude, pixels)]
+            self.levels[zoom] = encode_polyline(kept.tolist())
+            self.vertex_counts[zoom] = len(kept)
+
+    def for_zoom(self, zoom: Optional[int]) -> str:
+        level = self.level_for(self.zoom_levels, zoom)
+        if level is None or level not in self.levels:
+            return self.encoded
+        return self.levels[level]
+
+    @staticmethod
+    def level_for(zoom_levels: Sequence[int], zoom: Optional[int]) -> Optional[int]:
+        """The precomputed level serving `zoom`, or None for the full-detail line."""
+        if zoom is None:
+            return None
+        for level in sorted(zoom_levels):
+            if level >= zoom:
+                return level
+        return None
@@ -1,44 +1,212 @@
+import asyncio
+import hashlib
+import logging
 import math
 import sys
+import time
+from bisect import bisect_right
 from pathlib import Path
-from typing import List, Tuple, Optional, Dict
+from typing import Any, List, Tuple, Optional, Dict
+
+import numpy as np
+import orjson
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from models import (
     Building, RouteSearchRequest, RouteSearchResponse, RouteResult,
-    StopInfo, ArrivalTime, MapRoute, MapStop, MapVehicle, VehicleStop
+    StopInfo, ArrivalTime
 )
-from services.transloc_api_service import TranslocApiService
+from services.diff_ring import DiffRing
+from services.eta_predictor import EtaPredictor
+from services.history_recorder import HistoryRecorder
+from services.poi_catalog import PoiCatalog, get_poi_catalog
+from services.polyline import SimplifiedPolyline
+from services.route_snapper import RouteSnapper, SnapResult
+from services.single_flight import SingleFlight
+from services.stop_index import StopIndex, haversine_distance
+from services.stop_table import StopTable, StopTuple
+from services.transit_graph import TransitGraph
+from services.transloc_api_service import StaleList, TranslocApiService
+from services.ttl_cache import TTLCache
+from services.vehicle_poller import VehicleSnapshot
+from config import settings
+
+logger = logging.getLogger(__name__)
 
 
 class RouteService:
-    def __init__(self, transloc_api_service: TranslocApiService):
+    def __init__(
+        self,
+        transloc_api_service: TranslocApiService,
+        poi_catalog: Optional[PoiCatalog] = None,
+        history_recorder: Optional[HistoryRecorder] = None
+    ):
         self.transloc_api_service = transloc_api_service
-        self.buildings = {
-            "Tech Tower": Building(name="Tech Tower", latitude=33.7726510852488, longitude=-84.3947508475869),
-            "Georgia Tech Library": Building(name="Georgia Tech Library", latitude=33.7747751124862, longitude=-84.39575939176652),
-            "Clough Commons": Building(name="Clough Commons", latitude=33.77532604620433, longitude=-84.39637188806334),
-            "Hopkins Hall": Building(name="Hopkins Hall", latitude=33.77850642030214, longitude=-84.39069072993782),
-            "Glenn Hall": Building(name="Glenn Hall", latitude=33.77397354313724, longitude=-84.39167014943847),
-            "North Ave East": Building(name="North Ave East", latitude=33.769581436909526, longitude=-84.39098961634303),
-            "Student Center": Building(name="Student Center", latitude=33.77361305511324, longitude=-84.39801594997785),
-            "Campus Rec Center": Building(name="Campus Rec Center", latitude=33.77559002203094, longitude=-84.40334559002532),
-            "D.M. Smith": Building(name="D.M. Smith", latitude=33.77158232011701, longitude=-84.3911280052064),
-            "Bobby Dodd Stadium": Building(name="Bobby Dodd Stadium", latitude=33.772681846343005, longitude=-84.39323608111707)
-        }
+        # Buildings and other POIs, loaded once per process and shared
+        self.poi_catalog = poi_catalog or get_poi_catalog()
+        # Optional on-disk history of every vehicle snapshot, as /map-vehicles builds
+        self.history_recorder = history_recorder
+
+        # Spatial index over the stops of the active routes. It is rebuilt only
+        # when the set of stop lists changes (see _get_stop_index).
+        self._stop_index: Optional[StopIndex] = None
+        self._stop_index_key: Optional[Tuple] = None
+        self._stop_index_sources: List[List[dict]] = []
+
+        # Stop graph for trips that need transfers, updated with the stop index
+        self.transit_graph = TransitGraph(
+            bus_speed=settings.routing_bus_speed,
+            walk_speed=settings.routing_walk_speed,
+            dwell_seconds=settings.routing_dwell_seconds,
+            board_wait_seconds=settings.routing_board_wait_seconds,
+            transfer_radius=settings.routing_transfer_radius,
+            transfer_penalty_seconds=settings.routing_transfer_penalty_seconds,
+            max_transfers=settings.routing_max_transfers,
+            latency_budget_ms=settings.routing_latency_budget_ms
+        )
+
+        # Serialized /map-routes bodies and ETags per zoom level (None = full
+        # detail), rebuilt when upstream lists change
+        self._map_routes_payloads: Dict[Optional[int], Tuple[bytes, str]] = {}
+        self._map_routes_key: Optional[Tuple] = None
+        self._map_routes_sources: Optional[Tuple] = None
+        # Decoded and simplified route lines keyed by their encoded string, so
+        # the geometry work only reruns for lines that actually changed
+        self._polylines: Dict[str, SimplifiedPolyline] = {}
+
+        # /map-vehicles result for the latest vehicle snapshot version, plus
+        # per-route stop lookups reused across versions
+        self._map_vehicles: Optional[Tuple[int, List[Dict[str, Any]]]] = None
+        self._map_vehicles_body: Optional[Tuple[int, bytes]] = None
+        # time.time() of the oldest input (vehicle poll or arrival times) of the current build
+        self._map_vehicles_data_time = 0.0
+        self._map_vehicles_flight = SingleFlight()
+        # Which vehicles changed between built versions, for ?since= requests
+        self.map_vehicles_diffs = DiffRing(settings.map_vehicles_diff_history)
+        self._stops_by_id: Dict[str, Tuple[List[dict], Dict[str, dict]]] = {}
+        # Segment index over the route lines, rebuilt when lines or stops change
+        self._route_snapper: Optional[RouteSnapper] = None
+        self._route_snapper_key: Optional[Tuple] = None
+        self._route_snapper_sources: Optional[Tuple] = None
+        # Travel times learned from snapped positions, for ETAs without upstream
+        self.eta_predictor = EtaPredictor(
+            bus_speed=settings.routing_bus_speed,
+            dwell_seconds=settings.routing_dwell_seconds,
+            history=settings.eta_history_length,
+            max_gap=settings.eta_max_gap,
+            prior_meters=settings.eta_prior_meters,
+            decay=settings.eta_decay
+        )
+        # (snapshot version, snapper, snap) of the last snapshot fed to the predictor
+        self._observed: Optional[Tuple[int, RouteSnapper, SnapResult]] = None
+        self._vehicle_task: Optional[asyncio.Task] = None
+
+        # Short-lived route search responses keyed on snapped coordinates
+        self.search_cache = TTLCache(settings.route_search_cache_max_entries)
+        self._search_flight = SingleFlight()
+
+    async def warm_up(self, route_ids: List[str]):
+        """Build the stop index, transfer graph and /map-routes body ahead of traffic.
+
+        Meant for startup right after TranslocApiService.load_snapshot(), with
+        the routes that were active when the snapshot was saved, so the first
+        requests find warm indexes instead of building them.
+        """
+        started = time.perf_counter()
+        if route_ids:
+            await self._get_stop_index(route_ids)
+        await self.get_map_routes_payload()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"Warmed route indexes for {len(route_ids)} routes in {elapsed_ms:.1f} ms")
+
+    def start(self):
+        """Start feeding every new vehicle snapshot to the ETA predictor.
+
+        The predictor learns from consecutive positions, so it follows the
+        poller rather than waiting for requests to happen to build one. With
+        a history recorder every snapshot is also built into the /map-vehicles
+        view, which records it, so the history has no traffic-dependent holes.
+        """
+        if self._vehicle_task is None or self._vehicle_task.done():
+            self._vehicle_task = asyncio.create_task(self._follow_vehicles())
+
+    async def stop(self):
+        if self._vehicle_task is not None:
+            self._vehicle_task.cancel()
+            try:
+                await self._vehicle_task
+            except asyncio.CancelledError:
+                pass
+            self._vehicle_task = None
 
     async def get_buildings(self) -> List[Building]:
         """Get list of all buildings."""
-        return list(self.buildings.values())
+        return self.poi_catalog.buildings()
+
+    async def get_building(self, name: str) -> Optional[Building]:
+        """Get a building by its exact name."""
+        return self.poi_catalog.get(name)
+
+    async def search_buildings(self, query: str, limit: int = 10) -> List[Building]:
+        """Autocomplete buildings by name prefix, word prefix or fuzzy match."""
+        return self.poi_catalog.search(query, limit)
+
+    async def nearest_building(self, lat: float, lng: float, radius: float) -> Optional[Tuple[Building, float]]:
+        """The closest building within `radius` meters and its distance."""
+        return self.poi_catalog.nearest(lat, lng, radius)
 
     async def find_routes(self, request: RouteSearchRequest) -> RouteSearchResponse:
-        """Find bus routes between two points."""
-        begin_lat, begin_lng, begin_name = self._get_begin_point(request)
-        dest_lat, dest_lng, dest_name = self._get_dest_point(request)
+        """Find bus routes between two points.
+
+        Responses are cached briefly, keyed on the resolved points snapped to a
+        grid plus the vehicle snapshot version, so near-identical searches made
+        while the vehicle data is unchanged share one computed response.
+        """
+        begin = self._get_begin_point(request)
+        dest = self._get_dest_point(request)
+
+        snapshot = await self.transloc_api_service.get_vehicle_snapshot()
+        key = (self._snap_point(begin), self._snap_point(dest), snapshot.version)
+        found, response, is_fresh = self.search_cache.get(key)
+        if found and is_fresh:
+            return response
+
+        async def search():
+            result = await self._search_routes(begin, dest)
+            self.search_cache.set(key, result, settings.route_search_cache_ttl)
+            return result
+
+        return await self._search_flight.do(key, search)
 
-        all_stops: List[Tuple[float, float, str, str, Optional[str]]] = []
+    def get_metrics(self) -> Dict[str, dict]:
+        """Counters for RouteService caches."""
+        return {
+            "routeSearchCache": {**self.search_cache.stats(), **self._search_flight.stats()},
+            "poiCatalog": self.poi_catalog.metrics(),
+            "etaPredictor": self.eta_predictor.stats(),
+            "historyRecorder": self.history_recorder.stats() if self.history_recorder else None,
+        }
+
+    @staticmethod
+    def _snap_point(point: Tuple[float, float, str]) -> Tuple[int, int, str]:
+        """Snap a resolved (lat, lng, name) point to the response cache grid."""
+        lat, lng, name = point
+        grid = settings.route_search_cache_grid_meters
+        lat_step = grid / 111320.0  # meters per degree of latitude
+        lat_cell = round(lat / lat_step)
+        lng_step = lat_step / max(math.cos(math.radians(lat_cell * lat_step)), 1e-6)
+        return (lat_cell, round(lng / lng_step), name)
+
+    async def _search_routes(
+        self,
+        begin: Tuple[float, float, str],
+        dest: Tuple[float, float, str]
+    ) -> RouteSearchResponse:
+        """Run a route search between two resolved points (uncached)."""
+        begin_lat, begin_lng, begin_name = begin
+        dest_lat, dest_lng, dest_name = dest
 
         # Get all routes and filter to only active ones
         active_routes = await self.transloc_api_service.get_active_routes()
@@ -54,68 +222,31 @@ class RouteService:
 
         # Extract route IDs
         route_ids = []
+        routes_by_id: Dict[str, dict] = {}
         for route in active_routes:
             route_id = self.transloc_api_service._extract_route_id(route)
             if route_id:
                 route_ids.append(route_id)
+                routes_by_id[route_id] = route
 
-        # Fetch all stops in parallel
-        import asyncio
-        stop_tasks = [self.transloc_api_service.get_stops(route_id) for route_id in route_ids]
-        all_stops_lists = await asyncio.gather(*stop_tasks)
-
-        for route_id, stops in zip(route_ids, all_stops_lists):
-            for stop in stops:
-                lat = stop.get("Latitude")
-                lng = stop.get("Longitude")
-                desc = stop.get("Description", "")
-                route_stop_id = self._extract_route_stop_id(stop)
-                
-                if lat is not None and lng is not None:
-                    all_stops.append((lat, lng, desc, route_id, route_stop_id))
-
-        # Group stops by route
-        stops_by_route: dict = {}
-        for stop in all_stops:
-            route_id = stop[3]
-            if route_id not in stops_by_route:
-                stops_by_route[route_id] = []
-            stops_by_route[route_id].append(stop)
-
-        route_costs: List[Tuple[float, str, Tuple, Tuple]] = []
-
-        for route_id, route_stops in stops_by_route.items():
-            if not route_stops:
-                continue
-
-            # Find the best start stop (closest to begin point)
-            best_start_stop = min(
-                route_stops,
-                key=lambda s: self._haversine_distance(s[0], s[1], begin_lat, begin_lng)
-            )
-            start_walking_distance = self._haversine_distance(
-                best_start_stop[0], best_start_stop[1], begin_lat, begin_lng
-            )
+        stop_index = await self._get_stop_index(route_ids)
 
-            # Only consider routes where we don't have to walk too far to get to the bus
-            max_start_walking_distance = 1000  # 1km max walking to bus
-            if start_walking_distance > max_start_walking_distance:
-                continue
+        # Nearest stop of every route within walking range of each end
+        max_start_walking_distance = 1000  # 1km max walking to bus
+        max_dest_walking_distance = 1000  # 1km max walking from bus
+        begin_candidates = stop_index.nearest_per_route(begin_lat, begin_lng, max_start_walking_distance)
+        dest_candidates = stop_index.nearest_per_route(dest_lat, dest_lng, max_dest_walking_distance)
 
-            # Find the best destination stop (closest to destination point)
-            best_dest_stop = min(
-                route_stops,
-                key=lambda s: self._haversine_distance(s[0], s[1], dest_lat, dest_lng)
-            )
-            dest_walking_distance = self._haversine_distance(
-                best_dest_stop[0], best_dest_stop[1], dest_lat, dest_lng
-            )
+        route_costs: List[Tuple[float, str, StopTuple, StopTuple, float, float]] = []
 
-            # Only consider routes where we don't have to walk too far from the bus
-            max_dest_walking_distance = 1000  # 1km max walking from bus
-            if dest_walking_distance > max_dest_walking_distance:
+        for route_id in route_ids:
+            # Only consider routes where we don't have to walk too far to or from the bus
+            if route_id not in begin_candidates or route_id not in dest_candidates:
                 continue
 
+            start_walking_distance, best_start_stop = begin_candidates[route_id][0]
+            dest_walking_distance, best_dest_stop = dest_candidates[route_id][0]
+
             # Calculate total walking distance
             total_walking_distance = start_walking_distance + dest_walking_distance
 
@@ -123,233 +254,241 @@ class RouteService:
             if best_start_stop[2] == best_dest_stop[2]:
                 total_walking_distance += 1000  # Heavy penalty for same stop
 
-            route_costs.append((total_walking_distance, route_id, best_start_stop, best_dest_stop))
+            route_costs.append((
+                total_walking_distance, route_id, best_start_stop, best_dest_stop,
+                start_walking_distance, dest_walking_distance
+            ))
 
         route_costs.sort(key=lambda x: x[0])
 
         max_display = 5
         top_routes = route_costs[:max_display]
 
-        # Fetch all route details and ETAs in parallel
-        import asyncio
-        
-        async def empty_list():
-            return []
-        
-        route_detail_tasks = []
-        for total_cost, route_id, begin_stop, dest_stop in top_routes:
-            route_details_task = self.transloc_api_service.get_route_details(route_id)
-            begin_eta_task = (
-                self.transloc_api_service.get_stop_arrival_times(route_id, begin_stop[4], 3)
-                if begin_stop[4] else empty_list()
-            )
-            dest_eta_task = (
-                self.transloc_api_service.get_stop_arrival_times(route_id, dest_stop[4], 3)
-                if dest_stop[4] else empty_list()
-            )
-            route_detail_tasks.append((route_id, begin_stop, dest_stop, route_details_task, begin_eta_task, dest_eta_task))
+        # Fetch ETAs for every candidate begin/dest stop in one batched call
+        eta_pairs = []
+        for total_cost, route_id, begin_stop, dest_stop, _, _ in top_routes:
+            for stop in (begin_stop, dest_stop):
+                if stop[4]:
+                    eta_pairs.append((route_id, stop[4]))
+        eta_data = await self._get_eta_data(eta_pairs, 3)
+        snapshot = await self.transloc_api_service.get_vehicle_snapshot()
 
-        results = []
-        for route_id, begin_stop, dest_stop, route_details_task, begin_eta_task, dest_eta_task in route_detail_tasks:
-            route_details, begin_eta_data, dest_eta_data = await asyncio.gather(
-                route_details_task, begin_eta_task, dest_eta_task
-            )
-
-            if not route_details:
-                continue
-
-            route_name = route_details[0].get("Description", "N/A")
-
-            # Recalculate distances for consistency
-            dist_begin = self._haversine_distance(begin_stop[0], begin_stop[1], begin_lat, begin_lng)
-            dist_dest = self._haversine_distance(dest_stop[0], dest_stop[1], dest_lat, dest_lng)
+        ranked: List[Tuple[Tuple, RouteResult]] = []
+        for total_cost, route_id, begin_stop, dest_stop, dist_begin, dist_dest in top_routes:
+            # Route names come from the routes we already fetched above
+            route_name = routes_by_id[route_id].get("Description", "N/A")
             total_walking_distance = dist_begin + dist_dest
 
-            # Parse arrival times for begin stop
-            begin_arrival_times = self._parse_arrival_times(begin_eta_data, begin_stop[4])
-
-            # Parse arrival times for dest stop
-            dest_arrival_times = self._parse_arrival_times(dest_eta_data, dest_stop[4])
+            # Split the batched response back out per stop
+            begin_arrival_times = self._parse_arrival_times(eta_data, begin_stop[4])
+            dest_arrival_times = self._parse_arrival_times(eta_data, dest_stop[4])
             
-            # NOTE: Direction filtering removed - return all vehicles and arrival times
-            # The arrival_times are already sorted by seconds (earliest first) in _parse_arrival_times
-
-            results.append(
-                RouteResult(
-                    route_id=route_id,
-                    route_name=route_name,
-                    begin_stop=StopInfo(
-                        name=begin_stop[2],
-                        distance=round(dist_begin, 1),
-                        route_stop_id=begin_stop[4],
-                        arrival_times=begin_arrival_times  # Contains specific vehicle(s) that go from begin to dest
-                    ),
-                    dest_stop=StopInfo(
-                        name=dest_stop[2],
-                        distance=round(dist_dest, 1),
-                        route_stop_id=dest_stop[4],
-                        arrival_times=dest_arrival_times  # Contains arrival times for same vehicles at dest
-                    ),
-                    total_walking_distance=round(total_walking_distance, 1)
-                )
+            # Keep only vehicles that reach the destination after the begin stop
+            # (loop routes). Both lists are sorted earliest first.
+            begin_arrival_times = self._filter_arrival_times_by_direction(
+                begin_arrival_times, dest_arrival_times
+            )
+            estimated_arrival, vehicle_matched = self._estimate_arrival_seconds(
+                begin_arrival_times, dest_arrival_times,
+                begin_stop, dest_stop, dist_begin, dist_dest
+            )
+
+            result = RouteResult(
+                route_id=route_id,
+                route_name=route_name,
+                begin_stop=StopInfo(
+                    name=begin_stop[2],
+                    distance=round(dist_begin, 1),
+                    route_stop_id=begin_stop[4],
+                    arrival_times=begin_arrival_times  # Contains specific vehicle(s) that go from begin to dest
+                ),
+                dest_stop=StopInfo(
+                    name=dest_stop[2],
+                    distance=round(dist_dest, 1),
+                    route_stop_id=dest_stop[4],
+                    arrival_times=dest_arrival_times  # Contains arrival times for same vehicles at dest
+                ),
+                total_walking_distance=round(total_walking_distance, 1),
+                estimated_arrival_seconds=estimated_arrival
             )
+            # Trips timed from a real vehicle first, then guessed ones, then
+            # useless same-stop candidates (no estimate); within each group by
+            # door-to-door time, then walking distance
+            ranked.append((
+                (
+                    estimated_arrival is None,
+                    not vehicle_matched,
+                    estimated_arrival or 0,
+                    total_walking_distance,
+                ),
+                result
+            ))
+
+        ranked.sort(key=lambda item: item[0])
+        results = [result for _, result in ranked]
 
-        # Sort results by total_walking_distance only
-        results.sort(key=lambda r: r.total_walking_distance)
+        # Trips that need one or two transfers come from the transit graph
+        route_names = {
+            route_id: route.get("Description", "N/A") for route_id, route in routes_by_id.items()
+        }
+        transfer_itineraries = self.transit_graph.plan(
+            begin_lat, begin_lng, dest_lat, dest_lng,
+            stop_index, max_start_walking_distance, route_names
+        )
 
         return RouteSearchResponse(
             routes=results,
             begin_building=begin_name,
             dest_building=dest_name,
             begin_location=begin_name,
-            dest_location=dest_name
+            dest_location=dest_name,
+            transfer_itineraries=transfer_itineraries,
+            data_age_seconds=self._stale_data_age(snapshot, eta_data)
         )
 
-    def _get_begin_point(self, request: RouteSearchRequest) -> Tuple[float, float, str]:
-        """Get begin point coordinates and name from request."""
-        # Priority 1: If building name is explicitly provided, use building coordinates
-        if request.begin_building and request.begin_building in self.buildings:
-            building = self.buildings[request.begin_building]
-            return (building.latitude, building.longitude, building.name)
-
-        # Priority 2: If coordinates are provided (from Google Maps dropdown), use them
-        if request.begin_coordinates:
-            coords = request.begin_coordinates.split(',')
-            if len(coords) == 2:
-                try:
-                    lat = float(coords[0].strip())
-                    lng = float(coords[1].strip())
-                    display_name = request.begin_location or "Starting Location"
-                    
-                    if request.begin_location:
-                        # Try exact match first
-                        exact_match = next(
-                            (b for b in self.buildings.keys() 
-                             if b.lower() == request.begin_location.lower()),
-                            None
-                        )
-                        if exact_match:
-                            display_name = exact_match
-                        else:
-                            # Try partial match
-                            normalized_location = request.begin_location.lower().replace("avenue", "ave").replace("street", "st").replace("road", "rd").replace("boulevard", "blvd")
-                            partial_match = next(
-                                (b for b in self.buildings.keys() 
-                                 if normalized_location in b.lower() or b.lower() in normalized_location),
-                                None
-                            )
-                            if partial_match:
-                                display_name = partial_match
-                    
-                    return (lat, lng, display_name)
-                except ValueError:
-                    pass
-
-        # Priority 3: Try to match location name to a building
-        if request.begin_location:
-            # Try exact match
-            exact_match = next(
-                (b for b in self.buildings.keys() 
-                 if b.lower() == request.begin_location.lower()),
-                None
-            )
-            if exact_match:
-                building = self.buildings[exact_match]
-                return (building.latitude, building.longitude, building.name)
-
-            # Try partial match
-            normalized_location = request.begin_location.lower().replace("avenue", "ave").replace("street", "st").replace("road", "rd").replace("boulevard", "blvd")
-            partial_match = next(
-                (b for b in self.buildings.keys() 
-                 if normalized_location in b.lower() or b.lower() in normalized_location),
-                None
-            )
-            if partial_match:
-                building = self.buildings[partial_match]
-                return (building.latitude, building.longitude, building.name)
+    @staticmethod
+    def _stale_data_age(snapshot: VehicleSnapshot, eta_data: List[dict]) -> Optional[int]:
+        """Age in seconds of live data that came from a fallback, or None if it is current.
 
-            # Fallback to Georgia Tech coordinates
-            return (33.7756, -84.3963, request.begin_location)
+        Arrival times served from the last known-good copy carry their age;
+        the vehicle snapshot counts as stale once a few polls were missed.
+        """
+        ages = []
+        eta_age = getattr(eta_data, "age", None)
+        if eta_age is not None:
+            ages.append(eta_age)
+        if snapshot.fetched_at and snapshot.age > 3 * settings.vehicle_poll_interval:
+            ages.append(snapshot.age)
+        return int(max(ages)) if ages else None
 
-        raise ValueError("Invalid begin point")
+    def _get_begin_point(self, request: RouteSearchRequest) -> Tuple[float, float, str]:
+        """Get begin point coordinates and name from request."""
+        return self._resolve_point(
+            request.begin_building, request.begin_coordinates, request.begin_location,
+            "Starting Location", "Invalid begin point"
+        )
 
     def _get_dest_point(self, request: RouteSearchRequest) -> Tuple[float, float, str]:
         """Get destination point coordinates and name from request."""
+        return self._resolve_point(
+            request.dest_building, request.dest_coordinates, request.dest_location,
+            "Destination Location", "Invalid destination point"
+        )
+
+    def _resolve_point(
+        self,
+        building_name: Optional[str],
+        coordinates: Optional[str],
+        location: Optional[str],
+        default_name: str,
+        error: str
+    ) -> Tuple[float, float, str]:
+        """Resolve one end of a search to (lat, lng, display name)."""
         # Priority 1: If building name is explicitly provided, use building coordinates
-        if request.dest_building and request.dest_building in self.buildings:
-            building = self.buildings[request.dest_building]
+        building = self.poi_catalog.get(building_name) if building_name else None
+        if building:
             return (building.latitude, building.longitude, building.name)
 
         # Priority 2: If coordinates are provided (from Google Maps dropdown), use them
-        if request.dest_coordinates:
-            coords = request.dest_coordinates.split(',')
+        if coordinates:
+            coords = coordinates.split(',')
             if len(coords) == 2:
                 try:
                     lat = float(coords[0].strip())
                     lng = float(coords[1].strip())
-                    display_name = request.dest_location or "Destination Location"
-                    
-                    if request.dest_location:
-                        # Try exact match first
-                        exact_match = next(
-                            (b for b in self.buildings.keys() 
-                             if b.lower() == request.dest_location.lower()),
-                            None
-                        )
-                        if exact_match:
-                            display_name = exact_match
-                        else:
-                            # Try partial match
-                            normalized_location = request.dest_location.lower().replace("avenue", "ave").replace("street", "st").replace("road", "rd").replace("boulevard", "blvd")
-                            partial_match = next(
-                                (b for b in self.buildings.keys() 
-                                 if normalized_location in b.lower() or b.lower() in normalized_location),
-                                None
-                            )
-                            if partial_match:
-                                display_name = partial_match
-                    
+                    display_name = location or default_name
+                    if location:
+                        building = self.poi_catalog.resolve(location)
+                        if building:
+                            display_name = building.name
+                    else:
+                        # Name a bare coordinate after the building it is at, if any
+                        nearest = self.poi_catalog.nearest(lat, lng, settings.poi_reverse_geocode_radius)
+                        if nearest:
+                            display_name = nearest[0].name
                     return (lat, lng, display_name)
                 except ValueError:
                     pass
 
         # Priority 3: Try to match location name to a building
-        if request.dest_location:
-            # Try exact match
-            exact_match = next(
-                (b for b in self.buildings.keys() 
-                 if b.lower() == request.dest_location.lower()),
-                None
-            )
-            if exact_match:
-                building = self.buildings[exact_match]
-                return (building.latitude, building.longitude, building.name)
-
-            # Try partial match
-            normalized_location = request.dest_location.lower().replace("avenue", "ave").replace("street", "st").replace("road", "rd").replace("boulevard", "blvd")
-            partial_match = next(
-                (b for b in self.buildings.keys() 
-                 if normalized_location in b.lower() or b.lower() in normalized_location),
-                None
-            )
-            if partial_match:
-                building = self.buildings[partial_match]
+        if location:
+            building = self.poi_catalog.resolve(location)
+            if building:
                 return (building.latitude, building.longitude, building.name)
 
             # Fallback to Georgia Tech coordinates
-            return (33.7756, -84.3963, request.dest_location)
+            return (33.7756, -84.3963, location)
 
-        raise ValueError("Invalid destination point")
+        raise ValueError(error)
 
     @staticmethod
     def _haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """Calculate the great circle distance between two points on Earth in meters."""
-        R = 6371000  # meters
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        return R * c
+        return haversine_distance(lat1, lon1, lat2, lon2)
+
+    async def _get_stop_index(self, route_ids: List[str]) -> StopIndex:
+        """Get the spatial index (and its columnar StopTable) over the given routes.
+
+        Stop lists come from the TranslocApiService cache, which hands back the
+        same list object until the data is refreshed, so the index is keyed on
+        list identity. The lists are kept alive next to the index so their ids
+        cannot be reused by other objects.
+        """
+        all_stops_lists = await asyncio.gather(
+            *[self.transloc_api_service.get_stops(route_id) for route_id in route_ids]
+        )
+        key = tuple((route_id, id(stops)) for route_id, stops in zip(route_ids, all_stops_lists))
+        if self._stop_index is not None and key == self._stop_index_key:
+            return self._stop_index
+
+        table = StopTable.from_stops(route_ids, all_stops_lists, self._extract_route_stop_id)
+        self._stop_index = StopIndex(table)
+        self.transit_graph.update(
+            table,
+            self._stop_index,
+            {route_id: id(stops) for route_id, stops in zip(route_ids, all_stops_lists)}
+        )
+        self._stop_index_key = key
+        self._stop_index_sources = list(all_stops_lists)
+        return self._stop_index
+
+    def _estimate_arrival_seconds(
+        self,
+        begin_arrival_times: List[ArrivalTime],
+        dest_arrival_times: List[ArrivalTime],
+        begin_stop: StopTuple,
+        dest_stop: StopTuple,
+        dist_begin: float,
+        dist_dest: float
+    ) -> Tuple[Optional[int], bool]:
+        """Estimate seconds from now until arriving at the destination.
+
+        Walk to the begin stop, wait for the first vehicle we can still catch,
+        ride it until its ETA at the dest stop, then walk to the destination.
+        Uses only ETAs already fetched; without a usable vehicle it falls back
+        to the transit graph's wait and speed assumptions. Returns the estimate
+        and whether it came from a real vehicle; boarding and leaving at the
+        same stop is no trip at all and gets no estimate.
+        """
+        if begin_stop[2] == dest_stop[2]:
+            return None, False
+
+        walk_speed = settings.routing_walk_speed
+        walk_to_stop = dist_begin / walk_speed
+        walk_from_stop = dist_dest / walk_speed
+
+        dest_seconds_by_vehicle = self._dest_seconds_by_vehicle(dest_arrival_times)
+        for begin_time in begin_arrival_times:
+            if begin_time.seconds is None or begin_time.seconds < walk_to_stop:
+                continue  # Already gone by the time we reach the stop
+            dest_seconds = self._next_dest_seconds(dest_seconds_by_vehicle, begin_time)
+            if dest_seconds is not None:
+                return int(round(dest_seconds + walk_from_stop)), True
+
+        ride_distance = self._haversine_distance(begin_stop[0], begin_stop[1], dest_stop[0], dest_stop[1])
+        ride = ride_distance / settings.routing_bus_speed
+        wait = settings.routing_board_wait_seconds
+        return int(round(walk_to_stop + wait + ride + walk_from_stop)), False
 
     def _filter_arrival_times_by_direction(
         self,
@@ -364,12 +503,15 @@ class RouteService:
         if not begin_arrival_times or not dest_arrival_times:
             return begin_arrival_times
         
-        # Create a map of vehicle_id -> arrival_seconds at destination stop
-        dest_times_by_vehicle = {}
-        for dest_time in dest_arrival_times:
-            vehicle_id = dest_time.vehicle_id
-            if vehicle_id and dest_time.seconds is not None:
-                dest_times_by_vehicle[vehicle_id] = dest_time.seconds
+        # Create a map of vehicle_id -> sorted arrival_seconds at destination stop
+        dest_times_by_vehicle = self._dest_seconds_by_vehicle(dest_arrival_times)
+        # Vehicles seen going from the begin stop to the destination; a later pass
+        # of theirs (next lap of a loop) is fine even if its dest ETA wasn't fetched
+        confirmed_vehicles = {
+            begin_time.vehicle_id
+            for begin_time in begin_arrival_times
+            if self._next_dest_seconds(dest_times_by_vehicle, begin_time) is not None
+        }
         
         filtered_times = []
         for begin_time in begin_arrival_times:
@@ -381,19 +523,37 @@ class RouteService:
                 filtered_times.append(begin_time)
                 continue
             
-            # Check if this vehicle also has an arrival time at destination
-            dest_seconds = dest_times_by_vehicle.get(vehicle_id)
-            
-            # If vehicle doesn't reach destination, exclude it
-            if dest_seconds is None:
-                continue
-            
-            # Include only if destination arrival time is AFTER begin arrival time
-            if dest_seconds > begin_seconds:
+            # Include only if this vehicle reaches the destination AFTER the begin stop
+            if self._next_dest_seconds(dest_times_by_vehicle, begin_time) is not None:
+                filtered_times.append(begin_time)
+            elif vehicle_id in confirmed_vehicles:
                 filtered_times.append(begin_time)
         
         return filtered_times
 
+    @staticmethod
+    def _dest_seconds_by_vehicle(dest_arrival_times: List[ArrivalTime]) -> Dict[str, List[int]]:
+        """Every destination ETA per vehicle, sorted; a bus on a loop can be listed several times."""
+        by_vehicle: Dict[str, List[int]] = {}
+        for dest_time in dest_arrival_times:
+            if dest_time.vehicle_id and dest_time.seconds is not None:
+                by_vehicle.setdefault(dest_time.vehicle_id, []).append(dest_time.seconds)
+        for seconds in by_vehicle.values():
+            seconds.sort()
+        return by_vehicle
+
+    @staticmethod
+    def _next_dest_seconds(
+        dest_seconds_by_vehicle: Dict[str, List[int]],
+        begin_time: ArrivalTime
+    ) -> Optional[int]:
+        """The same vehicle's first destination ETA after it leaves the begin stop, if any."""
+        seconds = dest_seconds_by_vehicle.get(begin_time.vehicle_id)
+        if not seconds or begin_time.seconds is None:
+            return None
+        i = bisect_right(seconds, begin_time.seconds)
+        return seconds[i] if i < len(seconds) else None
+
     def _extract_route_stop_id(self, stop: dict) -> Optional[str]:
         """Extract route stop ID from stop object."""
         # Try both "RouteStopID" and "RouteStopId" (API uses different casing)
@@ -406,6 +566,67 @@ class RouteService:
             return route_stop_id
         return None
 
+    async def _get_eta_data(self, route_stop_pairs: List[Tuple[str, str]], times_per_stop: int) -> List[dict]:
+        """Arrival times for (route ID, route stop ID) pairs, shaped like GetStopArrivalTimes.
+
+        With eta_source "local" every stop is predicted locally. Otherwise the
+        upstream answer is used, and stops it has no times for (or whose times
+        come from a stale fallback copy) are filled in by the local predictor.
+        The result stays a StaleList while any stale upstream item remains.
+        """
+        if not route_stop_pairs:
+            return []
+        if settings.eta_source == "local":
+            return await self._local_eta_data(route_stop_pairs, times_per_stop)
+
+        upstream = await self.transloc_api_service.get_stop_arrival_times_batch(route_stop_pairs, times_per_stop)
+        stale_age = getattr(upstream, "age", None)
+        by_stop: Dict[str, dict] = {}
+        for item in upstream:
+            route_stop_id = self._extract_route_stop_id(item)
+            if route_stop_id:
+                by_stop[route_stop_id] = item
+
+        missing = [
+            (route_id, route_stop_id) for route_id, route_stop_id in route_stop_pairs
+            if stale_age is not None or not self._has_seconds(by_stop.get(route_stop_id))
+        ]
+        if not missing:
+            return upstream
+
+        for item in await self._local_eta_data(missing, times_per_stop):
+            if item["Times"]:
+                by_stop[item["RouteStopID"]] = item
+        merged = list(by_stop.values())
+        if stale_age is not None and any(item.get("Times") and not item.get("IsPredicted") for item in merged):
+            return StaleList(merged, stale_age)
+        return merged
+
+    @staticmethod
+    def _has_seconds(item: Optional[dict]) -> bool:
+        return item is not None and any(t.get("Seconds") is not None for t in item.get("Times") or [])
+
+    async def _local_eta_data(self, route_stop_pairs: List[Tuple[str, str]], times_per_stop: int) -> List[dict]:
+        """GetStopArrivalTimes-shaped items predicted from recent vehicle history, no upstream call."""
+        observed = await self._observe_vehicles(await self.transloc_api_service.get_vehicle_snapshot())
+        if observed is None:
+            return []
+        _, snapper, _ = observed
+        now = time.time()
+        items = []
+        for route_id, route_stop_id in route_stop_pairs:
+            arrivals = self.eta_predictor.arrivals(snapper, route_id, route_stop_id, now, times_per_stop)
+            items.append({
+                "RouteID": route_id,
+                "RouteStopID": route_stop_id,
+                "IsPredicted": True,
+                "Times": [
+                    {"VehicleId": vehicle_id, "Seconds": seconds, "IsArriving": seconds < 30, "IsPredicted": True}
+                    for vehicle_id, seconds in arrivals
+                ],
+            })
+        return items
+
     def _parse_arrival_times(self, eta_data: List[dict], route_stop_id: Optional[str]) -> List[ArrivalTime]:
         """Parse arrival times from GetStopArrivalTimes API response.
         
@@ -469,6 +690,7 @@ class RouteService:
                     )
                     is_arriving = time_obj.get("IsArriving", False)
                     on_time_status = time_obj.get("OnTimeStatus")
+                    is_predicted = time_obj.get("IsPredicted")
                     
                     arrival_time_obj = ArrivalTime(
                         minutes=minutes,
@@ -479,7 +701,8 @@ class RouteService:
                         is_arriving=is_arriving,
                         on_time_status=on_time_status,
                         vehicle_id=vehicle_id,
-                        vehicle_name=time_obj.get("VehicleName")
+                        vehicle_name=time_obj.get("VehicleName"),
+                        is_predicted=is_predicted
                     )
                     arrival_times.append(arrival_time_obj)
         
@@ -488,132 +711,447 @@ class RouteService:
 
         return arrival_times
 
-    async def get_map_routes(self) -> List[MapRoute]:
-        """Get routes with map information."""
+    async def get_map_routes(self) -> List[Dict[str, Any]]:
+        """Get routes with map information, as camelCase dicts shaped like MapRoute."""
+        map_routes_data, stops_lists = await self._fetch_map_routes_data()
+        return self._build_map_routes(map_routes_data, stops_lists)
+
+    async def get_map_routes_payload(self, zoom: Optional[int] = None) -> Tuple[bytes, str]:
+        """Get the serialized /map-routes JSON body and its ETag.
+
+        With `zoom`, route lines are the Douglas-Peucker simplified version
+        for that zoom level (see SimplifiedPolyline); without it they are
+        passed through unchanged. Bodies are rebuilt only when the upstream
+        route or stop lists change (the TranslocApiService cache returns the
+        same list objects until a refresh), so repeat calls cost a few cache
+        lookups.
+        """
+        map_routes_data, stops_lists = await self._fetch_map_routes_data()
+        key = (id(map_routes_data), tuple(id(stops) for stops in stops_lists))
+        if key != self._map_routes_key:
+            await self._update_polylines(map_routes_data)
+            self._map_routes_payloads = {}
+            self._map_routes_key = key
+            # Keep the source lists alive so their ids stay unique while cached
+            self._map_routes_sources = (map_routes_data, stops_lists)
+
+        level = SimplifiedPolyline.level_for(settings.map_routes_zoom_levels, zoom)
+        payload = self._map_routes_payloads.get(level)
+        if payload is None:
+            body = orjson.dumps(self._build_map_routes(map_routes_data, stops_lists, level))
+            etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+            payload = self._map_routes_payloads[level] = (body, etag)
+        return payload
+
+    async def _update_polylines(self, map_routes_data: List[dict]):
+        """Decode and simplify route lines not seen before (off the event loop)."""
+        encoded_lines = {route.get("EncodedPolyline") or "" for route in map_routes_data}
+        polylines = {encoded: self._polylines[encoded] for encoded in encoded_lines if encoded in self._polylines}
+        missing = [encoded for encoded in encoded_lines if encoded not in polylines]
+        if missing:
+            def simplify() -> List[SimplifiedPolyline]:
+                return [
+                    SimplifiedPolyline(encoded, settings.map_routes_zoom_levels, settings.map_routes_simplify_pixels)
+                    for encoded in missing
+                ]
+
+            for simplified in await asyncio.to_thread(simplify):
+                polylines[simplified.encoded] = simplified
+        self._polylines = polylines
+
+    async def _fetch_map_routes_data(self) -> Tuple[List[dict], List[List[dict]]]:
+        """Fetch map routes and every route's stops (stops fetched concurrently)."""
         map_routes_data = await self.transloc_api_service.get_routes_for_map_with_schedule_with_encoded_line()
-        result = []
 
-        for route in map_routes_data:
-            map_route = MapRoute(
-                route_id=self.transloc_api_service._extract_route_id(route) or "",
-                description=route.get("Description", ""),
-                map_line_color=route.get("MapLineColor", "#000000"),
-                map_latitude=route.get("MapLatitude", 0.0),
-                map_longitude=route.get("MapLongitude", 0.0),
-                map_zoom=route.get("MapZoom", 0),
-                is_visible_on_map=route.get("IsVisibleOnMap", False),
-                is_checked_on_map=route.get("IsCheckedOnMap", False),
-                hide_route_line=route.get("HideRouteLine", False),
-                encoded_polyline=route.get("EncodedPolyline", ""),
-                stops=[]
-            )
+        async def no_stops():
+            return []
 
-            # Get stops for this route
-            if map_route.route_id:
-                stops = await self.transloc_api_service.get_stops(map_route.route_id)
-                for stop in stops:
-                    map_stop = MapStop(
-                        route_stop_id=self._extract_route_stop_id(stop) or "",
-                        route_id=self.transloc_api_service._extract_route_id(stop) or "",
-                        description=stop.get("Description", ""),
-                        latitude=stop.get("Latitude", 0.0),
-                        longitude=stop.get("Longitude", 0.0),
-                        order=stop.get("Order", 0),
-                        show_estimates_on_map=stop.get("ShowEstimatesOnMap", False),
-                        show_defaulted_on_map=stop.get("ShowDefaultedOnMap", False)
-                    )
-                    map_route.stops.append(map_stop)
+        stops_lists = await asyncio.gather(*[
+            self.transloc_api_service.get_stops(route_id) if route_id else no_stops()
+            for route_id in (self.transloc_api_service._extract_route_id(route) for route in map_routes_data)
+        ])
+        return map_routes_data, list(stops_lists)
 
-            result.append(map_route)
+    def _build_map_routes(
+        self,
+        map_routes_data: List[dict],
+        stops_lists: List[List[dict]],
+        zoom_level: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Build MapRoute-shaped dicts from map routes and their stop lists.
+
+        Plain dicts with the models' camelCase keys and field types, built
+        without pydantic validation (see MapRoute/MapStop in models.py).
+        `zoom_level` picks a precomputed simplified line from _polylines.
+        """
+        extract_route_id = self.transloc_api_service._extract_route_id
+        result = []
+
+        for route, stops in zip(map_routes_data, stops_lists):
+            encoded_polyline = route.get("EncodedPolyline") or ""
+            if zoom_level is not None and encoded_polyline in self._polylines:
+                encoded_polyline = self._polylines[encoded_polyline].for_zoom(zoom_level)
+            result.append({
+                "routeId": extract_route_id(route) or "",
+                "description": route.get("Description") or "",
+                "mapLineColor": route.get("MapLineColor") or "#000000",
+                "mapLatitude": float(route.get("MapLatitude") or 0.0),
+                "mapLongitude": float(route.get("MapLongitude") or 0.0),
+                "mapZoom": int(route.get("MapZoom") or 0),
+                "isVisibleOnMap": bool(route.get("IsVisibleOnMap", False)),
+                "isCheckedOnMap": bool(route.get("IsCheckedOnMap", False)),
+                "hideRouteLine": bool(route.get("HideRouteLine", False)),
+                "encodedPolyline": encoded_polyline,
+                "stops": [
+                    {
+                        "routeStopId": self._extract_route_stop_id(stop) or "",
+                        "routeId": extract_route_id(stop) or "",
+                        "description": stop.get("Description") or "",
+                        "latitude": float(stop.get("Latitude") or 0.0),
+                        "longitude": float(stop.get("Longitude") or 0.0),
+                        "order": int(stop.get("Order") or 0),
+                        "showEstimatesOnMap": bool(stop.get("ShowEstimatesOnMap", False)),
+                        "showDefaultedOnMap": bool(stop.get("ShowDefaultedOnMap", False)),
+                    }
+                    for stop in stops
+                ],
+            })
 
         return result
 
-    async def get_map_vehicles(self) -> List[MapVehicle]:
-        """Get vehicles for map display with their associated stops."""
-        from models import VehicleStop
-        
-        vehicles_data = await self.transloc_api_service.get_map_vehicle_points()
+    async def get_map_vehicles(self) -> List[Dict[str, Any]]:
+        """Get vehicles for map display, as camelCase dicts shaped like MapVehicle."""
+        _, vehicles = await self.get_map_vehicles_versioned()
+        return vehicles
+
+    async def get_map_vehicles_versioned(self) -> Tuple[int, List[Dict[str, Any]]]:
+        """The /map-vehicles list together with the snapshot version it was built from.
+
+        Built once per vehicle snapshot version and shared by every caller;
+        concurrent callers during a rebuild wait for the same build.
+        """
+        snapshot = await self.transloc_api_service.get_vehicle_snapshot()
+        if self._map_vehicles is not None and self._map_vehicles[0] == snapshot.version:
+            return self._map_vehicles
+
+        return await self._map_vehicles_flight.do(
+            snapshot.version, lambda: self._build_map_vehicles(snapshot)
+        )
+
+    async def get_map_vehicles_payload(self) -> Tuple[int, bytes]:
+        """The serialized /map-vehicles JSON body and its version, encoded once per version."""
+        version, vehicles = await self.get_map_vehicles_versioned()
+        cached = self._map_vehicles_body
+        if cached is not None and cached[0] == version:
+            return cached
+
+        body = orjson.dumps(vehicles)
+        if self._map_vehicles is not None and self._map_vehicles[0] == version:
+            self._map_vehicles_body = (version, body)
+        return version, body
+
+    def get_map_vehicles_data_age(self) -> Optional[float]:
+        """Seconds since the data behind the current /map-vehicles build was fetched."""
+        if not self._map_vehicles_data_time:
+            return None
+        return time.time() - self._map_vehicles_data_time
+
+    async def get_map_vehicles_since(self, since: int) -> Dict[str, Any]:
+        """Vehicles whose fields changed after version `since`, plus removed IDs.
+
+        Shaped like MapVehiclesDelta. Falls back to the full list when `since`
+        is no longer covered by the diff history (or is ahead of us, e.g.
+        after a server restart).
+        """
+        version, vehicles = await self.get_map_vehicles_versioned()
+        if since == version:
+            return {"version": version, "full": False, "vehicles": [], "removed": []}
+
+        diff = self.map_vehicles_diffs.since(since) if since < version else None
+        if diff is None:
+            return {"version": version, "full": True, "vehicles": vehicles, "removed": []}
+
+        changed, removed = diff
+        return {
+            "version": version,
+            "full": False,
+            "vehicles": [vehicle for vehicle in vehicles if vehicle["vehicleId"] in changed],
+            "removed": sorted(removed),
+        }
+
+    async def _build_map_vehicles(self, snapshot: VehicleSnapshot) -> Tuple[int, List[Dict[str, Any]]]:
+        """Build MapVehicle-shaped dicts from one snapshot and one batched ETA call.
+
+        Plain dicts with the models' camelCase keys and field types, built
+        without pydantic validation; they are serialized straight to JSON.
+        Every vehicle is snapped onto its route line in one pass for its
+        progress fields, which also feed the ETA predictor. With eta_source
+        "local" the stop lists are predicted from that progress and no
+        arrival-times call is made; with "upstream" they are too whenever the
+        call fails or comes back empty.
+        """
+        route_ids = sorted(snapshot.vehicles_by_route)
+
+        async def no_arrivals():
+            return []
+
+        # Arrival times for every stop of every active route in one call
+        arrival_times_data, stops_by_route, observed = await asyncio.gather(
+            no_arrivals() if settings.eta_source == "local" else
+            self.transloc_api_service.get_routes_arrival_times(route_ids, times_per_stop=10),
+            asyncio.gather(*[self._get_stops_by_id(route_id) for route_id in route_ids]),
+            self._observe_vehicles(snapshot)
+        )
+        _, snapper, snapped = observed
+        # Fresh local predictions beat a stale or empty upstream answer
+        local_stops = (
+            settings.eta_source == "local"
+            or (bool(snapshot.vehicles) and (not arrival_times_data or isinstance(arrival_times_data, StaleList)))
+        )
+        if local_stops:
+            arrival_times_data = []
+        # RouteStopIDs are unique across routes, so one lookup serves every route
+        stops_by_id: Dict[str, dict] = {}
+        for route_stops_by_id in stops_by_route:
+            stops_by_id.update(route_stops_by_id)
+
+        # Inverted index: vehicle ID -> upcoming stops, one pass over the arrivals
+        vehicle_stops_map: Dict[str, List[Dict[str, Any]]] = {}
+        for stop_data in arrival_times_data:
+            route_stop_id = self._extract_route_stop_id(stop_data)
+            stop_info = stops_by_id.get(route_stop_id, {})
+            stop_name = stop_data.get("StopDescription", stop_info.get("Description", ""))
+            latitude = float(stop_info.get("Latitude") or 0.0)
+            longitude = float(stop_info.get("Longitude") or 0.0)
+
+            for arrival in stop_data.get("Times") or []:
+                vehicle_key = self._vehicle_key(arrival.get("VehicleId"))
+                if vehicle_key is None:
+                    continue
+                if vehicle_key not in vehicle_stops_map:
+                    vehicle_stops_map[vehicle_key] = []
+                seconds = arrival.get("Seconds")
+                vehicle_stops_map[vehicle_key].append({
+                    "routeStopId": route_stop_id or "",
+                    "stopName": stop_name or "",
+                    "latitude": latitude,
+                    "longitude": longitude,
+                    "arrivalSeconds": int(seconds) if seconds is not None else None,
+                })
+
+        # Build vehicles with stop information
+        extract_route_id = self.transloc_api_service._extract_route_id
         result = []
+        for i, vehicle in enumerate(snapshot.vehicles):
+            vehicle_id = vehicle.get("VehicleID")
+            vehicle_key = self._vehicle_key(vehicle_id)
+            progress = self._vehicle_progress(snapper, snapped, i)
+            if local_stops:
+                stops = self._local_vehicle_stops(snapper, snapped, i, snapshot.fetched_at)
+            else:
+                stops = vehicle_stops_map.get(vehicle_key, []) if vehicle_key else []
 
-        # Group vehicles by route to fetch stop data efficiently
-        vehicles_by_route: Dict[str, List[dict]] = {}
-        for vehicle in vehicles_data:
-            route_id = self.transloc_api_service._extract_route_id(vehicle)
-            if route_id:
-                if route_id not in vehicles_by_route:
-                    vehicles_by_route[route_id] = []
-                vehicles_by_route[route_id].append(vehicle)
+            result.append({
+                "vehicleId": str(vehicle_id) if vehicle_id is not None else "",
+                "routeId": extract_route_id(vehicle) or "",
+                "name": vehicle.get("Name") or "",
+                "latitude": float(vehicle.get("Latitude") or 0.0),
+                "longitude": float(vehicle.get("Longitude") or 0.0),
+                "groundSpeed": float(vehicle.get("GroundSpeed") or 0.0),
+                "heading": float(vehicle.get("Heading") or 0.0),
+                "seconds": int(vehicle.get("Seconds") or 0),
+                "isOnRoute": bool(vehicle.get("IsOnRoute", False)),
+                "isDelayed": bool(vehicle.get("IsDelayed", False)),
+                "stops": stops,
+                **progress,
+            })
 
-        # For each route, get arrival times to determine which stops each vehicle serves
-        vehicle_stops_map: Dict[int, List[dict]] = {}
-        
-        for route_id, route_vehicles in vehicles_by_route.items():
-            # Get arrival times for all stops on this route
-            arrival_times_data = await self.transloc_api_service.get_stop_arrival_times(
-                route_id, times_per_stop=10
+        previous = self._map_vehicles
+        if previous is not None and previous[0] >= snapshot.version:
+            # A newer build finished first; don't move the published result back
+            return snapshot.version, result
+        if previous is not None:
+            self._record_map_vehicles_diff(previous, snapshot.version, result)
+        self._map_vehicles = (snapshot.version, result)
+        if self.history_recorder is not None:
+            self.history_recorder.record(snapshot.fetched_at, result, predicted=local_stops)
+        self._map_vehicles_data_time = min(
+            snapshot.fetched_at, time.time() - getattr(arrival_times_data, "age", 0.0)
+        )
+        return self._map_vehicles
+
+    def _record_map_vehicles_diff(
+        self,
+        previous: Tuple[int, List[Dict[str, Any]]],
+        version: int,
+        vehicles: List[Dict[str, Any]]
+    ):
+        """Record which vehicles were added, modified or removed since the previous build."""
+        previous_by_id = {vehicle["vehicleId"]: vehicle for vehicle in previous[1]}
+        current_ids = {vehicle["vehicleId"] for vehicle in vehicles}
+        changed = frozenset(
+            vehicle["vehicleId"] for vehicle in vehicles
+            if previous_by_id.get(vehicle["vehicleId"]) != vehicle
+        )
+        removed = frozenset(vehicle_id for vehicle_id in previous_by_id if vehicle_id not in current_ids)
+        self.map_vehicles_diffs.record(previous[0], version, changed, removed)
+
+    async def _follow_vehicles(self):
+        poller = self.transloc_api_service.vehicle_poller
+        version = 0
+        while True:
+            snapshot = await poller.wait_for_update(version)
+            version = snapshot.version
+            try:
+                if self.history_recorder is not None:
+                    # Observes the snapshot too; recorded once per version
+                    await self.get_map_vehicles_versioned()
+                else:
+                    await self._observe_vehicles(snapshot)
+            except Exception as ex:
+                logger.warning(f"Vehicle follower skipped snapshot v{version}: {ex}")
+
+    async def _observe_vehicles(self, snapshot: VehicleSnapshot) -> Tuple[int, RouteSnapper, SnapResult]:
+        """Snap a vehicle snapshot and feed it to the ETA predictor, once per version."""
+        observed = self._observed
+        if observed is not None and observed[0] >= snapshot.version:
+            return observed
+
+        snapper = await self._get_route_snapper()
+        snapped = self._snap_vehicles(snapper, snapshot.vehicles)
+        if snapshot.fetched_at:
+            extract_route_id = self.transloc_api_service._extract_route_id
+            self.eta_predictor.observe(
+                snapper,
+                [self._vehicle_key(vehicle.get("VehicleID")) for vehicle in snapshot.vehicles],
+                [extract_route_id(vehicle) or "" for vehicle in snapshot.vehicles],
+                snapped,
+                snapshot.fetched_at
             )
-            
-            # Get all stops for this route to get coordinates
-            all_stops = await self.transloc_api_service.get_stops(route_id)
-            stops_by_id = {
-                self._extract_route_stop_id(stop): stop 
-                for stop in all_stops 
-                if self._extract_route_stop_id(stop)
+        observed = (snapshot.version, snapper, snapped)
+        if self._observed is None or self._observed[0] < snapshot.version:
+            self._observed = observed
+        return observed
+
+    async def _get_route_snapper(self) -> RouteSnapper:
+        """The segment index over every route line and its stops (rebuilt on change)."""
+        map_routes_data, stops_lists = await self._fetch_map_routes_data()
+        key = (id(map_routes_data), tuple(id(stops) for stops in stops_lists))
+        if self._route_snapper is not None and key == self._route_snapper_key:
+            return self._route_snapper
+
+        await self._update_polylines(map_routes_data)
+        extract_route_id = self.transloc_api_service._extract_route_id
+        lines = {}
+        route_stops = {}
+        for route, stops in zip(map_routes_data, stops_lists):
+            route_id = extract_route_id(route)
+            polyline = self._polylines.get(route.get("EncodedPolyline") or "")
+            if not route_id or polyline is None or polyline.vertices < 2:
+                continue
+            lines[route_id] = polyline.points
+            route_stops[route_id] = [
+                (
+                    self._extract_route_stop_id(stop) or "",
+                    stop.get("Description") or "",
+                    float(stop.get("Latitude") or 0.0),
+                    float(stop.get("Longitude") or 0.0),
+                )
+                for stop in sorted(stops, key=lambda stop: stop.get("Order") or 0)
+            ]
+
+        self._route_snapper = await asyncio.to_thread(
+            RouteSnapper, lines, route_stops, settings.vehicle_snap_cell_size, settings.vehicle_snap_max_distance
+        )
+        self._route_snapper_key = key
+        # Keep the source lists alive so their ids stay unique while cached
+        self._route_snapper_sources = (map_routes_data, stops_lists)
+        return self._route_snapper
+
+    def _snap_vehicles(self, snapper: RouteSnapper, vehicles: Tuple[dict, ...]) -> SnapResult:
+        """Snap the whole fleet onto its route lines in one vectorized pass."""
+        extract_route_id = self.transloc_api_service._extract_route_id
+        lats = np.fromiter((float(v.get("Latitude") or 0.0) for v in vehicles), np.float64, len(vehicles))
+        lngs = np.fromiter((float(v.get("Longitude") or 0.0) for v in vehicles), np.float64, len(vehicles))
+        # A parked bus's heading says nothing about its direction of travel
+        headings = np.fromiter(
+            (
+                float(v.get("Heading") or 0.0) if float(v.get("GroundSpeed") or 0.0) > 0 else math.nan
+                for v in vehicles
+            ),
+            np.float64, len(vehicles)
+        )
+        route_ids = [extract_route_id(v) or "" for v in vehicles]
+        return snapper.snap(route_ids, lats, lngs, headings)
+
+    @staticmethod
+    def _vehicle_progress(snapper: RouteSnapper, snapped: SnapResult, i: int) -> Dict[str, Any]:
+        """The MapVehicle progress fields of row `i` of a snap (None when off route)."""
+        if not snapped.on_route[i]:
+            return {
+                "distanceAlongRoute": None,
+                "distanceFromRoute": None,
+                "nextRouteStopId": None,
+                "distanceToNextStop": None,
             }
-            
-            # Group stops by vehicle ID
-            for stop_data in arrival_times_data:
-                route_stop_id = self._extract_route_stop_id(stop_data)
-                stop_info = stops_by_id.get(route_stop_id, {})
-                stop_name = stop_data.get("StopDescription", stop_info.get("Description", ""))
-                
-                times = stop_data.get("Times", [])
-                for time in times:
-                    vehicle_id = time.get("VehicleId")
-                    if vehicle_id is not None:
-                        vehicle_id_int = int(vehicle_id) if isinstance(vehicle_id, (int, float, str)) else vehicle_id
-                        if vehicle_id_int not in vehicle_stops_map:
-                            vehicle_stops_map[vehicle_id_int] = []
-                        
-                        vehicle_stops_map[vehicle_id_int].append({
-                            "route_stop_id": str(route_stop_id) if route_stop_id else "",
-                            "stop_name": stop_name,
-                            "latitude": stop_info.get("Latitude", 0.0),
-                            "longitude": stop_info.get("Longitude", 0.0),
-                            "arrival_seconds": time.get("Seconds")
-                        })
-
-        # Build MapVehicle objects with stop information
-        for vehicle in vehicles_data:
-            vehicle_id = vehicle.get("VehicleID")
-            vehicle_id_int = int(vehicle_id) if vehicle_id is not None and isinstance(vehicle_id, (int, float, str)) else None
-            
-            # Get stops for this vehicle
-            vehicle_stops = vehicle_stops_map.get(vehicle_id_int, []) if vehicle_id_int else []
-            
-            map_vehicle = MapVehicle(
-                vehicle_id=str(vehicle_id) if vehicle_id is not None else "",
-                route_id=self.transloc_api_service._extract_route_id(vehicle) or "",
-                name=vehicle.get("Name", ""),
-                latitude=vehicle.get("Latitude", 0.0),
-                longitude=vehicle.get("Longitude", 0.0),
-                ground_speed=vehicle.get("GroundSpeed", 0.0),
-                heading=vehicle.get("Heading", 0.0),
-                seconds=vehicle.get("Seconds", 0),
-                is_on_route=vehicle.get("IsOnRoute", False),
-                is_delayed=vehicle.get("IsDelayed", False),
-                stops=[
-                    VehicleStop(
-                        route_stop_id=stop["route_stop_id"],
-                        stop_name=stop["stop_name"],
-                        latitude=stop["latitude"],
-                        longitude=stop["longitude"],
-                        arrival_seconds=stop.get("arrival_seconds")
-                    )
-                    for stop in vehicle_stops
-                ]
-            )
-            result.append(map_vehicle)
+        next_stop = int(snapped.next_stop[i])
+        return {
+            "distanceAlongRoute": round(float(snapped.distance_along[i]), 1),
+            "distanceFromRoute": round(float(snapped.distance_from_line[i]), 1),
+            "nextRouteStopId": snapper.stop(next_stop)[0] if next_stop >= 0 else None,
+            "distanceToNextStop": round(float(snapped.distance_to_next_stop[i]), 1) if next_stop >= 0 else None,
+        }
 
-        return result
+    def _local_vehicle_stops(
+        self,
+        snapper: RouteSnapper,
+        snapped: SnapResult,
+        i: int,
+        observed_at: float
+    ) -> List[Dict[str, Any]]:
+        """Upcoming stops of row `i` from its snapped progress, timed by the ETA predictor."""
+        next_stop = int(snapped.next_stop[i])
+        if not snapped.on_route[i] or next_stop < 0:
+            return []
+
+        route_id = snapper.route_ids[int(snapper.stop_route[next_stop])]
+        along = float(snapped.distance_along[i])
+        elapsed = max(0.0, time.time() - observed_at) if observed_at else 0.0
+        stops = []
+        for row in snapper.stops_after(next_stop, settings.map_vehicles_local_stops):
+            seconds = self.eta_predictor.travel_seconds(snapper, route_id, along, row)
+            if seconds is None:
+                break  # the end of an open route
+            route_stop_id, stop_name, latitude, longitude = snapper.stop(row)
+            stops.append({
+                "routeStopId": route_stop_id,
+                "stopName": stop_name,
+                "latitude": latitude,
+                "longitude": longitude,
+                "arrivalSeconds": int(max(0.0, seconds - elapsed)),
+            })
+        return stops
+
+    async def _get_stops_by_id(self, route_id: str) -> Dict[str, dict]:
+        """Route stop ID -> stop for one route, rebuilt only when its stop list changes."""
+        stops = await self.transloc_api_service.get_stops(route_id)
+        cached = self._stops_by_id.get(route_id)
+        if cached is not None and cached[0] is stops:
+            return cached[1]
 
+        stops_by_id = {}
+        for stop in stops:
+            route_stop_id = self._extract_route_stop_id(stop)
+            if route_stop_id:
+                stops_by_id[route_stop_id] = stop
+        self._stops_by_id[route_id] = (stops, stops_by_id)
+        return stops_by_id
+
+    @staticmethod
+    def _vehicle_key(vehicle_id) -> Optional[str]:
+        """Normalize a vehicle ID (numeric or string) for matching across endpoints."""
+        if vehicle_id is None:
+            return None
+        if isinstance(vehicle_id, (int, float)):
+            return str(int(vehicle_id))
+        return str(vehicle_id)
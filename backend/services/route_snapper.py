@@ -0,0 +1,307 @@
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.stop_table import EARTH_RADIUS_M
+
+# Far larger than any route, so (route code * ROUTE_KEY_STRIDE + distance) keys
+# sort by route first and by distance along the route second
+ROUTE_KEY_STRIDE = 1.0e8
+
+# Segments whose bounding box covers more grid cells than this are not put in
+# the grid; they are checked for every vehicle on their route instead
+MAX_CELLS_PER_SEGMENT = 64
+
+# (route_stop_id, stop name, latitude, longitude), in the route's stop Order
+RouteStop = Tuple[str, str, float, float]
+
+
+@dataclass
+class SnapResult:
+    """Per-vehicle arrays from one RouteSnapper.snap() call.
+
+    Rows follow the input order. Vehicles on an unknown route, or farther than
+    `max_distance` from their line, have on_route False; their other values
+    are NaN / -1 and should not be used.
+    """
+    on_route: np.ndarray           # bool
+    distance_along: np.ndarray     # meters from the start of the route line
+    distance_from_line: np.ndarray  # meters between the vehicle and the line
+    next_stop: np.ndarray          # global stop row (see RouteSnapper.stop), -1 if none
+    distance_to_next_stop: np.ndarray  # meters along the line
+
+
+class RouteSnapper:
+    """Projects vehicle positions onto their routes' polylines.
+
+    Built once per change of route lines or stops. Every segment of every
+    route lives in flat arrays in a shared local metric projection, and a grid
+    index maps (route, cell) to the segments passing through that cell, so
+    snapping a vehicle only looks at the segments of its own route near it.
+    Stops are snapped once, in Order, each no earlier along the line than the
+    previous one, which keeps out-and-back routes and loops consistent.
+    """
+
+    def __init__(
+        self,
+        lines: Mapping[str, np.ndarray],
+        stops: Mapping[str, Sequence[RouteStop]],
+        cell_size: float = 100.0,
+        max_distance: float = 75.0,
+        loop_gap: float = 50.0
+    ):
+        self.cell_size = cell_size
+        self.max_distance = max_distance
+
+        route_ids = [route_id for route_id, points in lines.items() if len(points) >= 2]
+        self.route_ids: List[str] = route_ids
+        self.route_codes: Dict[str, int] = {route_id: code for code, route_id in enumerate(route_ids)}
+
+        all_points = np.concatenate([lines[route_id] for route_id in route_ids]) if route_ids else np.zeros((0, 2))
+        origin_lat = float(all_points[:, 0].mean()) if len(all_points) else 0.0
+        self._scale_y = math.pi / 180 * EARTH_RADIUS_M
+        self._scale_x = self._scale_y * math.cos(math.radians(origin_lat))
+
+        # Flat per-segment arrays; route `code` owns rows seg_lo[code]:seg_hi[code]
+        ax, ay, bx, by, start_along, route_of = [], [], [], [], [], []
+        self.seg_lo = np.zeros(len(route_ids), dtype=np.int64)
+        self.seg_hi = np.zeros(len(route_ids), dtype=np.int64)
+        self.route_length = np.zeros(len(route_ids))
+        self.is_loop = np.zeros(len(route_ids), dtype=bool)
+        offset = 0
+        for code, route_id in enumerate(route_ids):
+            xy = self._project(lines[route_id][:, 0], lines[route_id][:, 1])
+            lengths = np.hypot(*(xy[1:] - xy[:-1]).T)
+            ax.append(xy[:-1, 0])
+            ay.append(xy[:-1, 1])
+            bx.append(xy[1:, 0])
+            by.append(xy[1:, 1])
+            start_along.append(np.concatenate(([0.0], np.cumsum(lengths)[:-1])))
+            route_of.append(np.full(len(lengths), code, dtype=np.int64))
+            self.seg_lo[code] = offset
+            offset += len(lengths)
+            self.seg_hi[code] = offset
+            self.route_length[code] = float(lengths.sum())
+            self.is_loop[code] = float(np.hypot(*(xy[-1] - xy[0]))) <= loop_gap
+
+        def flat(parts, dtype=np.float64):
+            return np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype=dtype)
+
+        self.ax, self.ay, self.bx, self.by = flat(ax), flat(ay), flat(bx), flat(by)
+        self.start_along = flat(start_along)
+        self.seg_route = flat(route_of, np.int64)
+        self.seg_length = np.hypot(self.bx - self.ax, self.by - self.ay)
+        # Compass bearing of each segment (degrees clockwise from north)
+        self.seg_bearing = np.degrees(np.arctan2(self.bx - self.ax, self.by - self.ay)) % 360
+
+        self._grid = self._build_grid()
+        self._build_stops(route_ids, stops)
+
+    def __len__(self) -> int:
+        return len(self.route_codes)
+
+    def stop(self, row: int) -> RouteStop:
+        return self.stop_info[row]
+
+    def stops_after(self, row: int, count: int) -> List[int]:
+        """Global stop rows of the `count` stops from `row` on, wrapping around loops."""
+        code = int(self.stop_route[row])
+        lo, hi = int(self.stop_lo[code]), int(self.stop_hi[code])
+        rows = []
+        for k in range(min(count, hi - lo)):
+            nxt = row + k
+            if nxt >= hi:
+                if not self.is_loop[code]:
+                    break
+                nxt -= hi - lo
+            rows.append(nxt)
+        return rows
+
+    def distance_between(self, from_along: float, row: int) -> float:
+        """Meters along the line from position `from_along` to stop `row` (forward, wrapping loops)."""
+        code = int(self.stop_route[row])
+        distance = float(self.stop_along[row]) - from_along
+        if distance < 0 and self.is_loop[code]:
+            distance += float(self.route_length[code])
+        return distance
+
+    def snap(
+        self,
+        route_ids: Sequence[str],
+        lats: np.ndarray,
+        lngs: np.ndarray,
+        headings: Optional[np.ndarray] = None,
+        heading_penalty: float = 50.0
+    ) -> SnapResult:
+        """Snap a whole fleet in one vectorized pass.
+
+        Candidate segments come from the 3x3 grid cells around each vehicle
+        (or the whole route if none are near). With `headings`, segments
+        running more than 90 degrees against a vehicle's heading cost an
+        extra `heading_penalty` meters, so a bus is put on the right side of
+        a street the route uses in both directions. Pass NaN headings for
+        vehicles whose heading is unknown.
+        """
+        n = len(route_ids)
+        codes = np.array([self.route_codes.get(route_id, -1) for route_id in route_ids], dtype=np.int64)
+        xy = self._project(np.asarray(lats, dtype=np.float64), np.asarray(lngs, dtype=np.float64))
+        result = SnapResult(
+            on_route=np.zeros(n, dtype=bool),
+            distance_along=np.full(n, np.nan),
+            distance_from_line=np.full(n, np.nan),
+            next_stop=np.full(n, -1, dtype=np.int64),
+            distance_to_next_stop=np.full(n, np.nan),
+        )
+        if n == 0 or not len(self.ax):
+            return result
+
+        # (vehicle row, segment row) candidate pairs
+        cells = np.floor(xy / self.cell_size).astype(np.int64)
+        pair_vehicle: List[np.ndarray] = []
+        pair_segment: List[np.ndarray] = []
+        for i in range(n):
+            code = int(codes[i])
+            if code < 0:
+                continue
+            cx, cy = int(cells[i, 0]), int(cells[i, 1])
+            near = [
+                self._grid[key]
+                for key in ((code, cx + dx, cy + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1))
+                if key in self._grid
+            ]
+            if code in self._long_segments:
+                near.append(self._long_segments[code])
+            # A segment spanning several cells shows up more than once; harmless for argmin
+            segments = np.concatenate(near) if near else np.arange(self.seg_lo[code], self.seg_hi[code])
+            pair_vehicle.append(np.full(len(segments), i, dtype=np.int64))
+            pair_segment.append(segments)
+        if not pair_vehicle:
+            return result
+        vehicle = np.concatenate(pair_vehicle)
+        segment = np.concatenate(pair_segment)
+
+        # Project every candidate pair onto its segment
+        px, py = xy[vehicle, 0], xy[vehicle, 1]
+        ax, ay = self.ax[segment], self.ay[segment]
+        dx, dy = self.bx[segment] - ax, self.by[segment] - ay
+        length_sq = dx * dx + dy * dy
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = np.where(length_sq > 0, ((px - ax) * dx + (py - ay) * dy) / length_sq, 0.0)
+        t = np.clip(t, 0.0, 1.0)
+        distance = np.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+        cost = distance
+        if headings is not None:
+            heading = np.asarray(headings, dtype=np.float64)[vehicle]
+            diff = np.abs((heading - self.seg_bearing[segment] + 180) % 360 - 180)
+            cost = distance + np.where(diff > 90, heading_penalty, 0.0)  # NaN heading: no penalty
+
+        # Cheapest pair per vehicle: sort by (vehicle, cost), take each vehicle's first row
+        order = np.lexsort((cost, vehicle))
+        rows, first = np.unique(vehicle[order], return_index=True)
+        best = order[first]
+        best_segment = segment[best]
+        along = self.start_along[best_segment] + t[best] * self.seg_length[best_segment]
+        offset = distance[best]
+
+        on_route = offset <= self.max_distance
+        rows, along, offset = rows[on_route], along[on_route], offset[on_route]
+        route = codes[rows]
+        result.on_route[rows] = True
+        result.distance_along[rows] = along
+        result.distance_from_line[rows] = offset
+
+        # Next stop: first stop of the same route further along (wrapping loops)
+        if len(self.stop_key):
+            idx = np.searchsorted(self.stop_key, route * ROUTE_KEY_STRIDE + along, side="right")
+            past_end = idx >= self.stop_hi[route]
+            wraps = past_end & self.is_loop[route]
+            idx = np.where(wraps, self.stop_lo[route], idx)
+            has_stop = (self.stop_hi[route] > self.stop_lo[route]) & (~past_end | wraps)
+            idx = np.where(has_stop, idx, 0)
+            to_next = self.stop_along[idx] - along + np.where(wraps, self.route_length[route], 0.0)
+            result.next_stop[rows] = np.where(has_stop, idx, -1)
+            result.distance_to_next_stop[rows] = np.where(has_stop, to_next, np.nan)
+        return result
+
+    def _project(self, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+        return np.column_stack((np.asarray(lngs) * self._scale_x, np.asarray(lats) * self._scale_y))
+
+    def _build_grid(self) -> Dict[Tuple[int, int, int], np.ndarray]:
+        """(route code, cell x, cell y) -> rows of the segments whose bounding box touches the cell.
+
+        Very long segments go to `_long_segments` instead, so one bad vertex in
+        an upstream line can't blow the grid up to millions of cells.
+        """
+        size = self.cell_size
+        x0 = np.floor(np.minimum(self.ax, self.bx) / size).astype(np.int64)
+        x1 = np.floor(np.maximum(self.ax, self.bx) / size).astype(np.int64)
+        y0 = np.floor(np.minimum(self.ay, self.by) / size).astype(np.int64)
+        y1 = np.floor(np.maximum(self.ay, self.by) / size).astype(np.int64)
+
+        grid: Dict[Tuple[int, int, int], List[int]] = {}
+        long_segments: Dict[int, List[int]] = {}
+        for row in range(len(self.ax)):
+            code = int(self.seg_route[row])
+            if (x1[row] - x0[row] + 1) * (y1[row] - y0[row] + 1) > MAX_CELLS_PER_SEGMENT:
+                long_segments.setdefault(code, []).append(row)
+                continue
+            for cx in range(int(x0[row]), int(x1[row]) + 1):
+                for cy in range(int(y0[row]), int(y1[row]) + 1):
+                    key = (code, cx, cy)
+                    if key not in grid:
+                        grid[key] = []
+                    grid[key].append(row)
+        self._long_segments = {code: np.asarray(rows, dtype=np.int64) for code, rows in long_segments.items()}
+        return {key: np.asarray(rows, dtype=np.int64) for key, rows in grid.items()}
+
+    def _build_stops(self, route_ids: List[str], stops: Mapping[str, Sequence[RouteStop]]):
+        """Snap every route's stops, in Order, to non-decreasing positions along its line."""
+        self.stop_info: List[RouteStop] = []
+        self.stop_rows: Dict[Tuple[str, str], int] = {}  # (route_id, route_stop_id) -> row
+        along_parts: List[float] = []
+        route_parts: List[int] = []
+        self.stop_lo = np.zeros(len(route_ids), dtype=np.int64)
+        self.stop_hi = np.zeros(len(route_ids), dtype=np.int64)
+
+        for code, route_id in enumerate(route_ids):
+            self.stop_lo[code] = len(self.stop_info)
+            lo, hi = int(self.seg_lo[code]), int(self.seg_hi[code])
+            previous = 0.0
+            for stop in stops.get(route_id, ()):
+                _, _, lat, lng = stop
+                px, py = self._project(np.array([lat]), np.array([lng]))[0]
+                ax, ay = self.ax[lo:hi], self.ay[lo:hi]
+                dx, dy = self.bx[lo:hi] - ax, self.by[lo:hi] - ay
+                length_sq = dx * dx + dy * dy
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    t = np.where(length_sq > 0, ((px - ax) * dx + (py - ay) * dy) / length_sq, 0.0)
+                t = np.clip(t, 0.0, 1.0)
+                distance = np.hypot(px - (ax + t * dx), py - (ay + t * dy))
+                along = self.start_along[lo:hi] + t * self.seg_length[lo:hi]
+
+                # Prefer the closest point not behind the previous stop. Skipping
+                # ahead costs 1 m per 100 m, so where the line passes the stop
+                # twice (a loop's start and end, out-and-back streets) the
+                # earlier pass wins unless the later one is clearly closer.
+                ahead = along >= previous
+                candidates = np.where(ahead & (distance <= self.max_distance))[0]
+                if len(candidates):
+                    cost = distance[candidates] + 0.01 * (along[candidates] - previous)
+                    pick = candidates[np.argmin(cost)]
+                else:
+                    pick = int(np.argmin(distance))
+                previous = max(previous, float(along[pick]))
+
+                self.stop_rows.setdefault((route_id, stop[0]), len(self.stop_info))
+                self.stop_info.append(stop)
+                along_parts.append(previous)
+                route_parts.append(code)
+            self.stop_hi[code] = len(self.stop_info)
+
+        self.stop_along = np.asarray(along_parts, dtype=np.float64)
+        self.stop_route = np.asarray(route_parts, dtype=np.int64)
+        # Sorted search keys: route first, then distance along the route
+        self.stop_key = self.stop_route * ROUTE_KEY_STRIDE + self.stop_along
@@ -0,0 +1,43 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Collapses concurrent identical calls into one shared in-flight call.
+
+    The first caller for a key starts the call; callers that arrive while it is
+    still running await the same future and receive the same result (or
+    exception). The key is forgotten as soon as the call finishes, so this
+    never serves stale data; it only removes duplicate work.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.collapsed = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `fn()` for `key`, or join the call already running for it."""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.collapsed += 1
+        else:
+            self.calls += 1
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+
+        # Shield so one cancelled caller doesn't cancel the call for the others
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, future: asyncio.Future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, int]:
+        """How many calls were issued and how many were collapsed into them."""
+        return {
+            "calls": self.calls,
+            "collapsed": self.collapsed,
+            "inFlight": len(self._inflight),
+        }
@@ -0,0 +1,56 @@
+import logging
+import os
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+
+
+class StaticSnapshot:
+    """Compact on-disk copy of static TransLoc data, for warm restarts.
+
+    The file is one zlib-compressed JSON document:
+
+        {"format": 1, "savedAt": <unix time>,
+         "activeRouteIds": [...],
+         "entries": [[endpoint, {param: value}, fresh_seconds_left, data], ...]}
+
+    Writes go to a temporary file that is then renamed over the old one, so a
+    crash mid-write never leaves a truncated snapshot behind. Unreadable or
+    foreign-format files are ignored (the service just starts cold).
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """The saved document, or None if there is no usable snapshot."""
+        try:
+            with open(self.path, "rb") as f:
+                document = orjson.loads(zlib.decompress(f.read()))
+        except FileNotFoundError:
+            return None
+        except Exception as ex:
+            logger.warning(f"Ignoring unreadable TransLoc snapshot {self.path}: {ex}")
+            return None
+
+        if not isinstance(document, dict) or document.get("format") != SNAPSHOT_FORMAT:
+            logger.warning(f"Ignoring TransLoc snapshot {self.path} with unknown format")
+            return None
+        return document
+
+    def save(self, document: Dict[str, Any]) -> int:
+        """Atomically replace the snapshot file; returns its size in bytes."""
+        body = zlib.compress(orjson.dumps({**document, "format": SNAPSHOT_FORMAT, "savedAt": time.time()}), 6)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, self.path)
+        return len(body)
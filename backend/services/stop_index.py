@@ -0,0 +1,101 @@
+import math
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from services.stop_table import EARTH_RADIUS_M, StopTable, StopTuple
+
+
+def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Calculate the great circle distance between two points on Earth in meters."""
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return EARTH_RADIUS_M * c
+
+
+class StopIndex:
+    """Uniform grid over a StopTable in locally projected (equirectangular) meters.
+
+    Built once per stop set. A radius query only visits the grid cells that
+    overlap the search circle, so its cost depends on local stop density
+    rather than on the total number of stops and routes. Distances for the
+    candidate rows are computed in one vectorized call.
+    """
+
+    def __init__(self, table: StopTable, cell_size: float = 250.0):
+        self.table = table
+        self.cell_size = cell_size
+        # Project around the mean latitude; distortion is negligible at city scale
+        self.ref_lat = float(table.lat.mean()) if len(table) else 0.0
+        self._cos_ref = math.cos(math.radians(self.ref_lat))
+
+        self.cells: Dict[Tuple[int, int], np.ndarray] = {}
+        if len(table):
+            x, y = self._project(table.lat, table.lng)
+            cx = np.floor(x / cell_size).astype(np.int64)
+            cy = np.floor(y / cell_size).astype(np.int64)
+            cells, inverse = np.unique(np.stack([cx, cy], axis=1), axis=0, return_inverse=True)
+            order = np.argsort(inverse.ravel(), kind="stable")
+            bounds = np.searchsorted(inverse.ravel()[order], np.arange(len(cells) + 1))
+            for i, (gx, gy) in enumerate(cells):
+                self.cells[(int(gx), int(gy))] = order[bounds[i]:bounds[i + 1]]
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def within(self, lat: float, lng: float, radius: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows (ascending) and distances of all stops within `radius` meters."""
+        x, y = self._project(lat, lng)
+        # Pad by one cell: projected and great-circle distance differ slightly
+        reach = int(math.ceil(radius / self.cell_size)) + 1
+        cx = int(math.floor(x / self.cell_size))
+        cy = int(math.floor(y / self.cell_size))
+
+        parts = [
+            self.cells[(gx, gy)]
+            for gx in range(cx - reach, cx + reach + 1)
+            for gy in range(cy - reach, cy + reach + 1)
+            if (gx, gy) in self.cells
+        ]
+        if not parts:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        rows = np.sort(np.concatenate(parts))
+        distances = self.table.distances_from(lat, lng, rows)
+        mask = distances <= radius
+        return rows[mask], distances[mask]
+
+    def nearest_per_route(
+        self,
+        lat: float,
+        lng: float,
+        radius: float,
+        k: int = 1
+    ) -> Dict[str, List[Tuple[float, StopTuple]]]:
+        """The k nearest stops of every route within `radius` meters, nearest first."""
+        rows, distances = self.within(lat, lng, radius)
+        if not len(rows):
+            return {}
+
+        # Grouped top-k: sort by (route, distance, row) and keep the first k of each route
+        route_idx = self.table.route_idx[rows]
+        order = np.lexsort((rows, distances, route_idx))
+        grouped = route_idx[order]
+        starts = np.flatnonzero(np.r_[True, grouped[1:] != grouped[:-1]])
+        rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+        keep = order[rank < k]
+
+        result: Dict[str, List[Tuple[float, StopTuple]]] = {}
+        for i in keep:
+            stop = self.table.stop(rows[i])
+            if stop[3] not in result:
+                result[stop[3]] = []
+            result[stop[3]].append((float(distances[i]), stop))
+        return result
+
+    def _project(self, lat, lng):
+        x = np.radians(lng) * EARTH_RADIUS_M * self._cos_ref
+        y = np.radians(lat) * EARTH_RADIUS_M
+        return x, y
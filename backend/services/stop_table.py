@@ -0,0 +1,110 @@
+import sys
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000
+
+# (latitude, longitude, description, route_id, route_stop_id)
+StopTuple = Tuple[float, float, str, str, Optional[str]]
+
+
+def haversine_distances(lat, lng, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Vectorized great circle distance in meters.
+
+    `lat`/`lng` may be scalars or arrays that broadcast against `lats`/`lngs`,
+    e.g. shape (m, 1) origins against (n,) stops gives an (m, n) matrix.
+    """
+    lat1 = np.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlon = np.radians(lngs) - np.radians(lng)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return EARTH_RADIUS_M * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+class StopTable:
+    """Columnar, array-backed table of every stop on a set of routes.
+
+    Rows are grouped by route (in the order routes were given), which lets
+    per-route reductions run as segmented numpy operations. Built once per
+    stop refresh and treated as read-only afterwards.
+    """
+
+    def __init__(
+        self,
+        route_ids: Sequence[str],
+        lat: np.ndarray,
+        lng: np.ndarray,
+        route_idx: np.ndarray,
+        route_stop_id: np.ndarray,
+        description: np.ndarray,
+        order: np.ndarray
+    ):
+        self.route_ids = list(route_ids)
+        self.lat = lat
+        self.lng = lng
+        self.route_idx = route_idx
+        self.route_stop_id = route_stop_id
+        self.description = description
+        self.order = order
+        # First row of every route; routes without stops get an empty segment
+        self.route_offsets = np.searchsorted(route_idx, np.arange(len(self.route_ids)))
+
+    @classmethod
+    def from_stops(
+        cls,
+        route_ids: Sequence[str],
+        stops_lists: Sequence[List[dict]],
+        extract_route_stop_id: Callable[[dict], Optional[str]]
+    ) -> "StopTable":
+        """Build the table from raw GetStops responses, one list per route."""
+        lats: List[float] = []
+        lngs: List[float] = []
+        route_idx: List[int] = []
+        stop_ids: List[Optional[str]] = []
+        descriptions: List[str] = []
+        orders: List[int] = []
+
+        for i, stops in enumerate(stops_lists):
+            for stop in stops:
+                lat = stop.get("Latitude")
+                lng = stop.get("Longitude")
+                if lat is None or lng is None:
+                    continue
+                route_stop_id = extract_route_stop_id(stop)
+                lats.append(lat)
+                lngs.append(lng)
+                route_idx.append(i)
+                stop_ids.append(sys.intern(route_stop_id) if route_stop_id else None)
+                descriptions.append(stop.get("Description", ""))
+                orders.append(stop.get("Order") or 0)
+
+        return cls(
+            route_ids,
+            np.asarray(lats, dtype=np.float64),
+            np.asarray(lngs, dtype=np.float64),
+            np.asarray(route_idx, dtype=np.int32),
+            np.asarray(stop_ids, dtype=object),
+            np.asarray(descriptions, dtype=object),
+            np.asarray(orders, dtype=np.int32)
+        )
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    def stop(self, row: int) -> StopTuple:
+        """One row as the (lat, lng, description, route_id, route_stop_id) tuple."""
+        return (
+            float(self.lat[row]),
+            float(self.lng[row]),
+            self.description[row],
+            self.route_ids[self.route_idx[row]],
+            self.route_stop_id[row]
+        )
+
+    def distances_from(self, lat, lng, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Distances in meters from an origin (or (m, 1) origins) to every stop or to `rows`."""
+        if rows is None:
+            return haversine_distances(lat, lng, self.lat, self.lng)
+        return haversine_distances(lat, lng, self.lat[rows], self.lng[rows])
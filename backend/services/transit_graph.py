@@ -0,0 +1,321 @@
+import heapq
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Hashable, List, Mapping, Optional, Tuple
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from models import Itinerary, ItineraryLeg
+from services.stop_index import StopIndex, haversine_distance
+from services.stop_table import StopTable
+
+# A graph node is one stop of one route: (route_id, route_stop_id)
+Node = Tuple[str, str]
+
+# Search state modes: waiting at a stop, riding a bus, just got off a bus
+AT_STOP, ON_BOARD, ALIGHTED = 0, 1, 2
+
+
+class TransitGraph:
+    """Stop graph across all active routes, used for trips that need transfers.
+
+    Ride edges link consecutive stops of a route in `Order` (routes are loops,
+    so the last stop links back to the first). Walking transfer edges link
+    stops of different routes within `transfer_radius` meters. The graph is
+    updated per route: only routes whose stop list changed get their edges
+    rebuilt.
+    """
+
+    def __init__(
+        self,
+        bus_speed: float,
+        walk_speed: float,
+        dwell_seconds: float,
+        board_wait_seconds: float,
+        transfer_radius: float,
+        transfer_penalty_seconds: float,
+        max_transfers: int,
+        latency_budget_ms: float
+    ):
+        self.bus_speed = bus_speed
+        self.walk_speed = walk_speed
+        self.dwell_seconds = dwell_seconds
+        self.board_wait_seconds = board_wait_seconds
+        self.transfer_radius = transfer_radius
+        self.transfer_penalty_seconds = transfer_penalty_seconds
+        self.max_transfers = max_transfers
+        self.latency_budget = latency_budget_ms / 1000.0
+
+        # node -> (lat, lng, description)
+        self.nodes: Dict[Node, Tuple[float, float, str]] = {}
+        self.route_nodes: Dict[str, List[Node]] = {}
+        self.route_signatures: Dict[str, Hashable] = {}
+        # node -> (next node on the route, seconds, meters)
+        self.ride_next: Dict[Node, Tuple[Node, float, float]] = {}
+        # node -> {other route's node: (seconds, meters)}
+        self.transfers: Dict[Node, Dict[Node, Tuple[float, float]]] = {}
+        self.routes_rebuilt = 0
+
+    def update(self, table: StopTable, stop_index: StopIndex, signatures: Mapping[str, Hashable]):
+        """Bring the graph in line with a new stop table.
+
+        `signatures` maps route ID to a value that changes whenever that
+        route's stop list changes; routes with an unchanged signature keep
+        their edges.
+        """
+        changed = [
+            route_id for route_id in table.route_ids
+            if self.route_signatures.get(route_id) != signatures.get(route_id)
+        ]
+        removed = [route_id for route_id in self.route_signatures if route_id not in signatures]
+
+        for route_id in changed + removed:
+            self._remove_route(route_id)
+        for route_id in changed:
+            self._add_route(route_id, table)
+        for route_id in changed:
+            self._add_transfers(route_id, stop_index)
+
+        self.route_signatures = dict(signatures)
+        self.routes_rebuilt += len(changed)
+
+    def plan(
+        self,
+        begin_lat: float,
+        begin_lng: float,
+        dest_lat: float,
+        dest_lng: float,
+        stop_index: StopIndex,
+        max_walking_distance: float,
+        route_names: Mapping[str, str]
+    ) -> List[Itinerary]:
+        """Best itineraries with 1..max_transfers transfers between two points.
+
+        A Dijkstra search over (node, rides taken, mode) states, cut off at the
+        latency budget. An itinerary is only returned if it is faster than the
+        best one with fewer transfers.
+        """
+        deadline = time.perf_counter() + self.latency_budget
+        max_rides = self.max_transfers + 1
+
+        egress: Dict[Node, float] = {}
+        for node, meters in self._nodes_near(dest_lat, dest_lng, max_walking_distance, stop_index):
+            egress[node] = meters
+
+        # state -> (cost, parent state, edge) for path reconstruction
+        best: Dict[Tuple[Node, int, int], float] = {}
+        parents: Dict[Tuple[Node, int, int], Tuple[Optional[Tuple[Node, int, int]], tuple]] = {}
+        heap: List[Tuple[float, int, Tuple[Node, int, int]]] = []
+        counter = 0
+
+        def push(state, cost, parent, edge):
+            nonlocal counter
+            if cost < best.get(state, float("inf")):
+                best[state] = cost
+                parents[state] = (parent, edge)
+                counter += 1
+                heapq.heappush(heap, (cost, counter, state))
+
+        for node, meters in self._nodes_near(begin_lat, begin_lng, max_walking_distance, stop_index):
+            push((node, 0, AT_STOP), meters / self.walk_speed, None, ("access", meters))
+
+        # rides taken -> (total seconds, last state, egress meters)
+        arrivals: Dict[int, Tuple[float, Tuple[Node, int, int], float]] = {}
+        pops = 0
+        while heap:
+            cost, _, state = heapq.heappop(heap)
+            if cost > best.get(state, float("inf")):
+                continue
+            pops += 1
+            if pops % 64 == 0 and time.perf_counter() > deadline:
+                break
+            if len(arrivals) == max_rides and cost >= max(a[0] for a in arrivals.values()):
+                break
+
+            node, rides, mode = state
+            if mode == AT_STOP:
+                if rides < max_rides:
+                    wait = self.board_wait_seconds
+                    if rides:
+                        wait += self.transfer_penalty_seconds
+                    push((node, rides + 1, ON_BOARD), cost + wait, state, ("board", wait))
+            elif mode == ON_BOARD:
+                # Riding to the next stop we can either stay on or get off there
+                next_hop = self.ride_next.get(node)
+                if next_hop is not None:
+                    next_node, seconds, meters = next_hop
+                    edge = ("ride", seconds, meters)
+                    push((next_node, rides, ON_BOARD), cost + seconds, state, edge)
+                    push((next_node, rides, ALIGHTED), cost + seconds, state, edge)
+            else:
+                if node in egress:
+                    total = cost + egress[node] / self.walk_speed
+                    if total < arrivals.get(rides, (float("inf"),))[0]:
+                        arrivals[rides] = (total, state, egress[node])
+                for other, (seconds, meters) in self.transfers.get(node, {}).items():
+                    push((other, rides, AT_STOP), cost + seconds, state, ("walk", seconds, meters))
+
+        itineraries = []
+        best_so_far = arrivals[1][0] if 1 in arrivals else float("inf")
+        for rides in range(2, max_rides + 1):
+            if rides not in arrivals:
+                continue
+            total, last_state, egress_meters = arrivals[rides]
+            if total >= best_so_far:
+                continue
+            best_so_far = total
+            itineraries.append(self._build_itinerary(
+                total, last_state, egress_meters, parents, route_names
+            ))
+        return itineraries
+
+    def _nodes_near(
+        self,
+        lat: float,
+        lng: float,
+        radius: float,
+        stop_index: StopIndex
+    ) -> List[Tuple[Node, float]]:
+        table = stop_index.table
+        rows, distances = stop_index.within(lat, lng, radius)
+        result = []
+        for row, meters in zip(rows, distances):
+            route_stop_id = table.route_stop_id[row]
+            node = (table.route_ids[table.route_idx[row]], route_stop_id)
+            if route_stop_id and node in self.nodes:
+                result.append((node, float(meters)))
+        return result
+
+    def _remove_route(self, route_id: str):
+        for node in self.route_nodes.pop(route_id, []):
+            self.nodes.pop(node, None)
+            self.ride_next.pop(node, None)
+            for other in self.transfers.pop(node, {}):
+                self.transfers.get(other, {}).pop(node, None)
+        self.route_signatures.pop(route_id, None)
+
+    def _add_route(self, route_id: str, table: StopTable):
+        """Add a route's nodes and its ride edges in stop `Order`."""
+        i = table.route_ids.index(route_id)
+        start = table.route_offsets[i]
+        end = table.route_offsets[i + 1] if i + 1 < len(table.route_ids) else len(table)
+        rows = sorted(range(start, end), key=lambda row: table.order[row])
+
+        nodes = []
+        for row in rows:
+            route_stop_id = table.route_stop_id[row]
+            if not route_stop_id:
+                continue
+            node = (route_id, route_stop_id)
+            if node in self.nodes:
+                continue
+            self.nodes[node] = (float(table.lat[row]), float(table.lng[row]), table.description[row])
+            nodes.append(node)
+        self.route_nodes[route_id] = nodes
+
+        if len(nodes) < 2:
+            return
+        for node, next_node in zip(nodes, nodes[1:] + nodes[:1]):
+            lat1, lng1, _ = self.nodes[node]
+            lat2, lng2, _ = self.nodes[next_node]
+            meters = haversine_distance(lat1, lng1, lat2, lng2)
+            self.ride_next[node] = (next_node, meters / self.bus_speed + self.dwell_seconds, meters)
+
+    def _add_transfers(self, route_id: str, stop_index: StopIndex):
+        """Add walking transfer edges between a route's stops and other routes' stops."""
+        for node in self.route_nodes.get(route_id, []):
+            lat, lng, _ = self.nodes[node]
+            for other, meters in self._nodes_near(lat, lng, self.transfer_radius, stop_index):
+                if other[0] == route_id:
+                    continue
+                edge = (meters / self.walk_speed, meters)
+                self.transfers.setdefault(node, {})[other] = edge
+                self.transfers.setdefault(other, {})[node] = edge
+
+    def _build_itinerary(
+        self,
+        total: float,
+        last_state: Tuple[Node, int, int],
+        egress_meters: float,
+        parents: Dict,
+        route_names: Mapping[str, str]
+    ) -> Itinerary:
+        """Walk parent pointers back to the origin and merge edges into legs."""
+        edges = []
+        state = last_state
+        while state is not None:
+            parent, edge = parents[state]
+            edges.append((parent, state, edge))
+            state = parent
+        edges.reverse()
+
+        legs: List[ItineraryLeg] = []
+        first_node = edges[0][1][0]
+        legs.append(self._walk_leg("Start", None, first_node, edges[0][2][1]))
+
+        ride: Optional[dict] = None
+        for parent, state, edge in edges[1:]:
+            kind = edge[0]
+            if kind == "board":
+                ride = {"from": state[0], "seconds": 0.0, "meters": 0.0, "stops": 0}
+            elif kind == "ride":
+                ride["seconds"] += edge[1]
+                ride["meters"] += edge[2]
+                ride["stops"] += 1
+                if state[2] == ALIGHTED:
+                    legs.append(self._ride_leg(ride, state[0], route_names))
+                    ride = None
+            elif kind == "walk":
+                legs.append(self._walk_leg(self.nodes[parent[0]][2], parent[0], state[0], edge[2]))
+
+        last_node = last_state[0]
+        legs.append(ItineraryLeg(
+            mode="walk",
+            from_name=self.nodes[last_node][2],
+            from_route_stop_id=last_node[1],
+            to_name="Destination",
+            distance=round(egress_meters, 1),
+            duration_seconds=int(round(egress_meters / self.walk_speed))
+        ))
+
+        walking = sum(leg.distance for leg in legs if leg.mode == "walk")
+        return Itinerary(
+            transfers=sum(1 for leg in legs if leg.mode == "ride") - 1,
+            total_seconds=int(round(total)),
+            total_walking_distance=round(walking, 1),
+            legs=legs
+        )
+
+    def _walk_leg(
+        self,
+        from_name: str,
+        from_node: Optional[Node],
+        node: Node,
+        meters: float
+    ) -> ItineraryLeg:
+        return ItineraryLeg(
+            mode="walk",
+            from_name=from_name,
+            from_route_stop_id=from_node[1] if from_node else None,
+            to_name=self.nodes[node][2],
+            to_route_stop_id=node[1],
+            distance=round(meters, 1),
+            duration_seconds=int(round(meters / self.walk_speed))
+        )
+
+    def _ride_leg(self, ride: dict, to_node: Node, route_names: Mapping[str, str]) -> ItineraryLeg:
+        route_id = to_node[0]
+        return ItineraryLeg(
+            mode="ride",
+            route_id=route_id,
+            route_name=route_names.get(route_id, "N/A"),
+            from_name=self.nodes[ride["from"]][2],
+            from_route_stop_id=ride["from"][1],
+            to_name=self.nodes[to_node][2],
+            to_route_stop_id=to_node[1],
+            distance=round(ride["meters"], 1),
+            duration_seconds=int(round(ride["seconds"])),
+            stop_count=ride["stops"]
+        )
@@ -1,188 +1,582 @@
+import asyncio
 import httpx
 import logging
 import sys
+import time
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Mapping, Optional, Tuple
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config import settings
+from services.circuit_breaker import CircuitBreaker
+from services.latency_tracker import HedgeBudget, LatencyTracker
+from services.single_flight import SingleFlight
+from services.static_snapshot import StaticSnapshot
+from services.ttl_cache import TTLCache
+from services.upstream_capture import RecordingTransport, ReplayTransport
+from services.vehicle_poller import VehiclePoller, VehicleSnapshot
 
 logger = logging.getLogger(__name__)
 
 
+class TranslocApiError(Exception):
+    """Raised when the TransLoc API answers with a non-success status."""
+
+
+class CircuitOpenError(TranslocApiError):
+    """Raised without a network call while an endpoint's circuit is open."""
+
+
+class StaleList(list):
+    """A last known-good response served because the live call failed.
+
+    Behaves as the plain list callers expect; `age` is how many seconds old
+    the data is, so responses built from it can say so.
+    """
+
+    def __init__(self, data: List[Any], age: float):
+        super().__init__(data)
+        self.age = age
+
+
 class TranslocApiService:
     def __init__(self):
         self.base_url = settings.transloc_base_url
         self.api_key = settings.transloc_api_key
+        limits = httpx.Limits(
+            max_connections=settings.transloc_max_connections,
+            max_keepalive_connections=settings.transloc_max_keepalive_connections,
+            keepalive_expiry=settings.transloc_keepalive_expiry
+        )
+        # Optionally record upstream exchanges to a capture file, or replay one offline
+        self.capture = self._capture_transport(limits)
         self.client = httpx.AsyncClient(
-            timeout=30.0,
-            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5)
+            timeout=httpx.Timeout(
+                settings.transloc_timeout,
+                connect=settings.transloc_connect_timeout
+            ),
+            limits=limits,
+            transport=self.capture
         )
 
-    async def get_all_routes(self) -> List[dict]:
-        """Get all routes from the Transloc API."""
-        endpoint = "/GetRoutes"
-        url = f"{self.base_url}{endpoint}"
-        params = {"APIKey": self.api_key}
-        
+        # Static data (routes, stops, route descriptions, map lines) is cached per
+        # endpoint; live data (vehicles, arrival times) is never cached here.
+        self.cache = TTLCache(settings.transloc_cache_max_entries)
+        self.cache_ttls: Dict[str, float] = {
+            "/GetRoutes": settings.transloc_routes_ttl,
+            "/GetStops": settings.transloc_stops_ttl,
+            "/GetRoutesForMapWithScheduleWithEncodedLine": settings.transloc_map_routes_ttl,
+        }
+        self._refresh_tasks: Dict[Tuple, asyncio.Task] = {}
+
+        # Static cache entries are persisted to disk and reloaded on startup,
+        # so a restarted process serves warm data before the first upstream call.
+        # A replay takes all its data from the capture and leaves the snapshot alone.
+        self.snapshot: Optional[StaticSnapshot] = None
+        if settings.transloc_snapshot_path and settings.transloc_capture_mode != "replay":
+            path = Path(settings.transloc_snapshot_path)
+            if not path.is_absolute():
+                path = Path(__file__).parent.parent / path
+            self.snapshot = StaticSnapshot(path)
+        self.snapshot_route_ids: List[str] = []  # active routes when the snapshot was saved
+        self.snapshot_entries_loaded = 0
+        self.snapshot_saves = 0
+        self._snapshot_keys: List[Tuple] = []
+        self._snapshot_dirty = False
+        self._snapshot_task: Optional[asyncio.Task] = None
+
+        # Last known-good responses of live (uncached) endpoints, served with
+        # their age when the upstream call fails
+        self.last_good = TTLCache(settings.transloc_cache_max_entries)
+        self.fallbacks_served = 0
+
+        # One circuit breaker per endpoint so an outage of one doesn't block the others
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+        # Per-endpoint latency drives adaptive timeouts and hedged requests
+        self.latency: Dict[str, LatencyTracker] = {}
+        self.hedge_budget = HedgeBudget(settings.transloc_hedge_max_ratio, settings.transloc_hedge_burst)
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+        # Identical concurrent upstream calls share one in-flight request
+        self.single_flight = SingleFlight()
+
+        # Vehicle positions come from one background poll shared by all readers
+        self.vehicle_poller = VehiclePoller(
+            self._fetch_vehicle_points,
+            self._extract_route_id,
+            settings.vehicle_poll_interval
+        )
+
+    @staticmethod
+    def _capture_transport(limits: httpx.Limits) -> Optional[httpx.AsyncBaseTransport]:
+        """The record/replay transport for transloc_capture_mode, or None for plain HTTP."""
+        mode = settings.transloc_capture_mode
+        if not mode:
+            return None
+        path = Path(settings.transloc_capture_path)
+        if not path.is_absolute():
+            path = Path(__file__).parent.parent / path
+        if mode == "record":
+            logger.info(f"Recording TransLoc responses to {path}")
+            return RecordingTransport(path, httpx.AsyncHTTPTransport(limits=limits))
+        if mode == "replay":
+            return ReplayTransport(
+                path,
+                speed=settings.transloc_replay_speed,
+                latency=settings.transloc_replay_latency,
+                latency_median=settings.transloc_replay_latency_median,
+                latency_p99=settings.transloc_replay_latency_p99,
+                seed=settings.transloc_replay_seed
+            )
+        raise ValueError(f"Unknown transloc_capture_mode {mode!r}")
+
+    def start(self):
+        """Start background work (vehicle polling, snapshot revalidation and saving).
+
+        Call from the app lifespan, after load_snapshot().
+        """
+        self.vehicle_poller.start()
+        for key in self._snapshot_keys:
+            endpoint, params = key
+            self._schedule_refresh(key, endpoint, dict(params), self.cache_ttls[endpoint], " (snapshot revalidation)")
+        self._snapshot_keys = []
+        if self.snapshot is not None and (self._snapshot_task is None or self._snapshot_task.done()):
+            self._snapshot_task = asyncio.create_task(self._snapshot_loop())
+
+    def load_snapshot(self) -> int:
+        """Fill the static cache from the on-disk snapshot; returns the entries loaded.
+
+        Entries keep whatever freshness they had left when saved (minus the
+        downtime) and are revalidated in the background once start() runs.
+        """
+        if self.snapshot is None:
+            return 0
+        document = self.snapshot.load()
+        if document is None:
+            return 0
+
+        downtime = max(0.0, time.time() - float(document.get("savedAt", 0.0)))
+        loaded = 0
+        for endpoint, params, fresh_for, data in document.get("entries", []):
+            ttl = self.cache_ttls.get(endpoint)
+            if not ttl:
+                continue
+            key = self._cache_key(endpoint, params)
+            self.cache.set(key, data, min(ttl, max(0.0, fresh_for - downtime)))
+            self._snapshot_keys.append(key)
+            loaded += 1
+
+        self.snapshot_route_ids = [str(route_id) for route_id in document.get("activeRouteIds", [])]
+        self.snapshot_entries_loaded = loaded
+        logger.info(f"Loaded {loaded} static TransLoc responses from {self.snapshot.path}")
+        return loaded
+
+    async def save_snapshot(self):
+        """Write the static cache entries to the snapshot file (off the event loop)."""
+        if self.snapshot is None:
+            return
+        entries = [
+            [endpoint, dict(params), fresh_for, data]
+            for (endpoint, params), data, fresh_for in self.cache.items()
+            if endpoint in self.cache_ttls and data
+        ]
+        active_route_ids = sorted(self.vehicle_poller.snapshot.active_route_ids) or self.snapshot_route_ids
+        self._snapshot_dirty = False
         try:
-            response = await self.client.get(url, params=params)
-            if response.is_success:
-                return response.json() or []
-            else:
-                logger.error(f"TransLoc API error: {response.status_code} - {response.reason_phrase}")
-                return []
+            await asyncio.to_thread(
+                self.snapshot.save, {"activeRouteIds": active_route_ids, "entries": entries}
+            )
+            self.snapshot_saves += 1
         except Exception as ex:
-            logger.error(f"TransLoc API exception: {ex}")
-            return []
+            self._snapshot_dirty = True
+            logger.warning(f"Saving TransLoc snapshot failed: {ex}")
+
+    async def get_all_routes(self) -> List[dict]:
+        """Get all routes from the Transloc API."""
+        return await self._get_json("/GetRoutes", {}, default=[])
 
     async def get_active_routes(self) -> List[dict]:
         """Get only routes that currently have active vehicles."""
         all_routes = await self.get_all_routes()
-        active_vehicles = await self.get_active_vehicles()
-        
-        active_route_ids = set(active_vehicles.keys())
-        
+        snapshot = await self.get_vehicle_snapshot()
+
+        active_route_ids = snapshot.active_route_ids
+
         active_routes = []
         for route in all_routes:
             route_id = self._extract_route_id(route)
             if route_id and route_id in active_route_ids:
                 active_routes.append(route)
-        
+
         return active_routes
 
     async def get_stops(self, route_id: str) -> List[dict]:
         """Get stops for a specific route."""
-        endpoint = "/GetStops"
-        url = f"{self.base_url}{endpoint}"
-        params = {"APIKey": self.api_key, "routeID": route_id}
-        
-        try:
-            response = await self.client.get(url, params=params)
-            if response.is_success:
-                return response.json() or []
-            else:
-                logger.error(f"TransLoc API error for stops: {response.status_code} - {response.reason_phrase}")
-                return []
-        except Exception as ex:
-            logger.error(f"TransLoc API exception for stops: {ex}")
-            return []
+        return await self._get_json(
+            "/GetStops", {"routeID": route_id}, default=[], label=" for stops"
+        )
 
     async def get_route_details(self, route_id: str) -> List[dict]:
         """Get detailed information about a specific route."""
-        endpoint = "/GetRoutes"
-        url = f"{self.base_url}{endpoint}"
-        params = {"APIKey": self.api_key, "routeID": route_id}
-        
-        try:
-            response = await self.client.get(url, params=params)
-            if response.is_success:
-                return response.json() or []
-            else:
-                logger.error(f"TransLoc API error for route details: {response.status_code} - {response.reason_phrase}")
-                return []
-        except Exception as ex:
-            logger.error(f"TransLoc API exception for route details: {ex}")
-            return []
+        return await self._get_json(
+            "/GetRoutes", {"routeID": route_id}, default=[], label=" for route details"
+        )
 
-    async def get_active_vehicles(self) -> Dict[str, List[dict]]:
+    async def get_active_vehicles(self) -> Mapping[str, Tuple[dict, ...]]:
         """Get all active vehicles, grouped by route ID."""
-        endpoint = "/GetMapVehiclePoints"
-        url = f"{self.base_url}{endpoint}"
-        params = {"APIKey": self.api_key}
-        
-        try:
-            response = await self.client.get(url, params=params)
-            if response.is_success:
-                vehicles = response.json() or []
-                
-                route_vehicles: Dict[str, List[dict]] = {}
-                for vehicle in vehicles:
-                    route_id = self._extract_route_id(vehicle)
-                    if route_id:
-                        if route_id not in route_vehicles:
-                            route_vehicles[route_id] = []
-                        route_vehicles[route_id].append(vehicle)
-                
-                return route_vehicles
-            else:
-                logger.error(f"TransLoc API error: {response.status_code} - {response.reason_phrase}")
-                return {}
-        except Exception as ex:
-            logger.error(f"TransLoc API exception: {ex}")
-            return {}
+        snapshot = await self.get_vehicle_snapshot()
+        return snapshot.vehicles_by_route
+
+    async def get_vehicle_snapshot(self) -> VehicleSnapshot:
+        """Get the latest vehicle snapshot published by the background poller."""
+        return await self.vehicle_poller.get_snapshot()
 
     async def get_routes_for_map_with_schedule_with_encoded_line(self) -> List[dict]:
         """Get routes with schedule and encoded polyline for map display."""
-        endpoint = "/GetRoutesForMapWithScheduleWithEncodedLine"
-        url = f"{self.base_url}{endpoint}"
-        params = {"APIKey": self.api_key}
-        
-        try:
-            response = await self.client.get(url, params=params)
-            if response.is_success:
-                return response.json() or []
-            else:
-                logger.error(f"TransLoc API error for map routes: {response.status_code} - {response.reason_phrase}")
-                return []
-        except Exception as ex:
-            logger.error(f"TransLoc API exception for map routes: {ex}")
-            return []
+        return await self._get_json(
+            "/GetRoutesForMapWithScheduleWithEncodedLine", {}, default=[], label=" for map routes"
+        )
 
     async def get_map_vehicle_points(self) -> List[dict]:
         """Get current vehicle positions for map display."""
-        endpoint = "/GetMapVehiclePoints"
-        url = f"{self.base_url}{endpoint}"
-        params = {"APIKey": self.api_key}
-        
-        try:
-            response = await self.client.get(url, params=params)
-            if response.is_success:
-                return response.json() or []
-            else:
-                logger.error(f"TransLoc API error for vehicle points: {response.status_code} - {response.reason_phrase}")
-                return []
-        except Exception as ex:
-            logger.error(f"TransLoc API exception for vehicle points: {ex}")
-            return []
+        snapshot = await self.get_vehicle_snapshot()
+        return list(snapshot.vehicles)
 
     async def get_stop_arrival_times(
-        self, 
-        route_id: str, 
-        route_stop_id: Optional[str] = None, 
+        self,
+        route_id: str,
+        route_stop_id: Optional[str] = None,
         times_per_stop: int = 1
     ) -> List[dict]:
         """Get arrival times for stops."""
-        endpoint = "/GetStopArrivalTimes"
-        url = f"{self.base_url}{endpoint}"
         params = {
-            "APIKey": self.api_key,
             "routeIDs": route_id,
             "timesPerStop": times_per_stop
         }
-        
+
         if route_stop_id:
             params["routeStopIDs"] = route_stop_id
-        
+
+        return await self._get_json(
+            "/GetStopArrivalTimes", params, default=[], label=" for arrival times"
+        )
+
+    async def get_stop_arrival_times_batch(
+        self,
+        route_stop_pairs: List[Tuple[str, str]],
+        times_per_stop: int = 1
+    ) -> List[dict]:
+        """Get arrival times for many (route ID, route stop ID) pairs in one call.
+
+        The response holds one RouteStopArrival per requested stop; split it
+        per stop with RouteService._parse_arrival_times.
+        """
+        if not route_stop_pairs:
+            return []
+
+        # Sorted, de-duplicated ID lists keep the single-flight key stable
+        route_ids = sorted({route_id for route_id, _ in route_stop_pairs})
+        route_stop_ids = sorted({route_stop_id for _, route_stop_id in route_stop_pairs})
+        params = {
+            "routeIDs": ",".join(route_ids),
+            "routeStopIDs": ",".join(route_stop_ids),
+            "timesPerStop": times_per_stop
+        }
+
+        return await self._get_json(
+            "/GetStopArrivalTimes", params, default=[], label=" for arrival times"
+        )
+
+    async def get_routes_arrival_times(
+        self,
+        route_ids: List[str],
+        times_per_stop: int = 1
+    ) -> List[dict]:
+        """Get arrival times for every stop of several routes in one call."""
+        if not route_ids:
+            return []
+
+        params = {
+            "routeIDs": ",".join(sorted(set(route_ids))),
+            "timesPerStop": times_per_stop
+        }
+
+        return await self._get_json(
+            "/GetStopArrivalTimes", params, default=[], label=" for arrival times"
+        )
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Counters describing how upstream calls were served."""
+        return {
+            "cache": self.cache.stats(),
+            "backgroundRefreshes": len(self._refresh_tasks),
+            "singleFlight": self.single_flight.stats(),
+            "vehiclePoller": self.vehicle_poller.metrics(),
+            "fallbacksServed": self.fallbacks_served,
+            "snapshot": {
+                "entriesLoaded": self.snapshot_entries_loaded,
+                "saves": self.snapshot_saves,
+            },
+            "circuitBreakers": {endpoint: breaker.stats() for endpoint, breaker in self.breakers.items()},
+            "capture": self.capture.stats() if self.capture is not None else None,
+            "latency": {
+                endpoint: {**tracker.stats(), "timeoutSeconds": round(self._timeout_for(tracker), 3)}
+                for endpoint, tracker in self.latency.items()
+            },
+            "hedges": {
+                "sent": self.hedges_sent,
+                "won": self.hedges_won,
+                "budgetDenied": self.hedge_budget.denied,
+            },
+        }
+
+    async def _get_json(
+        self,
+        endpoint: str,
+        params: Dict[str, Any],
+        default: Any,
+        label: str = ""
+    ) -> Any:
+        """Shared request path for every get_* method.
+
+        Cacheable endpoints are answered from the TTL cache. An expired entry is
+        still returned while one background refresh replaces it. Live endpoints
+        remember their last good response; when a call fails (or its circuit
+        is open) that response is returned as a StaleList carrying its age.
+        Other failures are logged and turned into `default`; they never
+        overwrite cached data.
+        """
+        ttl = self.cache_ttls.get(endpoint)
+        key = self._cache_key(endpoint, params)
+
+        if ttl:
+            found, value, is_fresh = self.cache.get(key)
+            if found:
+                if not is_fresh:
+                    self._schedule_refresh(key, endpoint, params, ttl, label)
+                return value
+
         try:
-            response = await self.client.get(url, params=params)
-            if response.is_success:
-                return response.json() or []
-            else:
-                logger.error(f"TransLoc API error for arrival times: {response.status_code} - {response.reason_phrase}")
-                return []
+            data = await self._request_json(endpoint, params)
+        except CircuitOpenError as ex:
+            logger.debug(f"TransLoc API skipped{label}: {ex}")
+            return self._fallback(key, default)
+        except TranslocApiError as ex:
+            logger.error(f"TransLoc API error{label}: {ex}")
+            return self._fallback(key, default)
         except Exception as ex:
-            logger.error(f"TransLoc API exception for arrival times: {ex}")
-            return []
+            logger.error(f"TransLoc API exception{label}: {ex}")
+            return self._fallback(key, default)
+
+        data = data or default
+        if ttl:
+            self.cache.set(key, data, self._entry_ttl(ttl, data))
+            self._snapshot_dirty = True
+        else:
+            self.last_good.set(key, (data, time.time()), settings.transloc_fallback_max_age)
+        return data
+
+    def _fallback(self, key: Tuple, default: Any) -> Any:
+        """The last good response for `key` if it is recent enough, else `default`."""
+        found, entry, is_fresh = self.last_good.get(key)
+        if not found or not is_fresh:
+            return default
+        data, fetched_at = entry
+        self.fallbacks_served += 1
+        return StaleList(data, time.time() - fetched_at)
+
+    async def _request_json(self, endpoint: str, params: Dict[str, Any]) -> Any:
+        """GET an endpoint, joining an identical request that is already in flight."""
+        key = self._cache_key(endpoint, params)
+        return await self.single_flight.do(key, lambda: self._send(endpoint, params))
+
+    async def _send(self, endpoint: str, params: Dict[str, Any]) -> Any:
+        """Issue one (possibly hedged) GET against the TransLoc API and decode the JSON body.
+
+        Goes through the endpoint's circuit breaker: transport errors,
+        timeouts, 5xx answers and undecodable bodies count as failures.
+        """
+        breaker = self._breaker(endpoint)
+        if not breaker.allow():
+            raise CircuitOpenError(f"circuit open for {endpoint}")
+
+        try:
+            response = await self._hedged_get(endpoint, params)
+            data = response.json() if response.is_success else None
+        except Exception:
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+
+        if not response.is_success:
+            raise TranslocApiError(f"{response.status_code} - {response.reason_phrase}")
+        return data
+
+    async def _hedged_get(self, endpoint: str, params: Dict[str, Any]) -> httpx.Response:
+        """GET with an adaptive timeout, plus a hedge once the first call is slow.
+
+        Every TransLoc call is an idempotent GET, so when the first request
+        hasn't answered by the endpoint's hedge percentile a second identical
+        one is sent (if the hedge budget allows). The first successful answer
+        wins and the other request is cancelled.
+        """
+        tracker = self._latency(endpoint)
+        url = f"{self.base_url}{endpoint}"
+        query = {"APIKey": self.api_key, **params}
+        timeout = httpx.Timeout(self._timeout_for(tracker), connect=settings.transloc_connect_timeout)
+        self.hedge_budget.deposit()
+
+        primary = asyncio.ensure_future(self._timed_get(url, query, timeout, tracker))
+        hedge_delay = self._hedge_delay(tracker)
+        if hedge_delay is None:
+            return await primary
+
+        attempts = [primary]
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=hedge_delay)
+            if done or not self.hedge_budget.try_spend():
+                return await primary
+
+            self.hedges_sent += 1
+            attempts.append(asyncio.ensure_future(self._timed_get(url, query, timeout, tracker)))
+            pending = set(attempts)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        if attempt is not primary:
+                            self.hedges_won += 1
+                        return attempt.result()
+            # Both failed; surface the primary's error
+            return primary.result()
+        finally:
+            for attempt in attempts:
+                if not attempt.done():
+                    attempt.cancel()
+
+    async def _timed_get(
+        self,
+        url: str,
+        query: Dict[str, Any],
+        timeout: httpx.Timeout,
+        tracker: LatencyTracker
+    ) -> httpx.Response:
+        """One GET attempt; 5xx answers raise so a hedge can still win.
+
+        Attempts that time out, fail or are cancelled (the losing side of a
+        hedge) still record how long they had been waiting. That is a lower
+        bound of the real latency, but it keeps the slow tail visible: if the
+        upstream slows down past the adaptive timeout, the recorded timeouts
+        push p99 (and so the timeout) up until calls succeed again.
+        """
+        started = time.perf_counter()
+        try:
+            response = await self.client.get(url, params=query, timeout=timeout)
+        except (asyncio.CancelledError, Exception):
+            tracker.record(time.perf_counter() - started)
+            raise
+        tracker.record(time.perf_counter() - started)
+        if response.status_code >= 500:
+            raise TranslocApiError(f"{response.status_code} - {response.reason_phrase}")
+        return response
+
+    def _latency(self, endpoint: str) -> LatencyTracker:
+        tracker = self.latency.get(endpoint)
+        if tracker is None:
+            tracker = LatencyTracker(settings.transloc_latency_window, settings.transloc_latency_min_samples)
+            self.latency[endpoint] = tracker
+        return tracker
+
+    @staticmethod
+    def _timeout_for(tracker: LatencyTracker) -> float:
+        """p99 x multiplier, clamped to [transloc_min_timeout, transloc_timeout]."""
+        p99 = tracker.percentile(0.99)
+        if p99 is None:
+            return settings.transloc_timeout
+        timeout = p99 * settings.transloc_timeout_multiplier
+        return min(settings.transloc_timeout, max(settings.transloc_min_timeout, timeout))
+
+    @staticmethod
+    def _hedge_delay(tracker: LatencyTracker) -> Optional[float]:
+        """Seconds to wait before hedging, or None when hedging is off or latency unknown."""
+        if settings.transloc_hedge_max_ratio <= 0:
+            return None
+        delay = tracker.percentile(settings.transloc_hedge_percentile)
+        if delay is None:
+            return None
+        return max(settings.transloc_hedge_min_delay, delay)
+
+    def _breaker(self, endpoint: str) -> CircuitBreaker:
+        breaker = self.breakers.get(endpoint)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                failure_rate=settings.transloc_breaker_failure_rate,
+                min_calls=settings.transloc_breaker_min_calls,
+                window=settings.transloc_breaker_window,
+                open_seconds=settings.transloc_breaker_open_seconds
+            )
+            self.breakers[endpoint] = breaker
+        return breaker
+
+    async def _fetch_vehicle_points(self) -> List[dict]:
+        """Raw GetMapVehiclePoints call used by the poller; raises on failure."""
+        return await self._request_json("/GetMapVehiclePoints", {}) or []
+
+    def _schedule_refresh(
+        self,
+        key: Tuple,
+        endpoint: str,
+        params: Dict[str, Any],
+        ttl: float,
+        label: str
+    ):
+        """Start a background refresh for a stale cache entry unless one is running."""
+        if key in self._refresh_tasks:
+            return
+
+        async def refresh():
+            try:
+                data = await self._request_json(endpoint, params) or []
+                # Unchanged data keeps the cached list object, so indexes keyed
+                # on its identity (stop index, /map-routes body) stay valid
+                found, old, _ = self.cache.get(key)
+                if found and old == data:
+                    data = old
+                elif found and old and not data:
+                    # An empty answer doesn't wipe good data; keep it and retry soon
+                    self.cache.set(key, old, self._entry_ttl(ttl, data))
+                    return
+                else:
+                    self._snapshot_dirty = True
+                self.cache.set(key, data, self._entry_ttl(ttl, data))
+            except Exception as ex:
+                # Keep serving the stale copy; the next stale read retries
+                logger.warning(f"TransLoc cache refresh failed{label}: {ex}")
+            finally:
+                self._refresh_tasks.pop(key, None)
+
+        self._refresh_tasks[key] = asyncio.create_task(refresh())
+
+    @staticmethod
+    def _entry_ttl(ttl: float, data: Any) -> float:
+        """Full TTL for real data, a short negative TTL for an empty answer."""
+        return ttl if data else min(ttl, settings.transloc_empty_ttl)
+
+    @staticmethod
+    def _cache_key(endpoint: str, params: Dict[str, Any]) -> Tuple:
+        """Normalize endpoint + params into a hashable key (API key excluded)."""
+        return (endpoint, tuple(sorted((k, str(v)) for k, v in params.items())))
 
     def _extract_route_id(self, obj: dict) -> Optional[str]:
         """Extract route ID from an object, handling both string and numeric IDs."""
         route_id = obj.get("RouteID")
         if route_id is None:
             return None
-        
+
         if isinstance(route_id, (int, float)):
             return str(int(route_id))
         elif isinstance(route_id, str):
@@ -190,7 +584,19 @@ class TranslocApiService:
         else:
             return None
 
+    async def _snapshot_loop(self):
+        while True:
+            await asyncio.sleep(settings.transloc_snapshot_interval)
+            if self._snapshot_dirty:
+                await self.save_snapshot()
+
     async def close(self):
-        """Close the HTTP client."""
+        """Stop background work, save the snapshot and close the HTTP client."""
+        await self.vehicle_poller.stop()
+        for task in list(self._refresh_tasks.values()):
+            task.cancel()
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+        if self._snapshot_dirty:
+            await self.save_snapshot()
         await self.client.aclose()
-
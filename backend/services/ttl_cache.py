@@ -0,0 +1,68 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Tuple
+
+
+class TTLCache:
+    """Bounded LRU cache where every entry carries its own time-to-live.
+
+    Expired entries are not dropped on read: they are reported as stale so the
+    caller can keep serving them while a refresh runs. Entries only leave the
+    cache through LRU eviction once `max_entries` is exceeded.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        # key -> (value, expires_at) using time.monotonic()
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any, bool]:
+        """Look up a key, returning (found, value, is_fresh)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None, False
+
+        self._entries.move_to_end(key)
+        value, expires_at = entry
+        if time.monotonic() < expires_at:
+            self.hits += 1
+            return True, value, True
+
+        self.stale_hits += 1
+        return True, value, False
+
+    def set(self, key: Hashable, value: Any, ttl: float):
+        """Store a value that stays fresh for `ttl` seconds."""
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def items(self) -> List[Tuple[Hashable, Any, float]]:
+        """Every entry as (key, value, seconds it stays fresh; <= 0 when stale)."""
+        now = time.monotonic()
+        return [(key, value, expires_at - now) for key, (value, expires_at) in self._entries.items()]
+
+    def clear(self):
+        """Drop every entry (counters are kept)."""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current size."""
+        return {
+            "size": len(self._entries),
+            "maxEntries": self.max_entries,
+            "hits": self.hits,
+            "staleHits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,274 @@
+import asyncio
+import gzip
+import logging
+import math
+import random
+import time
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import orjson
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_FORMAT = 1
+
+# Unwritten capture bytes that trigger a background write
+FLUSH_BYTES = 256 * 1024
+
+
+def _open(path: Path, mode: str):
+    """Captures ending in .gz are gzip-compressed (appends add gzip members)."""
+    return gzip.open(path, mode) if path.suffix == ".gz" else open(path, mode)
+
+
+def _request_key(request: httpx.Request) -> Tuple[str, Dict[str, str]]:
+    """(endpoint, params) of a TransLoc GET; the API key is never part of it."""
+    endpoint = "/" + request.url.path.rsplit("/", 1)[-1]
+    params = {name: value for name, value in request.url.params.items() if name != "APIKey"}
+    return endpoint, params
+
+
+def _match_key(endpoint: str, params: Dict[str, Any]) -> Tuple[str, Tuple]:
+    return endpoint, tuple(sorted((str(name), str(value)) for name, value in params.items()))
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Passes TransLoc calls through and appends each exchange to a capture file.
+
+    The capture is JSON lines: a header {"format": 1, "startedAt": ...}
+    followed by one record per completed call:
+
+        {"t": seconds since startedAt, "endpoint": "/GetStops",
+         "params": {...}, "status": 200, "latency": seconds,
+         "contentType": ..., "body": "<raw response text>"}
+
+    or, for calls that failed below HTTP, "error" instead of status/body.
+    The API key is left out. Lines are buffered and written by one worker
+    thread in order; aclose() (from the client's) writes the rest.
+    """
+
+    def __init__(self, path: Path, inner: httpx.AsyncBaseTransport):
+        self.path = path
+        self.inner = inner
+        self.started_at = time.time()
+        self.records = 0
+        self._pending: List[bytes] = []
+        self._pending_bytes = 0
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="transloc-capture")
+        self._pending.append(orjson.dumps({"format": CAPTURE_FORMAT, "startedAt": self.started_at}) + b"\n")
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        endpoint, params = _request_key(request)
+        started = time.perf_counter()
+        sent_at = time.time() - self.started_at
+        response = None
+        try:
+            response = await self.inner.handle_async_request(request)
+            body = await response.aread()
+        except httpx.TransportError as ex:
+            self._append({
+                "t": round(sent_at, 3),
+                "endpoint": endpoint,
+                "params": params,
+                "latency": round(time.perf_counter() - started, 4),
+                "error": type(ex).__name__,
+            })
+            raise
+        finally:
+            if response is not None:
+                await response.aclose()
+
+        content_type = response.headers.get("content-type", "application/json")
+        self._append({
+            "t": round(sent_at, 3),
+            "endpoint": endpoint,
+            "params": params,
+            "status": response.status_code,
+            "latency": round(time.perf_counter() - started, 4),
+            "contentType": content_type,
+            "body": body.decode("utf-8", "replace"),
+        })
+        # The body is already read (and decoded), so hand back a plain copy
+        return httpx.Response(
+            response.status_code, headers={"content-type": content_type}, content=body, request=request
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": "record", "records": self.records}
+
+    async def aclose(self):
+        await self._flush()
+        self._writer.shutdown(wait=True)
+        await self.inner.aclose()
+
+    def _append(self, record: Dict[str, Any]):
+        line = orjson.dumps(record) + b"\n"
+        self._pending.append(line)
+        self._pending_bytes += len(line)
+        self.records += 1
+        if self._pending_bytes >= FLUSH_BYTES:
+            asyncio.ensure_future(self._flush())
+
+    async def _flush(self):
+        if not self._pending:
+            return
+        lines, self._pending, self._pending_bytes = self._pending, [], 0
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._writer, self._write, lines)
+        except Exception as ex:
+            logger.error(f"Failed to write TransLoc capture {self.path}: {ex}")
+
+    def _write(self, lines: List[bytes]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with _open(self.path, "ab") as f:
+            f.write(b"".join(lines))
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Serves TransLoc calls from a capture file instead of the network.
+
+    Replay runs on a virtual clock: `speed` capture seconds pass per wall
+    clock second (time compression), wrapping around at the end of the
+    capture so a load test can run as long as it likes. A call gets the
+    latest recorded answer for the same endpoint and params at the current
+    virtual time; unknown params fall back to the latest answer of the same
+    endpoint, and endpoints never recorded get a 404.
+
+    Latency is injected per call: "recorded" sleeps as long as the recorded
+    call took, "synthetic" draws from a log-normal with the given median and
+    p99 (seconds), "none" answers immediately. Either is divided by `speed`,
+    and a call whose latency exceeds the request's read timeout raises
+    httpx.ReadTimeout after that timeout, so adaptive timeouts, hedging and
+    circuit breakers behave as they would against the live API. Draws come
+    from a seeded RNG so a replay is repeatable.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        speed: float = 1.0,
+        latency: str = "recorded",
+        latency_median: float = 0.1,
+        latency_p99: float = 1.0,
+        seed: int = 0
+    ):
+        self.path = path
+        self.speed = speed
+        self.latency = latency
+        self._mu = math.log(max(latency_median, 1e-6))
+        self._sigma = max(0.0, math.log(max(latency_p99, latency_median) / max(latency_median, 1e-6)) / 2.326)
+        self._random = random.Random(seed)
+        self.served = 0
+        self.unmatched = 0
+        self.timeouts = 0
+
+        # match key -> (record times, records), and endpoint -> the same, oldest first
+        self._by_key: Dict[Tuple, Tuple[List[float], List[Dict[str, Any]]]] = {}
+        self._by_endpoint: Dict[str, Tuple[List[float], List[Dict[str, Any]]]] = {}
+        self.duration = 0.0
+        records = self._load()
+        for record in records:
+            t = record["t"]
+            self.duration = max(self.duration, t)
+            for index, key in (
+                (self._by_key, _match_key(record["endpoint"], record.get("params", {}))),
+                (self._by_endpoint, record["endpoint"]),
+            ):
+                times, entries = index.setdefault(key, ([], []))
+                times.append(t)
+                entries.append(record)
+        self.records = len(records)
+        self._started = time.monotonic()
+        logger.info(f"Replaying {self.records} TransLoc responses ({self.duration:.0f} s) from {path}")
+
+    def now(self) -> float:
+        """Current position in the capture, in capture seconds."""
+        elapsed = (time.monotonic() - self._started) * self.speed
+        return elapsed % self.duration if self.duration > 0 else 0.0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        endpoint, params = _request_key(request)
+        now = self.now()
+        record = self._pick(self._by_key.get(_match_key(endpoint, params)), now)
+        if record is None:
+            self.unmatched += 1
+            record = self._pick(self._by_endpoint.get(endpoint), now)
+            if record is None:
+                return httpx.Response(404, request=request)
+
+        # Latency runs on the same compressed clock as the capture, and a call
+        # slower than its (adaptive) read timeout times out as it would live
+        delay = self._delay(record) / self.speed
+        read_timeout = request.extensions.get("timeout", {}).get("read")
+        if read_timeout is not None and delay > read_timeout:
+            await asyncio.sleep(read_timeout)
+            self.timeouts += 1
+            raise httpx.ReadTimeout(f"replayed call took {delay:.3f} s", request=request)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self.served += 1
+        if "error" in record:
+            error = getattr(httpx, record["error"], None)
+            if not (isinstance(error, type) and issubclass(error, httpx.TransportError)):
+                error = httpx.ConnectError
+            raise error(f"replayed {record['error']}", request=request)
+        return httpx.Response(
+            record.get("status", 200),
+            headers={"content-type": record.get("contentType", "application/json")},
+            content=record.get("body", "").encode(),
+            request=request
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": "replay",
+            "records": self.records,
+            "durationSeconds": round(self.duration, 1),
+            "positionSeconds": round(self.now(), 1),
+            "served": self.served,
+            "unmatched": self.unmatched,
+            "timeouts": self.timeouts,
+        }
+
+    @staticmethod
+    def _pick(index: Optional[Tuple[List[float], List[Dict[str, Any]]]], now: float) -> Optional[Dict[str, Any]]:
+        """The latest record at or before `now` (the first one if all are later)."""
+        if index is None:
+            return None
+        times, records = index
+        return records[max(0, bisect_right(times, now) - 1)]
+
+    def _delay(self, record: Dict[str, Any]) -> float:
+        if self.latency == "recorded":
+            return float(record.get("latency", 0.0))
+        if self.latency == "synthetic":
+            return self._random.lognormvariate(self._mu, self._sigma)
+        return 0.0
+
+    def _load(self) -> List[Dict[str, Any]]:
+        """Records of every session in the file, as one timeline sorted by send time.
+
+        Each recording session starts with its own header and clock; later
+        sessions are placed right after the previous one ends.
+        """
+        records = []
+        offset = end = 0.0
+        with _open(self.path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = orjson.loads(line)
+                if "format" in record:
+                    if record["format"] != CAPTURE_FORMAT:
+                        raise ValueError(f"Unknown TransLoc capture format in {self.path}")
+                    offset = end
+                    continue
+                record["t"] = float(record.get("t", 0.0)) + offset
+                end = max(end, record["t"])
+                records.append(record)
+        records.sort(key=lambda record: record["t"])
+        return records
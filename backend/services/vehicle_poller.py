@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class VehicleSnapshot:
+    """Immutable view of the vehicle feed as of one upstream poll.
+
+    `version` increases by one for every successful poll, so it can be used as
+    a cache key or as a cursor by clients that want changes since a version.
+    The vehicle dicts are shared between readers and must not be mutated.
+    """
+    version: int = 0
+    fetched_at: float = 0.0  # time.time() of the poll that produced it
+    vehicles: Tuple[dict, ...] = ()
+    vehicles_by_route: Mapping[str, Tuple[dict, ...]] = field(
+        default_factory=lambda: MappingProxyType({})
+    )
+    active_route_ids: FrozenSet[str] = frozenset()
+
+    @property
+    def age(self) -> float:
+        """Seconds since the snapshot was fetched."""
+        return time.time() - self.fetched_at if self.fetched_at else float("inf")
+
+
+class VehiclePoller:
+    """Polls GetMapVehiclePoints on a fixed interval and publishes snapshots.
+
+    Every reader (route search, /map-vehicles, streams) shares the latest
+    snapshot, so upstream vehicle traffic is one call per interval no matter
+    how many requests we serve. A failed poll keeps the previous snapshot.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[List[dict]]],
+        extract_route_id: Callable[[dict], Optional[str]],
+        interval: float
+    ):
+        self.fetch = fetch
+        self.extract_route_id = extract_route_id
+        self.interval = interval
+        self.polls = 0
+        self.poll_failures = 0
+        self._snapshot = VehicleSnapshot()
+        self._updated = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Optional[asyncio.Task] = None
+
+    @property
+    def snapshot(self) -> VehicleSnapshot:
+        """The most recently published snapshot (version 0 until the first poll)."""
+        return self._snapshot
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the background polling task."""
+        if not self.is_running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background polling task and any poll in flight."""
+        if self._inflight is not None:
+            self._inflight.cancel()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def get_snapshot(self) -> VehicleSnapshot:
+        """Return the current snapshot, polling inline if none has been published.
+
+        This covers the window before the first background poll succeeds, and
+        callers that use the service without starting the poller.
+        """
+        if self._snapshot.version:
+            return self._snapshot
+        return await self.poll_once()
+
+    async def wait_for_update(self, version: int) -> VehicleSnapshot:
+        """Wait until a snapshot newer than `version` has been published."""
+        while self._snapshot.version <= version:
+            await self._updated.wait()
+        return self._snapshot
+
+    async def poll_once(self) -> VehicleSnapshot:
+        """Fetch the vehicle feed once and publish a new snapshot on success.
+
+        Concurrent callers share the poll already in flight.
+        """
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._poll())
+        return await asyncio.shield(self._inflight)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Poll counters and snapshot freshness."""
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version,
+            "vehicles": len(snapshot.vehicles),
+            "ageSeconds": round(snapshot.age, 1) if snapshot.fetched_at else None,
+            "polls": self.polls,
+            "pollFailures": self.poll_failures,
+        }
+
+    async def _poll(self) -> VehicleSnapshot:
+        self.polls += 1
+        try:
+            vehicles = await self.fetch()
+        except Exception as ex:
+            self.poll_failures += 1
+            logger.warning(f"Vehicle poll failed, keeping snapshot v{self._snapshot.version}: {ex}")
+            return self._snapshot
+
+        self._publish(vehicles or [])
+        return self._snapshot
+
+    def _publish(self, vehicles: List[dict]):
+        """Build an immutable snapshot from a raw vehicle list and wake waiters."""
+        by_route: Dict[str, List[dict]] = {}
+        for vehicle in vehicles:
+            route_id = self.extract_route_id(vehicle)
+            if route_id:
+                if route_id not in by_route:
+                    by_route[route_id] = []
+                by_route[route_id].append(vehicle)
+
+        self._snapshot = VehicleSnapshot(
+            version=self._snapshot.version + 1,
+            fetched_at=time.time(),
+            vehicles=tuple(vehicles),
+            vehicles_by_route=MappingProxyType(
+                {route_id: tuple(route_vehicles) for route_id, route_vehicles in by_route.items()}
+            ),
+            active_route_ids=frozenset(by_route)
+        )
+
+        # Swap the event so waiters wake once and later waits block again
+        updated, self._updated = self._updated, asyncio.Event()
+        updated.set()
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            await self.poll_once()
+            elapsed = time.monotonic() - started
+            await asyncio.sleep(max(0.0, self.interval - elapsed))
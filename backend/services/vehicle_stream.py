@@ -0,0 +1,180 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set
+
+import orjson
+
+from services.vehicle_poller import VehiclePoller
+
+logger = logging.getLogger(__name__)
+
+# MapVehicle fields carried by delta frames (aliases, as sent to clients)
+DELTA_FIELDS = (
+    "latitude", "longitude", "heading", "groundSpeed",
+    "distanceAlongRoute", "nextRouteStopId", "distanceToNextStop",
+)
+
+
+class Subscription:
+    """One connected client: a bounded queue of serialized frames.
+
+    A `None` frame means the subscriber was dropped for falling behind and
+    should close its connection (the client reconnects and gets a keyframe).
+    """
+
+    def __init__(self, max_queue: int):
+        self.queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue(maxsize=max_queue)
+        self.dropped = False
+
+    async def get(self) -> Optional[str]:
+        return await self.queue.get()
+
+
+class VehicleStream:
+    """Pushes vehicle updates from one shared producer to every subscriber.
+
+    The producer waits for each new vehicle snapshot, builds the /map-vehicles
+    view once, and serializes one frame per version: a keyframe with every
+    vehicle, or a delta with only the position/heading/speed changes plus
+    added and removed vehicles. Frames are fanned out with put_nowait, so a
+    slow subscriber never blocks the others; one whose queue is full is
+    dropped instead of buffering without bound. While nobody is subscribed
+    the producer sleeps, so idle streams cost no upstream calls.
+    """
+
+    def __init__(self, poller: VehiclePoller, route_service, max_queue: int):
+        self.poller = poller
+        self.route_service = route_service
+        self.max_queue = max_queue
+        self.subscribers: Set[Subscription] = set()
+        self.version = 0
+        self.frames_sent = 0
+        self.dropped = 0
+        self._vehicles: Dict[str, Dict[str, Any]] = {}
+        self._keyframe: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        # Set while at least one subscriber is connected
+        self._active = asyncio.Event()
+
+    def start(self):
+        """Start the producer task."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the producer and tell every subscriber to disconnect."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for subscription in list(self.subscribers):
+            self._close(subscription)
+
+    def subscribe(self) -> Subscription:
+        """Register a subscriber; it starts with a keyframe of the current state."""
+        subscription = Subscription(self.max_queue)
+        if self._keyframe is not None:
+            subscription.queue.put_nowait(self._keyframe)
+        self.subscribers.add(subscription)
+        self._active.set()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._remove(subscription)
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "version": self.version,
+            "subscribers": len(self.subscribers),
+            "framesSent": self.frames_sent,
+            "dropped": self.dropped,
+        }
+
+    async def _run(self):
+        while True:
+            if not self._active.is_set():
+                # Idle: forget the old state so the next subscriber starts
+                # from a keyframe of the current snapshot, built right away
+                self._keyframe = None
+                self._vehicles = {}
+                await self._active.wait()
+            snapshot = await self.poller.wait_for_update(self.version)
+            try:
+                vehicles = await self.route_service.get_map_vehicles()
+            except Exception as ex:
+                logger.warning(f"Vehicle stream skipped snapshot v{snapshot.version}: {ex}")
+                self.version = snapshot.version
+                continue
+            self._publish(snapshot.version, vehicles)
+
+    def _publish(self, version: int, vehicles: List[Dict[str, Any]]):
+        """Diff against the previous state, serialize once and fan out."""
+        current = {vehicle["vehicleId"]: vehicle for vehicle in vehicles}
+        first = self._keyframe is None
+
+        self._keyframe = orjson.dumps(
+            {"type": "keyframe", "version": version, "vehicles": vehicles}
+        ).decode()
+        if first:
+            frame = self._keyframe
+        else:
+            frame = orjson.dumps(self._delta(self.version, version, self._vehicles, current)).decode()
+
+        self._vehicles = current
+        self.version = version
+
+        for subscription in list(self.subscribers):
+            try:
+                subscription.queue.put_nowait(frame)
+                self.frames_sent += 1
+            except asyncio.QueueFull:
+                self._drop(subscription)
+
+    @staticmethod
+    def _delta(
+        base_version: int,
+        version: int,
+        previous: Dict[str, Dict[str, Any]],
+        current: Dict[str, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Compact delta: changed position/heading/speed, added and removed vehicles."""
+        changed = []
+        added = []
+        for vehicle_id, vehicle in current.items():
+            before = previous.get(vehicle_id)
+            if before is None:
+                added.append(vehicle)
+                continue
+            fields = {name: vehicle[name] for name in DELTA_FIELDS if vehicle[name] != before[name]}
+            if fields:
+                changed.append({"vehicleId": vehicle_id, **fields})
+
+        return {
+            "type": "delta",
+            "version": version,
+            "baseVersion": base_version,
+            "changed": changed,
+            "added": added,
+            "removed": [vehicle_id for vehicle_id in previous if vehicle_id not in current],
+        }
+
+    def _drop(self, subscription: Subscription):
+        """Disconnect a subscriber that fell behind."""
+        subscription.dropped = True
+        self.dropped += 1
+        self._close(subscription)
+
+    def _close(self, subscription: Subscription):
+        """Disconnect a subscriber: clear its backlog and leave the close sentinel."""
+        self._remove(subscription)
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
+
+    def _remove(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+        if not self.subscribers:
+            self._active.clear()